@@ -1,53 +1,46 @@
+import argparse
 import asyncio
-import uuid
+import os
 
 import yaml
-from aio_pika import connect, Message
 
-from qt.protos import messages_pb2
+from qt.client.rabbitmq_client.async_client import AsyncClient
 
-with open("config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "../../config.yaml")
 
 
-async def send_request(number, process_time=None):
-    connection = await connect(config["broker_url2"])
-    try:
-        channel = await connection.channel()
+async def send_requests(config, numbers, process_time):
+    async with AsyncClient.from_config(config) as client:
+        results = await asyncio.gather(*(client.call(number, process_time) for number in numbers))
+        for number, result in zip(numbers, results):
+            print(f"{number} -> {result}")
 
-        request_id = str(uuid.uuid4())
-        return_address = config["response_queue"]
 
-        request = messages_pb2.Request(
-            return_address=return_address,
-            request_id=request_id,
-            request=number,
-            proccess_time_in_seconds=process_time,
-        )
-
-        message = Message(body=request.SerializeToString())
-
-        await channel.default_exchange.publish(message, routing_key=config["request_queue"])
-        print(f"Запрос отправлен: {request}")
-
-        queue = await channel.declare_queue(return_address, auto_delete=True)
-        async with queue.iterator() as queue_iter:
-            async for response_message in queue_iter:
-                response = messages_pb2.Response()
-                response.ParseFromString(response_message.body)
-                print(f"Ответ получен: {response}")
-                break
-    finally:
-        await connection.close()
-
-
-async def send_multiple_requests():
-    await asyncio.gather(
-        send_request(10, process_time=7),
-        send_request(20, process_time=5),
-        send_request(30, process_time=3)
-    )
+async def stream_range(config, start, stop, step, chunk_size):
+    # Результаты печатаются по мере прихода кусков, диапазон может быть сколь угодно большим
+    async with AsyncClient.from_config(config) as client:
+        number = start
+        async for results in client.stream(start, stop, step, chunk_size):
+            for result in results:
+                print(f"{number} -> {result}")
+                number += step
 
 
 if __name__ == "__main__":
-    asyncio.run(send_multiple_requests())
+    parser = argparse.ArgumentParser(description="Консольный клиент без GUI")
+    parser.add_argument("numbers", type=int, nargs="*")
+    parser.add_argument("--process-time", type=float, default=0.0)
+    parser.add_argument("--range", type=int, nargs=3, metavar=("START", "STOP", "STEP"),
+                        help="обработать диапазон одним потоковым запросом")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--config", default=CONFIG_PATH)
+    args = parser.parse_args()
+    if not args.numbers and args.range is None:
+        parser.error("нужны числа или --range")
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    if args.range is not None:
+        asyncio.run(stream_range(config, *args.range, args.chunk_size))
+    else:
+        asyncio.run(send_requests(config, args.numbers, args.process_time))
@@ -0,0 +1,25 @@
+class BatchAcker:
+    # Подтверждает доставки пачкой: один basic_ack(multiple=True) на последний тег
+    # вместо ack на каждое сообщение. Порог меньше prefetch, чтобы брокер не простаивал
+    def __init__(self, channel, batch_size):
+        self.channel = channel
+        self.batch_size = max(1, batch_size)
+        self.last_tag = None
+        self.unacked = 0
+
+    def track(self, delivery_tag):
+        self.last_tag = delivery_tag
+        self.unacked += 1
+        if self.unacked >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.unacked:
+            self.channel.basic_ack(delivery_tag=self.last_tag, multiple=True)
+            self.unacked = 0
+
+    def reset(self, channel):
+        # После переподключения теги начинаются заново, неподтверждённое брокер доставит повторно
+        self.channel = channel
+        self.last_tag = None
+        self.unacked = 0
@@ -0,0 +1,325 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import uuid
+
+from aio_pika import ExchangeType, Message
+
+from qt.protos import messages_pb2
+from qt.tracing import TRACE_SEND, TraceWriter, now_us, stamps_from_headers
+from qt.transport import connect_robust
+from qt.transport.sharding import declare_shards, routing_key
+
+REQUEST_BATCH_TYPE = "RequestBatch"
+RESPONSE_BATCH_TYPE = "ResponseBatch"
+RANGE_REQUEST_TYPE = "RangeRequest"
+RESPONSE_CHUNK_TYPE = "ResponseChunk"
+STREAM_ACK_TYPE = "StreamAck"
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"
+
+
+class RequestTimeout(asyncio.TimeoutError):
+    def __init__(self, request_id):
+        super().__init__(f"Истекло время ожидания ответа на запрос {request_id}")
+        self.request_id = request_id
+
+
+class ServerBusy(Exception):
+    # Сервер отказал без обработки из-за перегрузки; запрос можно повторить с паузой
+    def __init__(self, request_id):
+        super().__init__(f"Сервер занят, запрос {request_id} отклонён")
+        self.request_id = request_id
+
+
+class StreamFailed(Exception):
+    # Сервер оборвал поток диапазона: диапазон недопустим, клиент не забирал куски или вычисление упало
+    def __init__(self, request_id, error):
+        super().__init__(f"Поток {request_id} прерван сервером: {error}")
+        self.request_id = request_id
+        self.error = error
+
+
+class AsyncClient:
+    # Клиент без PyQt: одно robust-соединение, пул каналов для публикации
+    # и одна общая очередь ответов, ответы раскладываются по future по request_id.
+    # С shards > 0 запросы распределяются по очередям шардов по ключу (по умолчанию request_id)
+    def __init__(self, broker_url, request_queue, channels=4, timeout=30.0,
+                 cancel_exchange="cancel_exchange", direct_reply_to=False, trace_path=None, shards=0):
+        self.broker_url = broker_url
+        self.request_queue = request_queue
+        self.shards = shards
+        self.cancel_exchange_name = cancel_exchange
+        self.channels = channels
+        self.timeout = timeout
+        self.direct_reply_to = direct_reply_to
+        self.reply_queue_name = DIRECT_REPLY_TO if direct_reply_to else f"rpc-{uuid.uuid4()}"
+        self.tracer = TraceWriter(trace_path) if trace_path else None
+        self.connection = None
+        self._publish_channels = []
+        self._next_channel = None
+        self._cancel_exchange = None
+        self._pending = {}
+        self._streams = {}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        if config.get("transport") == "unix" and cls is AsyncClient:
+            from qt.client.rabbitmq_client.unix_client import UnixClient
+            return UnixClient.from_config(config, **kwargs)
+        kwargs.setdefault("timeout", config.get("request_timeout") or 30.0)
+        kwargs.setdefault("cancel_exchange", config.get("cancel_exchange") or "cancel_exchange")
+        kwargs.setdefault("direct_reply_to", bool(config.get("direct_reply_to")))
+        kwargs.setdefault("trace_path", config.get("client_trace_path") or None)
+        kwargs.setdefault("shards", int(config.get("shards") or 0))
+        return cls(config["broker_url"], config["request_queue"], **kwargs)
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    async def connect(self):
+        self.connection = await connect_robust(self.broker_url)
+        if self.direct_reply_to:
+            # Ответы приходят в псевдо-очередь без объявления и хранения на брокере,
+            # но только в канал, из которого отправлен запрос: публикация идёт через него же
+            reply_channel = await self.connection.channel(publisher_confirms=False)
+            reply_queue = await reply_channel.get_queue(DIRECT_REPLY_TO, ensure=False)
+            await reply_queue.consume(self._on_response, no_ack=True)
+            self._publish_channels = [reply_channel]
+        else:
+            # Ответы забираются без подтверждений: prefetch на таком потребителе ничего не ограничивает,
+            # число ответов в пути задаёт только число запросов в полёте
+            reply_channel = await self.connection.channel()
+            # Имя очереди фиксировано, чтобы после переподключения ответы шли туда же
+            reply_queue = await reply_channel.declare_queue(self.reply_queue_name, exclusive=True, auto_delete=True)
+            await reply_queue.consume(self._on_response, no_ack=True)
+            self._publish_channels = [
+                await self.connection.channel(publisher_confirms=False) for _ in range(self.channels)
+            ]
+        if self.shards:
+            # Публикация в шарды идёт через обменник: у каждого канала свой объект обменника
+            targets = [(channel, (await declare_shards(channel, self.request_queue, self.shards))[0])
+                       for channel in self._publish_channels]
+        else:
+            targets = [(channel, channel.default_exchange) for channel in self._publish_channels]
+        self._next_channel = itertools.cycle(targets)
+        self._cancel_exchange = await self._publish_channels[0].declare_exchange(
+            self.cancel_exchange_name, ExchangeType.FANOUT
+        )
+        logging.info(f"Клиент подключен, очередь ответов: {self.reply_queue_name}")
+        return self
+
+    async def close(self):
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+        for chunks in self._streams.values():
+            chunks.put_nowait(None)
+        if self.connection is not None and not self.connection.is_closed:
+            await self.connection.close()
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _on_response(self, message):
+        if message.type == RESPONSE_CHUNK_TYPE:
+            chunk = messages_pb2.ResponseChunk()
+            chunk.ParseFromString(message.body)
+            self._resolve_chunk(chunk)
+            return
+        if message.type == RESPONSE_BATCH_TYPE:
+            batch = messages_pb2.ResponseBatch()
+            batch.ParseFromString(message.body)
+            responses = batch.responses
+        else:
+            response = messages_pb2.Response()
+            response.ParseFromString(message.body)
+            responses = [response]
+        if self.tracer is not None and message.headers and TRACE_SEND in message.headers:
+            stamps = stamps_from_headers(message.headers)
+            returned_at = now_us()
+            for response in responses:
+                self.tracer.write(response.request_id, **stamps, back=returned_at)
+        for response in responses:
+            self._resolve(response)
+
+    def _resolve(self, response):
+        future = self._pending.pop(response.request_id, None)
+        if future is None:
+            logging.debug(f"Пропущен ответ без ожидающего запроса: {response.request_id}")
+            return
+        if future.done():
+            return
+        if response.status == messages_pb2.Response.BUSY:
+            future.set_exception(ServerBusy(response.request_id))
+        else:
+            future.set_result(response.response)
+
+    def _resolve_chunk(self, chunk):
+        chunks = self._streams.get(chunk.request_id)
+        if chunks is None:
+            logging.debug(f"Пропущен кусок {chunk.seq} потока без ожидающего запроса: {chunk.request_id}")
+            return
+        chunks.put_nowait(chunk)
+
+    def _register(self, request_id):
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        return future
+
+    async def _publish(self, body, key, **properties):
+        channel, exchange = next(self._next_channel)
+        if self.direct_reply_to:
+            properties["reply_to"] = DIRECT_REPLY_TO
+        if self.tracer is not None:
+            properties["headers"] = {TRACE_SEND: now_us()}
+        await exchange.publish(
+            Message(body=body, **properties), routing_key=routing_key(self.request_queue, self.shards, key)
+        )
+
+    def _request(self, number, process_time):
+        return messages_pb2.Request(
+            return_address=self.reply_queue_name,
+            request_id=str(uuid.uuid4()),
+            request=int(number),
+            proccess_time_in_seconds=process_time or 0.0,
+        )
+
+    async def _wait(self, request_id, future, timeout):
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RequestTimeout(request_id) from None
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def call(self, number, process_time=0.0, timeout=None, key=None):
+        # Запросы с одним key попадают в один шард и доставляются серверу по порядку
+        request = self._request(number, process_time)
+        future = self._register(request.request_id)
+        try:
+            await self._publish(request.SerializeToString(), key or request.request_id)
+        except Exception:
+            self._pending.pop(request.request_id, None)
+            raise
+        return await self._wait(request.request_id, future, (process_time or 0.0) + (timeout or self.timeout))
+
+    async def call_many(self, items, process_time=0.0, batch_size=500, timeout=None, key=None):
+        # items: числа или пары (число, время обработки); отправляются пакетами RequestBatch,
+        # при шардировании - отдельными пакетами на каждый шард, с key - все в один шард
+        requests = [
+            self._request(*item) if isinstance(item, (tuple, list)) else self._request(item, process_time)
+            for item in items
+        ]
+        futures = [self._register(request.request_id) for request in requests]
+        groups = {}
+        for request in requests:
+            request_key = key or request.request_id
+            shard = routing_key(self.request_queue, self.shards, request_key)
+            # Любой ключ группы ведёт в тот же шард
+            groups.setdefault(shard, (request_key, []))[1].append(request)
+        try:
+            for group_key, group in groups.values():
+                for start in range(0, len(group), batch_size):
+                    batch = messages_pb2.RequestBatch(requests=group[start:start + batch_size])
+                    await self._publish(batch.SerializeToString(), group_key, type=REQUEST_BATCH_TYPE)
+        except Exception:
+            for request in requests:
+                self._pending.pop(request.request_id, None)
+            raise
+
+        longest = max((request.proccess_time_in_seconds for request in requests), default=0.0)
+        deadline = longest + (timeout or self.timeout)
+        return await asyncio.gather(*(
+            self._wait(request.request_id, future, deadline)
+            for request, future in zip(requests, futures)
+        ))
+
+    async def stream(self, start, stop, step=1, chunk_size=1000, window=8, timeout=None, key=None):
+        # Результаты диапазона range(start, stop, step) отдаются списками по мере прихода кусков.
+        # Сервер опережает итерацию не больше чем на window кусков: клиент сообщает StreamAck,
+        # сколько кусков отдано, поэтому память не зависит ни от длины диапазона, ни от скорости потребителя.
+        # Куски, пришедшие раньше своей очереди, ждут предыдущих; повторы после переотправки отбрасываются
+        if step == 0:
+            raise ValueError("шаг диапазона не может быть 0")
+        request = messages_pb2.RangeRequest(
+            return_address=self.reply_queue_name,
+            request_id=str(uuid.uuid4()),
+            start=start,
+            stop=stop,
+            step=step,
+            chunk_size=chunk_size,
+            window=window,
+        )
+        chunks = self._streams[request.request_id] = asyncio.Queue()
+        # Сервер закончил поток или уже получил отмену: при выходе из итерации отменять нечего
+        settled = False
+        try:
+            await self._publish(request.SerializeToString(), key or request.request_id, type=RANGE_REQUEST_TYPE)
+            expected = 0
+            acked = 0
+            early = {}
+            while not settled:
+                try:
+                    chunk = await asyncio.wait_for(chunks.get(), timeout or self.timeout)
+                except asyncio.TimeoutError:
+                    raise RequestTimeout(request.request_id) from None
+                if chunk is None:
+                    settled = True
+                    raise asyncio.CancelledError()
+                if isinstance(chunk, Exception):
+                    raise chunk
+                if chunk.seq >= expected:
+                    early[chunk.seq] = chunk
+                while expected in early and not settled:
+                    chunk = early.pop(expected)
+                    expected += 1
+                    settled = chunk.end_of_stream
+                    if chunk.status == messages_pb2.Response.BUSY:
+                        raise ServerBusy(request.request_id)
+                    if chunk.status == messages_pb2.Response.FAILED:
+                        raise StreamFailed(request.request_id, chunk.error)
+                    if chunk.results:
+                        yield list(chunk.results)
+                    if window and not settled and expected - acked >= max(1, window // 2):
+                        acked = expected
+                        await self._publish_stream_ack(
+                            messages_pb2.StreamAck(
+                                request_id=request.request_id, consumed=acked, return_address=request.return_address
+                            ).SerializeToString()
+                        )
+        finally:
+            self._streams.pop(request.request_id, None)
+            if not settled:
+                # Итерацию прервали: сервер перестанет считать оставшиеся куски
+                with contextlib.suppress(Exception):
+                    await self._publish_cancel(messages_pb2.Cancel(request_ids=[request.request_id]).SerializeToString())
+
+    async def cancel(self, request_ids=None):
+        # Без аргументов отменяет все ожидающие запросы и потоки; ожидающие вызовы получат CancelledError
+        request_ids = [*self._pending, *self._streams] if request_ids is None else list(request_ids)
+        for request_id in request_ids:
+            future = self._pending.pop(request_id, None)
+            if future is not None and not future.done():
+                future.cancel()
+            chunks = self._streams.get(request_id)
+            if chunks is not None:
+                chunks.put_nowait(None)
+        if request_ids:
+            await self._publish_cancel(messages_pb2.Cancel(request_ids=request_ids).SerializeToString())
+        return request_ids
+
+    async def _publish_cancel(self, body):
+        await self._cancel_exchange.publish(Message(body=body), routing_key="")
+
+    async def _publish_stream_ack(self, body):
+        # Подтверждения потока идут тем же fanout, что и отмены: их получает воркер, отправляющий поток
+        await self._cancel_exchange.publish(Message(body=body, type=STREAM_ACK_TYPE), routing_key="")
@@ -1,4 +1,3 @@
-import datetime
 import logging
 import sys
 import time
@@ -7,17 +6,26 @@ from urllib.parse import urlparse
 
 import pika
 import yaml
+from google.protobuf.message import DecodeError
 from PyQt5.QtCore import QThread, pyqtSignal, pyqtSlot, QRegExp
 from PyQt5.QtGui import QRegExpValidator
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QSpinBox, QDoubleSpinBox, QCheckBox,
-    QPushButton, QTextEdit, QVBoxLayout, QHBoxLayout, QWidget, QLineEdit, QDialog, QScrollArea, QComboBox, QMessageBox
+    QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QLineEdit, QDialog, QScrollArea, QComboBox, QMessageBox
 )
 
+from qt.client.rabbitmq_client.acks import BatchAcker
+from qt.client.rabbitmq_client.log_view import LogView
+from qt.client.rabbitmq_client.pending import PendingRequests
+from qt.client.rabbitmq_client.results_view import ResultsView
 from qt.protos import messages_pb2
+from qt.tracing import TRACE_SEND, TraceWriter, now_us, stamps_from_headers
+from qt.transport.sharding import SHARD_EXCHANGE, SHARD_QUEUE_ARGUMENTS, routing_key, shard_queue
 
 logging.basicConfig(level=logging.DEBUG)
 
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"
+
 
 def load_config():
     try:
@@ -42,17 +50,25 @@ class ClientState:
 
 class RabbitMQWorker(QThread):
     response_received = pyqtSignal(dict)
+    request_sent = pyqtSignal(dict)
     connection_error = pyqtSignal(str)
-    send_request_signal = pyqtSignal(int, float)
+    send_request_signal = pyqtSignal(int, float, int)
 
-    def __init__(self, broker_url, request_queue, response_queue, timeout):
+    def __init__(self, broker_url, request_queue, response_queue, timeout, request_timeout=None, prefetch_count=200,
+                 cancel_exchange="cancel_exchange", direct_reply_to=False, trace_path=None, shards=0):
         super().__init__()
         self.broker_url = broker_url
         self.request_queue = request_queue
+        self.shards = shards
         self.response_queue = response_queue
-        self.request_id = None
+        self.cancel_exchange = cancel_exchange
+        self.direct_reply_to = direct_reply_to
+        self.return_address = DIRECT_REPLY_TO if direct_reply_to else response_queue
+        self.tracer = TraceWriter(trace_path) if trace_path else None
         self.running = False
         self.timeout = timeout
+        self.prefetch_count = prefetch_count
+        self.pending = PendingRequests(timeout=request_timeout)
 
         parsed_url = urlparse(self.broker_url)
         if parsed_url.scheme != 'amqp':
@@ -66,46 +82,122 @@ class RabbitMQWorker(QThread):
         )
         self.connection = pika.BlockingConnection(connection_params)
         self.channel = self.connection.channel()
+        self.acker = BatchAcker(self.channel, self.prefetch_count // 2)
 
-        self.channel.queue_declare(queue=self.response_queue, durable=True)
-        self.channel.queue_purge(queue=self.response_queue)
+        if not self.direct_reply_to:
+            self.channel.queue_declare(queue=self.response_queue, durable=True)
+            self.channel.queue_purge(queue=self.response_queue)
+        self._start_consuming()
 
         self.send_request_signal.connect(self._process_request)
 
-    def _process_request(self, number, process_time):
-        while True:
+    def _process_request(self, number, process_time, count=1):
+        # Вызывается в потоке GUI: запросы регистрируются в таблице ожидания,
+        # а публикация передаётся в поток воркера, владеющий соединением pika
+        requests = []
+        for _ in range(count):
+            request = messages_pb2.Request(
+                return_address=self.return_address,
+                request_id=str(uuid.uuid4()),
+                request=number,
+                proccess_time_in_seconds=process_time,
+            )
+            self.pending.add(request.request_id, number, process_time)
+            requests.append(request)
+
+        try:
+            self.connection.add_callback_threadsafe(lambda: self._publish(requests))
+        except Exception as e:
+            for request in requests:
+                self.pending.pop(request.request_id)
+            logging.error(f"Ошибка отправки запроса: {str(e)}")
+            self.connection_error.emit(f"Ошибка отправки запроса: {str(e)}")
+
+    def _publish(self, requests):
+        for request in requests:
+            for _ in range(5):
+                try:
+                    self.channel.basic_publish(
+                        exchange=SHARD_EXCHANGE if self.shards else '',
+                        routing_key=routing_key(self.request_queue, self.shards, request.request_id),
+                        body=request.SerializeToString(),
+                        properties=pika.BasicProperties(
+                            reply_to=DIRECT_REPLY_TO if self.direct_reply_to else None,
+                            # Сервер дописывает свои отметки времени и возвращает их в заголовках ответа
+                            headers={TRACE_SEND: now_us()} if self.tracer else None
+                        )
+                    )
+                    logging.debug(f"Отправлен запрос: {request}")
+                    self.request_sent.emit({
+                        "request_id": request.request_id,
+                        "number": request.request,
+                        "process_time": request.proccess_time_in_seconds
+                    })
+                    break
+
+                except (pika.exceptions.AMQPChannelError, pika.exceptions.AMQPConnectionError) as e:
+                    logging.error(f"Ошибка канала или соединения: {e}, перезапускаем соединение.")
+                    self._reconnect()
+                    time.sleep(2)
+
+                except Exception as e:
+                    self.pending.pop(request.request_id)
+                    logging.error(f"Ошибка отправки запроса: {str(e)}")
+                    self.connection_error.emit(f"Ошибка отправки запроса: {str(e)}")
+                    break
+
+    def cancel_all(self):
+        # Сервер снимает отложенные ответы и не обрабатывает ещё не полученные запросы;
+        # уже отправленные им ответы придут позже и будут проигнорированы
+        request_ids = [pending.request_id for pending in self.pending.pop_all()]
+        if request_ids:
             try:
-                self.request_id = str(uuid.uuid4())
-
-                request = messages_pb2.Request(
-                    return_address=self.response_queue,
-                    request_id=self.request_id,
-                    request=number,
-                    proccess_time_in_seconds=process_time,
-                )
-
-                self.channel.basic_publish(
-                    exchange='',
-                    routing_key=self.request_queue,
-                    body=request.SerializeToString()
-                )
-                logging.info(f"Отправлен запрос: {request}")
-
-                break
-
-            except pika.exceptions.AMQPChannelError:
-                logging.error("Ошибка канала, перезапускаем соединение и канал.")
-                self._reconnect()
-                time.sleep(2)
+                self.connection.add_callback_threadsafe(lambda: self._publish_cancel(request_ids))
+            except Exception as e:
+                logging.error(f"Ошибка отправки отмены: {str(e)}")
+        return request_ids
 
-            except pika.exceptions.AMQPConnectionError:
-                logging.error("Ошибка соединения, перезапускаем соединение.")
-                self._reconnect()
-                time.sleep(2)
+    def _publish_cancel(self, request_ids):
+        try:
+            self.channel.basic_publish(
+                exchange=self.cancel_exchange,
+                routing_key='',
+                body=messages_pb2.Cancel(request_ids=request_ids).SerializeToString()
+            )
+            logging.debug(f"Отправлена отмена {len(request_ids)} запросов")
+        except Exception as e:
+            logging.error(f"Ошибка отправки отмены: {str(e)}")
+            self.connection_error.emit(f"Ошибка отправки отмены: {str(e)}")
+
+    def _declare_shards(self):
+        # Очереди шардов объявляет и клиент: запросы не теряются, пока ни один сервер их не создал
+        self.channel.exchange_declare(exchange=SHARD_EXCHANGE, exchange_type='direct')
+        for index in range(self.shards):
+            queue = shard_queue(self.request_queue, index)
+            self.channel.queue_declare(queue=queue, arguments=SHARD_QUEUE_ARGUMENTS)
+            self.channel.queue_bind(queue=queue, exchange=SHARD_EXCHANGE, routing_key=queue)
+
+    def _start_consuming(self):
+        self.channel.exchange_declare(exchange=self.cancel_exchange, exchange_type='fanout')
+        if self.shards:
+            self._declare_shards()
+        if self.direct_reply_to:
+            # Псевдо-очередь direct reply-to работает только без подтверждений и только
+            # в канале, из которого публикуются запросы; очередь ответов не объявляется
+            self.channel.basic_consume(queue=DIRECT_REPLY_TO, on_message_callback=self._on_message, auto_ack=True)
+            return
+        # Брокер сам присылает ответы в пределах prefetch, колбэк вызывается из process_data_events
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
+        self.channel.basic_consume(queue=self.response_queue, on_message_callback=self._on_message)
 
-            except Exception as e:
-                logging.error(f"Ошибка отправки запроса: {str(e)}")
-                self.connection_error.emit(f"Ошибка отправки запроса: {str(e)}")
+    def _on_message(self, channel, method, properties, body):
+        # Сообщение подтверждается, даже если его не удалось обработать: иначе после переподключения
+        # брокер доставит его снова и ошибка повторится
+        try:
+            self._handle_response(body, properties.headers)
+        finally:
+            if not self.direct_reply_to:
+                self.acker.track(method.delivery_tag)
 
     def _reconnect(self):
         try:
@@ -113,7 +205,10 @@ class RabbitMQWorker(QThread):
                 self.connection.close()
             self.connection = pika.BlockingConnection(pika.URLParameters(self.broker_url))
             self.channel = self.connection.channel()
-            self.channel.queue_declare(queue=self.response_queue, durable=True)
+            self.acker.reset(self.channel)
+            if not self.direct_reply_to:
+                self.channel.queue_declare(queue=self.response_queue, durable=True)
+            self._start_consuming()
 
             logging.info("Переподключение выполнено успешно.")
         except Exception as e:
@@ -121,38 +216,77 @@ class RabbitMQWorker(QThread):
             self.connection_error.emit(f"Ошибка переподключения: {str(e)}")
 
     def stop(self):
+        self.running = False
         if self.connection.is_open:
-            self.connection.close()
+            self.connection.add_callback_threadsafe(self.connection.close)
             logging.info("Соединение с RabbitMQ закрыто.")
 
+    def _handle_response(self, body, headers=None):
+        returned_at = now_us()
+        response = messages_pb2.Response()
+        try:
+            response.ParseFromString(body)
+        except DecodeError as e:
+            logging.error(f"Не удалось разобрать ответ: {e}")
+            return
+
+        pending = self.pending.pop(response.request_id)
+        if pending is None:
+            self.response_received.emit({
+                "status": "204",
+                "response": {"request_id": response.request_id}
+            })
+            logging.warning(f"Пропущен неподходящий ответ: {response}")
+            return
+
+        if response.status == messages_pb2.Response.BUSY:
+            # Сервер перегружен и отказал без обработки: запрос можно повторить позже
+            self.response_received.emit({
+                "status": "503",
+                "response": {"request_id": response.request_id, "number": pending.number}
+            })
+            return
+
+        logging.debug(f"Получен ответ: {response}")
+        if self.tracer is not None and headers and TRACE_SEND in headers:
+            self.tracer.write(response.request_id, **stamps_from_headers(headers), back=returned_at)
+        self.response_received.emit({
+            "status": "200",
+            "response": {
+                "request_id": response.request_id,
+                "number": pending.number,
+                "result": response.response,
+                "sent_at": pending.sent_at,
+                "rtt": time.monotonic() - pending.sent_at
+            }
+        })
+
+    def _expire_requests(self):
+        for pending in self.pending.expire():
+            logging.warning(f"Истекло время ожидания ответа на запрос {pending.request_id}")
+            self.response_received.emit({
+                "status": "408",
+                "response": {"request_id": pending.request_id, "number": pending.number}
+            })
+
     def run(self):
-        while True:
+        self.running = True
+        while self.running:
             try:
-                for method_frame, properties, body in self.channel.consume(self.response_queue):
-                    response = messages_pb2.Response()
-                    response.ParseFromString(body)
-
-                    if response.request_id == self.request_id:
-                        logging.info(f"Получен ответ: {response}")
-                        self.response_received.emit({
-                            "status": "200",
-                            "response": {
-                                "request_id": response.request_id,
-                                "result": response.response
-                            }
-                        })
-                        break
-                    else:
-                        self.response_received.emit({
-                            "status": "204"
-                        })
-                        logging.warning(f"Пропущен неподходящий ответ: {response}")
-                    self.channel.basic_ack(method_frame.delivery_tag)
+                # Блокируется на сокете до прихода данных или таймаута: в простое CPU не тратится
+                self.connection.process_data_events(time_limit=0.5)
+                # Остаток пачки подтверждается после каждой порции доставок
+                self.acker.flush()
+                self._expire_requests()
 
             except Exception as e:
-                logging.error("Ошибка соединения, перезапускаем соединение.")
+                if not self.running:
+                    break
+                logging.error(f"Ошибка соединения: {e}, перезапускаем соединение.")
                 self._reconnect()
                 time.sleep(2)
+        if self.tracer is not None:
+            self.tracer.close()
 
 
 class ClientApp(QMainWindow):
@@ -161,7 +295,7 @@ class ClientApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("RabbitMQ Client")
-        self.setGeometry(100, 100, 620, 400)
+        self.setGeometry(100, 100, 720, 640)
 
         self.config = load_config()
         self.broker_url = self.config["broker_url"]
@@ -174,10 +308,17 @@ class ClientApp(QMainWindow):
             broker_url=self.broker_url,
             request_queue=self.config["request_queue"],
             response_queue=self.response_queue,
-            timeout=self.config["connection_timeout"]
+            timeout=self.config["connection_timeout"],
+            request_timeout=self.config.get("request_timeout") or None,
+            prefetch_count=self.config.get("client_prefetch_count") or 200,
+            cancel_exchange=self.config.get("cancel_exchange") or "cancel_exchange",
+            direct_reply_to=bool(self.config.get("direct_reply_to")),
+            trace_path=self.config.get("client_trace_path") or None,
+            shards=int(self.config.get("shards") or 0)
         )
         self.worker.response_received.connect(self.handle_response)
         self.worker.connection_error.connect(self.handle_error)
+        self.worker.start()
 
         self.current_state = None
         self.update_state(ClientState.READY)
@@ -197,8 +338,12 @@ class ClientApp(QMainWindow):
             lambda state: self.time_input.setEnabled(self.time_checkbox.isChecked())
         )
 
+        self.count_input = QSpinBox(self)
+        self.count_input.setRange(1, 10000)
+        self.count_input.setValue(1)
+
         self.send_button = QPushButton("Отправить запрос", self)
-        self.cancel_button = QPushButton("Отменить запрос", self)
+        self.cancel_button = QPushButton("Отменить запросы", self)
         self.cancel_button.setEnabled(False)
         self.send_button.clicked.connect(self.send_request)
         self.cancel_button.clicked.connect(self.cancel_request)
@@ -206,8 +351,11 @@ class ClientApp(QMainWindow):
         self.state_label = QLabel("Состояние: Готов", self)
         self.response_label = QLabel("Ответ: ", self)
 
-        self.log_widget = QTextEdit(self)
-        self.log_widget.setReadOnly(True)
+        self.results_view = ResultsView(parent=self)
+        self.clear_results_button = QPushButton("Очистить результаты", self)
+        self.clear_results_button.clicked.connect(self.results_view.results.clear)
+
+        self.log_view = LogView(max_lines=self.config.get("client_log_lines") or 5000, parent=self)
 
         self.settings_button = QPushButton("Настройки", self)
         self.settings_button.clicked.connect(self.open_settings)
@@ -220,6 +368,8 @@ class ClientApp(QMainWindow):
         input_layout.addWidget(self.number_input)
         input_layout.addWidget(self.time_checkbox)
         input_layout.addWidget(self.time_input)
+        input_layout.addWidget(QLabel("Количество:"))
+        input_layout.addWidget(self.count_input)
 
         button_layout.addWidget(self.send_button)
         button_layout.addWidget(self.cancel_button)
@@ -227,8 +377,10 @@ class ClientApp(QMainWindow):
         main_layout.addWidget(self.state_label)
         main_layout.addWidget(self.response_label)
         main_layout.addLayout(button_layout)
-        main_layout.addWidget(QLabel("Лог событий:"))
-        main_layout.addWidget(self.log_widget)
+        main_layout.addWidget(QLabel("Результаты:"))
+        main_layout.addWidget(self.results_view, stretch=2)
+        main_layout.addWidget(self.clear_results_button)
+        main_layout.addWidget(self.log_view, stretch=1)
         main_layout.addWidget(self.settings_button)
 
         central_widget = QWidget(self)
@@ -246,35 +398,44 @@ class ClientApp(QMainWindow):
 
     def update_state(self, state):
         self.current_state = state
-        self.state_label.setText(f"Состояние: {state}")
+        in_flight = len(self.worker.pending) if hasattr(self, "worker") else 0
+        if state == ClientState.WAITING:
+            self.state_label.setText(f"Состояние: {state} (в полёте: {in_flight})")
+        else:
+            self.state_label.setText(f"Состояние: {state}")
         self.state_changed.emit(state)
-        self.send_button.setEnabled(state == ClientState.READY)
         self.cancel_button.setEnabled(state == ClientState.WAITING)
 
+    def refresh_state(self):
+        self.update_state(ClientState.WAITING if len(self.worker.pending) else ClientState.READY)
+
     def send_request(self):
-        number = self.number_input.value()
+        number = int(self.number_input.value())
         process_time = self.time_input.value() if self.time_checkbox.isChecked() else 0
+        count = self.count_input.value()
 
-        self.log(f"Отправка запроса, число={number}, время обработки={process_time}", level="INFO")
-        self.update_state(ClientState.WAITING)
-
-        self.worker.send_request_signal.emit(number, process_time)
-
-        if not self.worker.isRunning():
-            self.worker.start()
+        self.log(f"Отправка запросов: {count}, число={number}, время обработки={process_time}", level="INFO")
+        self.worker.send_request_signal.emit(number, process_time, count)
+        self.refresh_state()
 
     def cancel_request(self):
-        self.log("Пользователь отменил запрос", level="INFO")
-        self.update_state(ClientState.READY)
+        cancelled = self.worker.cancel_all()
+        self.log(f"Пользователь отменил запросы: {len(cancelled)}", level="INFO")
+        self.refresh_state()
 
     @pyqtSlot(dict)
     def handle_response(self, response):
         if response['status'] == "200":
             self.log(f"Получен ответ: {response['response']}", level="INFO")
             self.response_label.setText(f"Ответ: {response['response']['result']}")
-            self.update_state(ClientState.READY)
+            self.results_view.add(response['response'])
+        elif response['status'] == "408":
+            self.log(f"Истекло время ожидания ответа: {response['response']['request_id']}", level="ERROR")
+        elif response['status'] == "503":
+            self.log(f"Сервер занят, запрос отклонён: {response['response']['request_id']}", level="WARNING")
         else:
             self.log("Ответ игнорируется, запрос отменен", level="INFO")
+        self.refresh_state()
 
     @pyqtSlot(str)
     def handle_error(self, error_message):
@@ -282,21 +443,13 @@ class ClientApp(QMainWindow):
         self.update_state(ClientState.READY)
 
     def log(self, message, level="DEBUG"):
-        now = datetime.datetime.now(datetime.timezone.utc).astimezone()
-        time_format = "%Y-%m-%d %H:%M:%S"
-        if level == "INFO":
-            self.log_widget.append(f"({now:{time_format}}) [INFO] {message}")
-        elif level == "ERROR":
-            self.log_widget.append(f"({now:{time_format}}) [ERROR] {message}")
+        self.log_view.append(level, f"({time.strftime('%Y-%m-%d %H:%M:%S')}) [{level}] {message}")
         logging.debug(message)
 
     def closeEvent(self, event):
-        self.channel.close()
-        self.connection.close()
-
         if self.worker.isRunning():
-            self.worker.running = False
             self.worker.stop()
+            self.worker.wait(2000)
         event.accept()
 
 
@@ -325,24 +478,78 @@ class SettingsDialog(QDialog):
             "broker_url": "Адрес брокера",
             "log_path": "Путь к логу",
             "request_queue": "Очередь запросов",
+            "shards": "Число шардов очереди запросов (0 = без шардов)",
             "response_queue": "Очередь ответов",
             "log_level": "Уровень логирования",
             "uuid": "UUID",
             "connection_timeout": "Таймаут подключения",
+            "cancel_exchange": "Exchange отмены запросов",
+            "client_log_lines": "Строк в логе окна (клиент)",
+            "client_trace_path": "Файл трассировки запросов (клиент, пусто = выкл.)",
+            "trace_path": "Файл трассировки запросов (сервер, пусто = выкл.)",
+            "client_prefetch_count": "Prefetch очереди ответов (клиент)",
+            "publish_channels": "Каналы публикации (сервер)",
+            "prefetch_count": "Prefetch (сервер)",
+            "max_concurrent_handlers": "Макс. обработчиков (сервер)",
+            "max_concurrent_streams": "Макс. потоков диапазонов (сервер)",
+            "min_concurrent_handlers": "Мин. обработчиков при адаптивном лимите (сервер)",
+            "adaptive_concurrency": "Адаптивный лимит обработчиков (сервер)",
+            "shed_load": "Отказ \"сервер занят\" при заполненной очереди к обработчикам (сервер)",
+            "workers": "Воркеры сервера (0 = по числу ядер)",
+            "ack_policy": "Подтверждение запросов (сервер)",
+            "cache_size": "Размер кэша результатов (сервер)",
+            "cache_ttl": "Время жизни кэша, с (сервер)",
+            "compute_in_thread": "Вычисления в потоке (сервер)",
+            "direct_reply_to": "Direct reply-to вместо очереди ответов",
+            "confirm_mode": "Подтверждения публикаций (сервер)",
+            "confirm_window": "Окно подтверждений (сервер)",
+            "log_max_bytes": "Размер файла лога до ротации (сервер)",
+            "log_backup_count": "Число архивных логов (сервер)",
+            "log_sample_info": "Доля INFO записей запросов (сервер)",
+            "log_sample_debug": "Доля DEBUG записей запросов (сервер)",
+            "request_timeout": "Таймаут ответа сверх времени обработки, с",
+            "drain_timeout": "Таймаут дообработки при перенастройке, с (сервер)",
+            "stream_ack_timeout": "Таймаут ожидания клиента потока, с (сервер)",
+            "metrics_host": "Адрес метрик (сервер)",
+            "metrics_port": "Порт метрик, 0 = выкл. (сервер)",
+            "transport": "Транспорт (сервер и консольный клиент)",
+            "socket_path": "Путь Unix-сокета (транспорт unix)",
+            "socket_write_timeout": "Таймаут клиента, не читающего ответы, с (транспорт unix)",
+            "event_loop": "Цикл событий (сервер, uvloop если установлен)",
+            "ready_path": "Файл готовности (сервер, пусто = выкл.)",
         }
 
         log_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+        ack_policies = ["early", "on_publish"]
+        confirm_modes = ["windowed", "per_message", "none"]
+        transports = ["amqp", "unix"]
+        event_loops = ["asyncio", "uvloop"]
 
         for key, value in self.config.items():
             row_layout = QHBoxLayout()
-            label = QLabel(labels[key], self)
+            label = QLabel(labels.get(key, key), self)
 
             if key == "connection_timeout":
                 input_field = QSpinBox(self)
                 input_field.setRange(1, 60)
                 input_field.setValue(int(value))
 
-            elif key in ["broker_url", "request_queue", "response_queue"]:
+            elif isinstance(value, bool):
+                input_field = QCheckBox(self)
+                input_field.setChecked(value)
+
+            elif isinstance(value, int):
+                input_field = QSpinBox(self)
+                input_field.setRange(0, 2147483647)
+                input_field.setValue(value)
+
+            elif isinstance(value, float):
+                input_field = QDoubleSpinBox(self)
+                input_field.setRange(0.0, 1000000.0)
+                input_field.setDecimals(3)
+                input_field.setValue(value)
+
+            elif key in ["broker_url", "request_queue", "response_queue", "cancel_exchange"]:
                 input_field = QLineEdit(self)
                 input_field.setText(str(value))
                 input_field.setReadOnly(True)
@@ -352,6 +559,26 @@ class SettingsDialog(QDialog):
                 input_field.addItems(log_levels)
                 input_field.setCurrentText(str(value))
 
+            elif key == "ack_policy":
+                input_field = QComboBox(self)
+                input_field.addItems(ack_policies)
+                input_field.setCurrentText(str(value))
+
+            elif key == "confirm_mode":
+                input_field = QComboBox(self)
+                input_field.addItems(confirm_modes)
+                input_field.setCurrentText(str(value))
+
+            elif key == "transport":
+                input_field = QComboBox(self)
+                input_field.addItems(transports)
+                input_field.setCurrentText(str(value))
+
+            elif key == "event_loop":
+                input_field = QComboBox(self)
+                input_field.addItems(event_loops)
+                input_field.setCurrentText(str(value))
+
             elif key == "uuid":
                 input_field = QLineEdit(self)
                 input_field.setText(str(value))
@@ -382,8 +609,10 @@ class SettingsDialog(QDialog):
             QMessageBox.warning(self, "Запрещено", "Нельзя изменять настройки в состоянии ОЖИДАНИЯ.")
             return
         for key, input_field in self.inputs.items():
-            if isinstance(input_field, QSpinBox):
+            if isinstance(input_field, (QSpinBox, QDoubleSpinBox)):
                 self.config[key] = input_field.value()
+            elif isinstance(input_field, QCheckBox):
+                self.config[key] = input_field.isChecked()
             elif isinstance(input_field, QComboBox):
                 self.config[key] = input_field.currentText()
             else:
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import yaml
+
+from qt.client.rabbitmq_client.async_client import AsyncClient, RequestTimeout, ServerBusy
+from qt.tracing import percentile
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "../../config.yaml")
+PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p999", 99.9))
+
+
+def parse_distribution(spec):
+    # const:0.5 | uniform:0:2 | exp:0.5 (среднее) — распределение времени обработки запроса
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(":")] if params else []
+    if kind == "const":
+        value = values[0] if values else 0.0
+        return lambda: value
+    if kind == "uniform":
+        low, high = values
+        return lambda: random.uniform(low, high)
+    if kind == "exp":
+        mean = values[0]
+        return lambda: random.expovariate(1.0 / mean) if mean > 0 else 0.0
+    raise ValueError(f"Неизвестное распределение: {spec}")
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.sent = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.busy = 0
+
+    def report(self, elapsed, args):
+        latencies = sorted(self.latencies)
+        return {
+            "label": args.label,
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "delay": args.delay,
+            "duration": elapsed,
+            "sent": self.sent,
+            "completed": len(latencies),
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "busy": self.busy,
+            "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "latency": {
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "max": latencies[-1] if latencies else None,
+                **{name: percentile(latencies, q) for name, q in PERCENTILES},
+            },
+        }
+
+
+async def one_request(client, stats, number, process_time, started_at):
+    stats.sent += 1
+    try:
+        await client.call(number, process_time)
+    except RequestTimeout:
+        stats.timeouts += 1
+        return
+    except ServerBusy:
+        stats.busy += 1
+        return
+    except Exception:
+        stats.errors += 1
+        return
+    # Задержка считается от запланированного момента отправки, а не фактического,
+    # чтобы не скрывать очередь на стороне генератора (coordinated omission)
+    stats.latencies.append(time.perf_counter() - started_at)
+
+
+async def closed_loop(client, stats, args, delay, deadline):
+    async def worker():
+        while time.perf_counter() < deadline:
+            await one_request(client, stats, random.randint(0, 1000), delay(), time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def open_loop(client, stats, args, delay, deadline):
+    limiter = asyncio.Semaphore(args.concurrency)
+    tasks = set()
+    next_at = time.perf_counter()
+
+    async def limited(started_at):
+        async with limiter:
+            await one_request(client, stats, random.randint(0, 1000), delay(), started_at)
+
+    while next_at < deadline:
+        now = time.perf_counter()
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+        task = asyncio.create_task(limited(next_at))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_at += random.expovariate(args.rate) if args.poisson else 1.0 / args.rate
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def run(args):
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    delay = parse_distribution(args.delay)
+    stats = Stats()
+
+    async with AsyncClient.from_config(config, timeout=args.timeout) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        if args.mode == "open":
+            await open_loop(client, stats, args, delay, deadline)
+        else:
+            await closed_loop(client, stats, args, delay, deadline)
+        elapsed = time.perf_counter() - started
+
+    return stats.report(elapsed, args)
+
+
+def format_report(report):
+    latency = report["latency"]
+
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.2f} мс"
+
+    return "\n".join([
+        f"Режим: {report['mode']}, длительность {report['duration']:.1f} с",
+        f"Отправлено: {report['sent']}, получено: {report['completed']}, "
+        f"ошибок: {report['errors']}, таймаутов: {report['timeouts']}, "
+        f"отказов \"сервер занят\": {report['busy']}",
+        f"Пропускная способность: {report['throughput']:.1f} ответов/с",
+        "Задержка: " + ", ".join(f"{name} {ms(latency[name])}" for name, _ in PERCENTILES)
+        + f", max {ms(latency['max'])}",
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор нагрузки и замер задержки запросов")
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed",
+                        help="closed - N одновременных клиентов, open - фиксированная частота запросов")
+    parser.add_argument("--concurrency", type=int, default=10,
+                        help="число клиентов (closed) или предел запросов в полёте (open)")
+    parser.add_argument("--rate", type=float, default=100.0, help="запросов в секунду для режима open")
+    parser.add_argument("--poisson", action="store_true", help="пуассоновский поток вместо равномерного")
+    parser.add_argument("--delay", default="const:0", help="время обработки: const:X, uniform:A:B, exp:MEAN")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="", help="метка прогона, например версия сервера")
+    parser.add_argument("--json", dest="json_path", help="записать отчёт в JSON файл ('-' - stdout)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(format_report(report))
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
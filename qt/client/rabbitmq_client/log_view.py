@@ -0,0 +1,78 @@
+import collections
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import QWidget, QPlainTextEdit, QComboBox, QLabel, QVBoxLayout, QHBoxLayout
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+
+class LogBuffer:
+    # Кольцевой буфер строк лога: старые строки вытесняются, новые копятся до сброса в виджет
+    def __init__(self, max_lines=5000):
+        self.max_lines = max_lines
+        self._lines = collections.deque(maxlen=max_lines)
+        self._pending = collections.deque(maxlen=max_lines)
+
+    def __len__(self):
+        return len(self._lines)
+
+    def append(self, level, line):
+        entry = (LEVELS.index(level), line)
+        self._lines.append(entry)
+        self._pending.append(entry)
+
+    def take_pending(self, min_level="DEBUG"):
+        threshold = LEVELS.index(min_level)
+        pending = [line for rank, line in self._pending if rank >= threshold]
+        self._pending.clear()
+        return pending
+
+    def lines(self, min_level="DEBUG"):
+        threshold = LEVELS.index(min_level)
+        return [line for rank, line in self._lines if rank >= threshold]
+
+
+class LogView(QWidget):
+    # Строки копятся в буфере и раз в interval мс выводятся одной вставкой plain text
+    def __init__(self, max_lines=5000, interval=100, level="INFO", parent=None):
+        super().__init__(parent)
+        self.buffer = LogBuffer(max_lines)
+
+        self.text = QPlainTextEdit(self)
+        self.text.setReadOnly(True)
+        self.text.setMaximumBlockCount(max_lines)
+
+        self.level_input = QComboBox(self)
+        self.level_input.addItems(LEVELS)
+        self.level_input.setCurrentText(level)
+        self.level_input.currentTextChanged.connect(self.refilter)
+
+        header = QHBoxLayout()
+        header.addWidget(QLabel("Лог событий:", self))
+        header.addStretch()
+        header.addWidget(QLabel("Уровень:", self))
+        header.addWidget(self.level_input)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(header)
+        layout.addWidget(self.text)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def append(self, level, line):
+        self.buffer.append(level, line)
+
+    def flush(self):
+        lines = self.buffer.take_pending(self.level_input.currentText())
+        if lines:
+            self.text.appendPlainText("\n".join(lines))
+
+    def refilter(self, level):
+        self.buffer.take_pending()
+        self.text.setPlainText("\n".join(self.buffer.lines(level)))
+        self.text.moveCursor(QTextCursor.End)
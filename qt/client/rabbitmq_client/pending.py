@@ -0,0 +1,64 @@
+import heapq
+import threading
+import time
+
+
+class PendingRequest:
+    __slots__ = ("request_id", "number", "process_time", "sent_at", "deadline", "payload")
+
+    def __init__(self, request_id, number, process_time, sent_at, deadline, payload=None):
+        self.request_id = request_id
+        self.number = number
+        self.process_time = process_time
+        self.sent_at = sent_at
+        self.deadline = deadline
+        self.payload = payload
+
+
+class PendingRequests:
+    # Таблица запросов в полёте: ответ находится по request_id за O(1),
+    # просроченные запросы извлекаются из кучи сроков
+    def __init__(self, timeout=None, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self._requests = {}
+        self._deadlines = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __contains__(self, request_id):
+        return request_id in self._requests
+
+    def add(self, request_id, number, process_time=0.0, payload=None):
+        now = self.clock()
+        deadline = now + (process_time or 0.0) + self.timeout if self.timeout else None
+        pending = PendingRequest(request_id, number, process_time, now, deadline, payload)
+        with self._lock:
+            self._requests[request_id] = pending
+            if deadline is not None:
+                heapq.heappush(self._deadlines, (deadline, request_id))
+        return pending
+
+    def pop(self, request_id):
+        with self._lock:
+            return self._requests.pop(request_id, None)
+
+    def pop_all(self):
+        with self._lock:
+            requests, self._requests = list(self._requests.values()), {}
+            self._deadlines = []
+        return requests
+
+    def expire(self, now=None):
+        now = self.clock() if now is None else now
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, request_id = heapq.heappop(self._deadlines)
+                # Запись в куче могла остаться от уже полученного ответа
+                pending = self._requests.pop(request_id, None)
+                if pending is not None:
+                    expired.append(pending)
+        return expired
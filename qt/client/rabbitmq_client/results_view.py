@@ -0,0 +1,100 @@
+import time
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from PyQt5.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+
+COLUMNS = ["ID запроса", "Число", "Результат", "Отправлен", "RTT, мс"]
+
+
+class ResultsModel(QAbstractTableModel):
+    # Ответы копятся в pending и вставляются одной пачкой строк в flush;
+    # строки хранятся кортежами, текст формируется только для видимых ячеек
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._pending = []
+
+    def add(self, response):
+        rtt = response.get("rtt", 0.0)
+        self._pending.append((
+            response["request_id"],
+            response.get("number"),
+            response.get("result"),
+            time.time() - rtt,
+            rtt,
+        ))
+
+    def flush(self):
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, []
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(pending) - 1)
+        self._rows.extend(pending)
+        self.endInsertRows()
+        return len(pending)
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._pending = []
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._rows[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            if index.column() == 3:
+                return time.strftime("%H:%M:%S", time.localtime(value)) + f".{int(value % 1 * 1000):03d}"
+            if index.column() == 4:
+                return f"{value * 1000:.1f}"
+            return str(value)
+        if role == Qt.TextAlignmentRole and index.column() > 0:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+
+class ResultsView(QTableView):
+    # Фиксированная высота строк и ширина колонок: таблица не пересчитывает размеры по содержимому
+    def __init__(self, interval=100, parent=None):
+        super().__init__(parent)
+        self.results = ResultsModel(self)
+        self.setModel(self.results)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setWordWrap(False)
+
+        vertical = self.verticalHeader()
+        vertical.setSectionResizeMode(QHeaderView.Fixed)
+        vertical.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        vertical.hide()
+        horizontal = self.horizontalHeader()
+        horizontal.setSectionResizeMode(QHeaderView.Interactive)
+        horizontal.setStretchLastSection(True)
+        self.setColumnWidth(0, 260)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def add(self, response):
+        self.results.add(response)
+
+    def flush(self):
+        # Прокручиваем вниз, только если пользователь и так смотрел на последние строки
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        if self.results.flush() and at_bottom:
+            self.scrollToBottom()
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+
+from qt.client.rabbitmq_client.async_client import AsyncClient
+from qt.protos import messages_pb2
+from qt.transport.unix import (
+    CANCEL, FRAME_TYPES, REQUEST, RESPONSE_BATCH, RESPONSE_CHUNK, STREAM_ACK, pack_frame, read_frame
+)
+
+DEFAULT_SOCKET_PATH = "/tmp/rabbitmq_server.sock"
+
+
+class UnixClient(AsyncClient):
+    # Интерфейс AsyncClient без брокера: одно долгоживущее соединение с сервером через Unix-сокет,
+    # запросы отправляются конвейером, не дожидаясь ответов, ответы сопоставляются по request_id
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=30.0, **kwargs):
+        super().__init__(f"unix://{socket_path}", request_queue="", timeout=timeout)
+        self.socket_path = socket_path
+        # Адрес возврата не используется: ответ приходит в то же соединение
+        self.reply_queue_name = "unix"
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        kwargs.setdefault("timeout", config.get("request_timeout") or 30.0)
+        return cls(config.get("socket_path") or DEFAULT_SOCKET_PATH, **kwargs)
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+        self._read_task = asyncio.create_task(self._read_responses(self._reader))
+        logging.info(f"Клиент подключен к {self.socket_path}")
+        return self
+
+    async def close(self):
+        await super().close()
+        if self._read_task is not None:
+            self._read_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == RESPONSE_BATCH:
+                    batch = messages_pb2.ResponseBatch()
+                    batch.ParseFromString(payload)
+                    for response in batch.responses:
+                        self._resolve(response)
+                elif kind == RESPONSE_CHUNK:
+                    chunk = messages_pb2.ResponseChunk()
+                    chunk.ParseFromString(payload)
+                    self._resolve_chunk(chunk)
+                else:
+                    response = messages_pb2.Response()
+                    response.ParseFromString(payload)
+                    self._resolve(response)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            # Сервер закрыл соединение: ответы на отправленные запросы уже не придут
+            logging.error(f"Соединение с {self.socket_path} закрыто: {e}")
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Соединение с {self.socket_path} закрыто"))
+            for chunks in self._streams.values():
+                chunks.put_nowait(ConnectionError(f"Соединение с {self.socket_path} закрыто"))
+
+    async def _write(self, kind, body):
+        if self._writer is None or self._writer.is_closing():
+            await self.connect()
+        self._writer.write(pack_frame(kind, body))
+        await self._writer.drain()
+
+    async def _publish(self, body, key, **properties):
+        await self._write(FRAME_TYPES.get(properties.get("type"), REQUEST), body)
+
+    async def _publish_cancel(self, body):
+        await self._write(CANCEL, body)
+
+    async def _publish_stream_ack(self, body):
+        await self._write(STREAM_ACK, body)
@@ -2,6 +2,8 @@ import pika
 import logging
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from qt.client.rabbitmq_client.acks import BatchAcker
+
 
 class RabbitMQWorker(QThread):
     response_received = pyqtSignal(str)
@@ -13,6 +15,7 @@ class RabbitMQWorker(QThread):
         self.connection = None
         self.channel = None
         self.running = True
+        self.acker = None
 
     def run(self):
         try:
@@ -22,18 +25,26 @@ class RabbitMQWorker(QThread):
             self.channel = self.connection.channel()
 
             self.channel.queue_declare(queue=self.config["queue_name"])
-            self.log("DEBUG: Ïîäêëþ÷åíèå ê RabbitMQ âûïîëíåíî.")
+            prefetch_count = self.config.get("prefetch_count", 200)
+            self.acker = BatchAcker(self.channel, prefetch_count // 2)
+            self.channel.basic_qos(prefetch_count=prefetch_count)
+            self.channel.basic_consume(queue=self.config["queue_name"], on_message_callback=self._on_message)
+            logging.debug("Подключение к RabbitMQ выполнено.")
 
+            # Вместо опроса basic_get в цикле ждём доставок на сокете
             while self.running:
-                method_frame, header_frame, body = self.channel.basic_get(queue=self.config["queue_name"])
-                if body:
-                    self.response_received.emit(body.decode())
+                self.connection.process_data_events(time_limit=0.5)
+                self.acker.flush()
         except Exception as e:
             self.error_occurred.emit(str(e))
         finally:
             if self.connection:
                 self.connection.close()
 
+    def _on_message(self, channel, method, properties, body):
+        self.response_received.emit(body.decode())
+        self.acker.track(method.delivery_tag)
+
     def stop(self):
         self.running = False
         self.quit()
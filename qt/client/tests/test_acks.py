@@ -0,0 +1,34 @@
+from client.rabbitmq_client.acks import BatchAcker
+
+
+class FakeChannel:
+    def __init__(self):
+        self.acks = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+
+def test_acks_are_batched_up_to_last_tag():
+    channel = FakeChannel()
+    acker = BatchAcker(channel, batch_size=3)
+    for tag in range(1, 8):
+        acker.track(tag)
+
+    assert channel.acks == [(3, True), (6, True)]
+    acker.flush()
+    acker.flush()
+    assert channel.acks == [(3, True), (6, True), (7, True)]
+
+
+def test_reset_drops_tags_of_old_channel():
+    old, new = FakeChannel(), FakeChannel()
+    acker = BatchAcker(old, batch_size=10)
+    acker.track(1)
+    acker.reset(new)
+    acker.flush()
+    acker.track(1)
+    acker.flush()
+
+    assert old.acks == []
+    assert new.acks == [(1, True)]
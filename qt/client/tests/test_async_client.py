@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+from aio_pika import Message
+
+from client.rabbitmq_client.async_client import AsyncClient, RequestTimeout, StreamFailed
+from qt.protos import messages_pb2
+from qt.transport import connect, memory
+from qt.transport.sharding import declare_shards
+
+BROKER_URL = "memory://client-tests"
+
+
+async def start_responder(delay=0.0, shards=0, routed=None):
+    # Минимальный сервер на брокере в памяти: отвечает удвоенным числом в reply_to или return_address
+    connection = await connect(BROKER_URL)
+    channel = await connection.channel()
+    queue = await channel.declare_queue("requests_queue")
+    _, shard_queues = await declare_shards(channel, "requests_queue", shards)
+
+    async def on_request(message):
+        if routed is not None:
+            routed.append(message.routing_key)
+        if message.type == "RangeRequest":
+            await send_chunks(message)
+            return
+        if message.type == "RequestBatch":
+            batch = messages_pb2.RequestBatch()
+            batch.ParseFromString(message.body)
+            requests = list(batch.requests)
+        else:
+            request = messages_pb2.Request()
+            request.ParseFromString(message.body)
+            requests = [request]
+        await message.ack()
+        await asyncio.sleep(delay)
+        responses = [messages_pb2.Response(request_id=r.request_id, response=r.request * 2) for r in requests]
+        body = messages_pb2.ResponseBatch(responses=responses).SerializeToString()
+        routing_key = message.reply_to or requests[0].return_address
+        await channel.default_exchange.publish(Message(body=body, type="ResponseBatch"), routing_key=routing_key)
+
+    async def send_chunks(message):
+        # Куски уходят в обратном порядке и с повтором: клиент должен восстановить порядок по seq
+        request = messages_pb2.RangeRequest()
+        request.ParseFromString(message.body)
+        await message.ack()
+        if request.start < 0:
+            # Отрицательное начало диапазона отвечающий отклоняет, как сервер - недопустимый диапазон
+            chunk = messages_pb2.ResponseChunk(
+                request_id=request.request_id, seq=0, end_of_stream=True, status=messages_pb2.Response.FAILED,
+                error="отрицательное начало"
+            )
+            await channel.default_exchange.publish(
+                Message(body=chunk.SerializeToString(), type="ResponseChunk"), routing_key=request.return_address
+            )
+            return
+        numbers = range(request.start, request.stop, request.step)
+        starts = range(0, len(numbers), request.chunk_size)
+        chunks = [
+            messages_pb2.ResponseChunk(
+                request_id=request.request_id,
+                seq=seq,
+                results=[n * 2 for n in numbers[first:first + request.chunk_size]],
+                end_of_stream=seq == len(starts) - 1
+            )
+            for seq, first in enumerate(starts)
+        ]
+        for chunk in [*reversed(chunks), chunks[0]]:
+            await channel.default_exchange.publish(
+                Message(body=chunk.SerializeToString(), type="ResponseChunk"), routing_key=request.return_address
+            )
+
+    for request_queue in [queue, *shard_queues]:
+        await request_queue.consume(on_request)
+    return connection
+
+
+def run(scenario, delay=0.0, routed=None, **client_options):
+    async def wrapper():
+        memory.reset()
+        responder = await start_responder(delay, client_options.get("shards", 0), routed)
+        try:
+            async with AsyncClient(BROKER_URL, "requests_queue", **client_options) as client:
+                await scenario(client)
+        finally:
+            await responder.close()
+
+    asyncio.run(wrapper())
+
+
+@pytest.mark.parametrize("direct_reply_to", [False, True])
+def test_call_and_call_many(direct_reply_to):
+    async def scenario(client):
+        assert await client.call(21) == 42
+        assert await client.call_many(range(5), batch_size=2) == [0, 2, 4, 6, 8]
+        assert client.in_flight == 0
+
+    run(scenario, direct_reply_to=direct_reply_to)
+
+
+def test_timeout_and_cancel():
+    async def scenario(client):
+        with pytest.raises(RequestTimeout):
+            await client.call(1, timeout=0.01)
+
+        call = asyncio.create_task(client.call(2))
+        await asyncio.sleep(0.01)
+        assert len(await client.cancel()) == 1
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert client.in_flight == 0
+
+    run(scenario, delay=0.05)
+
+
+def test_sharded_calls():
+    routed = []
+
+    async def scenario(client):
+        assert await client.call(1, key="user-1") == 2
+        assert await client.call(2, key="user-1") == 4
+        assert routed[0] == routed[1] != "requests_queue"
+        assert await client.call_many(range(60), batch_size=7) == [2 * n for n in range(60)]
+        assert set(routed) == {f"requests_queue.shard{index}" for index in range(3)}
+
+    run(scenario, routed=routed, shards=3)
+
+
+def test_stream_reorders_chunks():
+    async def scenario(client):
+        chunks = [results async for results in client.stream(0, 25, 2, chunk_size=4)]
+        assert [len(results) for results in chunks] == [4, 4, 4, 1]
+        assert sum(chunks, []) == [n * 2 for n in range(0, 25, 2)]
+        assert not client._streams
+
+    run(scenario)
+
+
+def test_stream_failed_by_server_raises():
+    async def scenario(client):
+        with pytest.raises(StreamFailed) as error:
+            async for _ in client.stream(-1, 10):
+                pass
+        assert error.value.error == "отрицательное начало"
+        assert not client._streams
+
+    run(scenario)
+
+
+def test_stream_reports_consumed_chunks():
+    async def scenario(client):
+        # Подтверждения потока идут в fanout отмен; отвечающий их не учитывает, тест только записывает
+        connection = await connect(BROKER_URL)
+        channel = await connection.channel()
+        control = await channel.declare_queue(exclusive=True)
+        await control.bind(await channel.declare_exchange("cancel_exchange", "fanout"))
+        acks = []
+
+        async def on_control(message):
+            stream_ack = messages_pb2.StreamAck()
+            stream_ack.ParseFromString(message.body)
+            acks.append((message.type, stream_ack.consumed))
+
+        await control.consume(on_control, no_ack=True)
+        chunks = [results async for results in client.stream(0, 8, chunk_size=1, window=4)]
+        await asyncio.sleep(0.01)
+        assert len(chunks) == 8
+        # Каждые window / 2 забранных куска; после последнего подтверждать нечего
+        assert acks == [("StreamAck", 2), ("StreamAck", 4), ("StreamAck", 6)]
+
+        with pytest.raises(ValueError):
+            async for _ in client.stream(0, 10, 0):
+                pass
+        await connection.close()
+
+    run(scenario)
@@ -0,0 +1,15 @@
+import random
+
+import pytest
+
+from client.rabbitmq_client.loadgen import parse_distribution
+
+
+def test_parse_distribution():
+    random.seed(1)
+    assert parse_distribution("const:0.5")() == 0.5
+    assert parse_distribution("const")() == 0.0
+    assert all(1.0 <= parse_distribution("uniform:1:2")() <= 2.0 for _ in range(100))
+    assert parse_distribution("exp:0")() == 0.0
+    with pytest.raises(ValueError):
+        parse_distribution("normal:1")
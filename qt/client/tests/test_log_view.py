@@ -0,0 +1,21 @@
+from client.rabbitmq_client.log_view import LogBuffer
+
+
+def test_buffer_keeps_only_last_lines():
+    buffer = LogBuffer(max_lines=3)
+    for i in range(5):
+        buffer.append("INFO", f"line {i}")
+
+    assert len(buffer) == 3
+    assert buffer.lines() == ["line 2", "line 3", "line 4"]
+
+
+def test_pending_lines_are_taken_once_and_filtered_by_level():
+    buffer = LogBuffer()
+    buffer.append("DEBUG", "debug")
+    buffer.append("INFO", "info")
+    buffer.append("ERROR", "error")
+
+    assert buffer.take_pending("INFO") == ["info", "error"]
+    assert buffer.take_pending() == []
+    assert buffer.lines("ERROR") == ["error"]
@@ -0,0 +1,27 @@
+from client.rabbitmq_client.pending import PendingRequests
+
+
+def test_pop_routes_response_to_its_request():
+    pending = PendingRequests()
+    pending.add("a", 1)
+    pending.add("b", 2)
+
+    assert pending.pop("b").number == 2
+    assert pending.pop("b") is None
+    assert "a" in pending
+    assert len(pending) == 1
+
+
+def test_expire_respects_process_time_and_answered_requests():
+    now = [0.0]
+    pending = PendingRequests(timeout=5.0, clock=lambda: now[0])
+    pending.add("fast", 1)
+    pending.add("slow", 2, process_time=10.0)
+    pending.add("answered", 3)
+    pending.pop("answered")
+
+    now[0] = 6.0
+    assert [p.request_id for p in pending.expire()] == ["fast"]
+    now[0] = 16.0
+    assert [p.request_id for p in pending.expire()] == ["slow"]
+    assert len(pending) == 0
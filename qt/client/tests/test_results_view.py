@@ -0,0 +1,20 @@
+from PyQt5.QtCore import Qt
+
+from client.rabbitmq_client.results_view import ResultsModel
+
+
+def test_responses_are_inserted_in_one_batch():
+    model = ResultsModel()
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+
+    for i in range(3):
+        model.add({"request_id": f"id-{i}", "number": i, "result": i * 2, "rtt": 0.0125})
+    assert model.rowCount() == 0
+
+    assert model.flush() == 3
+    assert model.flush() == 0
+    assert inserted == [(0, 2)]
+    assert model.rowCount() == 3
+    assert model.data(model.index(2, 2), Qt.DisplayRole) == "4"
+    assert model.data(model.index(0, 4), Qt.DisplayRole) == "12.5"
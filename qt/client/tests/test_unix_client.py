@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from client.rabbitmq_client.async_client import AsyncClient
+from client.rabbitmq_client.unix_client import UnixClient
+from qt.protos import messages_pb2
+from qt.transport.unix import CANCEL, REQUEST_BATCH, RESPONSE, RESPONSE_BATCH, pack_frame, read_frame
+
+
+async def start_responder(socket_path, cancelled):
+    # Отвечает удвоенным числом в то же соединение; отмены только запоминает
+    async def serve(reader, writer):
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == CANCEL:
+                    cancel = messages_pb2.Cancel()
+                    cancel.ParseFromString(payload)
+                    cancelled.extend(cancel.request_ids)
+                elif kind == REQUEST_BATCH:
+                    batch = messages_pb2.RequestBatch()
+                    batch.ParseFromString(payload)
+                    responses = [messages_pb2.Response(request_id=r.request_id, response=r.request * 2)
+                                 for r in batch.requests]
+                    writer.write(pack_frame(RESPONSE_BATCH, messages_pb2.ResponseBatch(responses=responses).SerializeToString()))
+                else:
+                    request = messages_pb2.Request()
+                    request.ParseFromString(payload)
+                    if request.proccess_time_in_seconds:
+                        continue
+                    response = messages_pb2.Response(request_id=request.request_id, response=request.request * 2)
+                    writer.write(pack_frame(RESPONSE, response.SerializeToString()))
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    return await asyncio.start_unix_server(serve, path=socket_path)
+
+
+def test_unix_client_pipelines_calls_over_one_connection(tmp_path):
+    socket_path = str(tmp_path / "server.sock")
+
+    async def scenario():
+        cancelled = []
+        responder = await start_responder(socket_path, cancelled)
+        client = AsyncClient.from_config({"transport": "unix", "socket_path": socket_path})
+        assert type(client).__name__ == UnixClient.__name__
+
+        async with client:
+            assert await asyncio.gather(*(client.call(i) for i in range(100))) == [i * 2 for i in range(100)]
+            assert await client.call_many([1, 2, 3]) == [2, 4, 6]
+
+            # Запрос со временем обработки остаётся без ответа, пока его не отменят
+            call = asyncio.create_task(client.call(7, process_time=10))
+            await asyncio.sleep(0.01)
+            request_ids = await client.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+            await asyncio.sleep(0.01)
+            assert cancelled == request_ids
+
+        responder.close()
+        await responder.wait_closed()
+
+    asyncio.run(scenario())
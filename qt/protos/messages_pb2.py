@@ -24,15 +24,31 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0emessages.proto\x12\x11TestTask.Messages\"h\n\x07Request\x12\x16\n\x0ereturn_address\x18\x01 \x02(\t\x12\x12\n\nrequest_id\x18\x02 \x02(\t\x12 \n\x18proccess_time_in_seconds\x18\x03 \x01(\x02\x12\x0f\n\x07request\x18\x04 \x02(\x05\"0\n\x08Response\x12\x12\n\nrequest_id\x18\x01 \x02(\t\x12\x10\n\x08response\x18\x02 \x02(\x05')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0emessages.proto\x12\x11TestTask.Messages\"h\n\x07Request\x12\x16\n\x0ereturn_address\x18\x01 \x02(\t\x12\x12\n\nrequest_id\x18\x02 \x02(\t\x12 \n\x18proccess_time_in_seconds\x18\x03 \x01(\x02\x12\x0f\n\x07request\x18\x04 \x02(\x05\"\x90\x01\n\x08Response\x12\x12\n\nrequest_id\x18\x01 \x02(\t\x12\x10\n\x08response\x18\x02 \x02(\x05\x12\x36\n\x06status\x18\x03 \x01(\x0e\x32\".TestTask.Messages.Response.Status:\x02OK\"&\n\x06Status\x12\x06\n\x02OK\x10\x00\x12\x08\n\x04\x42USY\x10\x01\x12\n\n\x06\x46\x41ILED\x10\x02\"<\n\x0cRequestBatch\x12,\n\x08requests\x18\x01 \x03(\x0b\x32\x1a.TestTask.Messages.Request\"?\n\rResponseBatch\x12.\n\tresponses\x18\x01 \x03(\x0b\x32\x1b.TestTask.Messages.Response\"\x1d\n\x06\x43\x61ncel\x12\x13\n\x0brequest_ids\x18\x01 \x03(\t\"\x95\x01\n\x0cRangeRequest\x12\x16\n\x0ereturn_address\x18\x01 \x02(\t\x12\x12\n\nrequest_id\x18\x02 \x02(\t\x12\r\n\x05start\x18\x03 \x02(\x05\x12\x0c\n\x04stop\x18\x04 \x02(\x05\x12\x0f\n\x04step\x18\x05 \x01(\x05:\x01\x31\x12\x18\n\nchunk_size\x18\x06 \x01(\r:\x04\x31\x30\x30\x30\x12\x11\n\x06window\x18\x07 \x01(\r:\x01\x30\"\xaa\x01\n\rResponseChunk\x12\x12\n\nrequest_id\x18\x01 \x02(\t\x12\x0b\n\x03seq\x18\x02 \x02(\r\x12\x13\n\x07results\x18\x03 \x03(\x05\x42\x02\x10\x01\x12\x1c\n\rend_of_stream\x18\x04 \x01(\x08:\x05\x66\x61lse\x12\x36\n\x06status\x18\x05 \x01(\x0e\x32\".TestTask.Messages.Response.Status:\x02OK\x12\r\n\x05\x65rror\x18\x06 \x01(\t\"I\n\tStreamAck\x12\x12\n\nrequest_id\x18\x01 \x02(\t\x12\x10\n\x08\x63onsumed\x18\x02 \x02(\r\x12\x16\n\x0ereturn_address\x18\x03 \x01(\t')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'messages_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_RESPONSECHUNK'].fields_by_name['results']._loaded_options = None
+  _globals['_RESPONSECHUNK'].fields_by_name['results']._serialized_options = b'\020\001'
   _globals['_REQUEST']._serialized_start=37
   _globals['_REQUEST']._serialized_end=141
-  _globals['_RESPONSE']._serialized_start=143
-  _globals['_RESPONSE']._serialized_end=191
+  _globals['_RESPONSE']._serialized_start=144
+  _globals['_RESPONSE']._serialized_end=288
+  _globals['_RESPONSE_STATUS']._serialized_start=250
+  _globals['_RESPONSE_STATUS']._serialized_end=288
+  _globals['_REQUESTBATCH']._serialized_start=290
+  _globals['_REQUESTBATCH']._serialized_end=350
+  _globals['_RESPONSEBATCH']._serialized_start=352
+  _globals['_RESPONSEBATCH']._serialized_end=415
+  _globals['_CANCEL']._serialized_start=417
+  _globals['_CANCEL']._serialized_end=446
+  _globals['_RANGEREQUEST']._serialized_start=449
+  _globals['_RANGEREQUEST']._serialized_end=598
+  _globals['_RESPONSECHUNK']._serialized_start=601
+  _globals['_RESPONSECHUNK']._serialized_end=771
+  _globals['_STREAMACK']._serialized_start=773
+  _globals['_STREAMACK']._serialized_end=846
 # @@protoc_insertion_point(module_scope)
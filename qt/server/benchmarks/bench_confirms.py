@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import os
+import time
+
+import yaml
+
+from qt.server.rabbitmq_server.publisher import Publisher, CONFIRM_MODES
+from qt.transport import connect
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "../../config.yaml")
+BENCH_QUEUE = "bench_confirms_queue"
+
+
+async def publish_all(broker_url, body, count, concurrency, pool_size, confirm_mode, confirm_window):
+    publisher = Publisher(
+        broker_url,
+        pool_size=pool_size,
+        confirm_mode=confirm_mode,
+        confirm_window=confirm_window
+    )
+    await publisher.connect()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await publisher.publish(body, BENCH_QUEUE)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(count)))
+        return time.perf_counter() - started, publisher.nacks
+    finally:
+        await publisher.close()
+
+
+async def run(args):
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    broker_url = args.broker_url or config["broker_url"]
+    body = b"x" * args.size
+
+    connection = await connect(broker_url)
+    channel = await connection.channel()
+    queue = await channel.declare_queue(BENCH_QUEUE, auto_delete=True)
+
+    for mode in args.modes:
+        elapsed, nacks = await publish_all(
+            broker_url, body, args.count, args.concurrency, args.pool_size, mode, args.window
+        )
+        print(f"{mode:12} {args.count} публикаций за {elapsed:.3f} c: "
+              f"{args.count / elapsed:.0f} публикаций/с, nack: {nacks}")
+        await queue.purge()
+
+    await queue.delete()
+    await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение режимов подтверждения публикаций")
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--broker-url", default=None, help="memory://bench - брокер в памяти процесса, без RabbitMQ")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--modes", nargs="+", choices=CONFIRM_MODES, default=list(CONFIRM_MODES))
+    asyncio.run(run(parser.parse_args()))
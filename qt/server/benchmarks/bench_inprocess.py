@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import json
+import time
+
+import qt.server.rabbitmq_server.__main__ as server
+from qt.client.rabbitmq_client.async_client import AsyncClient
+from qt.client.rabbitmq_client.loadgen import Stats, closed_loop, format_report, open_loop, parse_distribution
+from qt.transport import memory
+
+BROKER_URL = "memory://bench"
+
+
+async def run(args):
+    # Сервер и клиент в одном процессе на брокере в памяти: замеряется накладной расход
+    # самого сервера и клиента без сети и RabbitMQ
+    server.config = server.ServerConfig(
+        broker_url=BROKER_URL,
+        metrics_port=0,
+        max_concurrent_handlers=args.handlers,
+        prefetch_count=args.prefetch,
+        confirm_mode="none",
+        adaptive_concurrency=args.adaptive,
+        shed_load=args.shed,
+        shards=args.shards,
+    )
+    server_task = asyncio.create_task(server.main())
+    broker = memory.get_broker("bench")
+    while server.consumer is None or server.config.request_queue not in broker.queues:
+        await asyncio.sleep(0.001)
+
+    stats = Stats()
+    delay = parse_distribution(args.delay)
+    try:
+        async with AsyncClient(BROKER_URL, server.config.request_queue, timeout=args.timeout,
+                               shards=args.shards) as client:
+            started = time.perf_counter()
+            deadline = started + args.duration
+            if args.mode == "open":
+                await open_loop(client, stats, args, delay, deadline)
+            else:
+                await closed_loop(client, stats, args, delay, deadline)
+            elapsed = time.perf_counter() - started
+    finally:
+        server_task.cancel()
+        await asyncio.gather(server_task, return_exceptions=True)
+    return stats.report(elapsed, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузка на сервер через брокер в памяти процесса")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=5000.0)
+    parser.add_argument("--poisson", action="store_true")
+    parser.add_argument("--delay", default="const:0")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--handlers", type=int, default=100)
+    parser.add_argument("--prefetch", type=int, default=100)
+    parser.add_argument("--shards", type=int, default=0, help="число шардов очереди запросов")
+    parser.add_argument("--adaptive", action="store_true", help="адаптивный лимит обработчиков")
+    parser.add_argument("--shed", action="store_true", help="отказ \"сервер занят\" при заполненной очереди к обработчикам")
+    parser.add_argument("--label", default="memory")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
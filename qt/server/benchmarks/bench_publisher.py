@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+import time
+
+import yaml
+from aio_pika import Message
+
+from qt.server.rabbitmq_server.publisher import Publisher
+from qt.transport import connect
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "../../config.yaml")
+BENCH_QUEUE = "bench_publisher_queue"
+
+
+async def publish_per_request(broker_url, body, count, concurrency):
+    # Старое поведение handle_request: новое соединение и канал на каждый ответ
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            connection = await connect(broker_url)
+            try:
+                channel = await connection.channel()
+                await channel.default_exchange.publish(Message(body=body), routing_key=BENCH_QUEUE)
+            finally:
+                await connection.close()
+
+    await asyncio.gather(*(one() for _ in range(count)))
+
+
+async def publish_pooled(broker_url, body, count, concurrency, pool_size):
+    publisher = Publisher(broker_url, pool_size=pool_size)
+    await publisher.connect()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await publisher.publish(body, BENCH_QUEUE)
+
+    try:
+        await asyncio.gather(*(one() for _ in range(count)))
+    finally:
+        await publisher.close()
+
+
+async def run(args):
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    broker_url = args.broker_url or config["broker_url"]
+    body = b"x" * args.size
+
+    connection = await connect(broker_url)
+    channel = await connection.channel()
+    queue = await channel.declare_queue(BENCH_QUEUE, auto_delete=True)
+
+    results = {}
+    for name, coro in (
+        ("per_request", lambda: publish_per_request(broker_url, body, args.count, args.concurrency)),
+        ("pooled", lambda: publish_pooled(broker_url, body, args.count, args.concurrency, args.pool_size)),
+    ):
+        started = time.perf_counter()
+        await coro()
+        elapsed = time.perf_counter() - started
+        results[name] = args.count / elapsed
+        print(f"{name:12} {args.count} ответов за {elapsed:.3f} c: {results[name]:.0f} ответов/с")
+        await queue.purge()
+
+    print(f"Ускорение: x{results['pooled'] / results['per_request']:.1f}")
+    await queue.delete()
+    await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение скорости публикации ответов")
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--broker-url", default=None, help="memory://bench - брокер в памяти процесса, без RabbitMQ")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--size", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
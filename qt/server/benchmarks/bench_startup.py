@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "../../config.yaml")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
+
+
+def run_command(code):
+    # Время жизни процесса python -c: сам интерпретатор или интерпретатор плюс импорт сервера
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
+    return time.perf_counter() - started
+
+
+def start_until_ready(config_path, ready_path, timeout):
+    # От запуска процесса до появления файла готовности; затем сервер останавливается через SIGTERM
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "qt.server.rabbitmq_server", "--config", config_path, "--workers", "1"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while not os.path.exists(ready_path):
+            if process.poll() is not None:
+                raise RuntimeError(f"Сервер завершился с кодом {process.returncode} до готовности")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"Сервер не стал готов за {timeout} с")
+            time.sleep(0.001)
+        return time.perf_counter() - started
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(10)
+
+
+def summary(samples):
+    return {
+        "min": min(samples),
+        "p50": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "max": max(samples),
+    }
+
+
+def run(args):
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+
+    with tempfile.TemporaryDirectory() as directory:
+        ready_path = os.path.join(directory, "ready.json")
+        config.update(
+            transport=args.transport,
+            event_loop=args.event_loop,
+            socket_path=os.path.join(directory, "server.sock"),
+            ready_path=ready_path,
+            log_path=os.path.join(directory, "server.log"),
+            trace_path="",
+            metrics_port=0,
+        )
+        if args.broker_url:
+            config["broker_url"] = args.broker_url
+        config_path = os.path.join(directory, "config.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump(config, f)
+
+        results = {"interpreter": [], "import": [], "ready": []}
+        for _ in range(args.runs):
+            results["interpreter"].append(run_command("pass"))
+            results["import"].append(run_command("import qt.server.rabbitmq_server.__main__"))
+            results["ready"].append(start_until_ready(config_path, ready_path, args.timeout))
+    return {name: summary(samples) for name, samples in results.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Время запуска сервера до готовности")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--transport", choices=("unix", "amqp"), default="unix",
+                        help="unix не требует брокера; amqp включает подключение к RabbitMQ")
+    parser.add_argument("--broker-url", default=None)
+    parser.add_argument("--event-loop", choices=("asyncio", "uvloop"), default="asyncio")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'этап':<12}{'min':>10}{'p50':>10}{'mean':>10}{'max':>10}")
+        for name, values in report.items():
+            print(f"{name:<12}" + "".join(f"{values[key] * 1000:>8.1f}мс" for key in ("min", "p50", "mean", "max")))
@@ -1,102 +1,872 @@
+import argparse
 import asyncio
 import logging
-import yaml
-from aio_pika import connect, IncomingMessage, Message, ExchangeType
+import math
+import os
+import signal
+import time
 from qt.protos import messages_pb2
+from qt.server.rabbitmq_server.cache import ResultCache
+from qt.server.rabbitmq_server.cancellation import CancelListener, CancelRegistry
+from qt.server.rabbitmq_server.concurrency import AdaptiveLimit, ConcurrencyLimiter
+from qt.server.rabbitmq_server.config import CONFIG_PATH, ConfigWatcher, ServerConfig, changed_fields, load_config
+from qt.server.rabbitmq_server.consumer import RequestConsumer
+from qt.server.rabbitmq_server.logs import request_log, reset_after_fork, setup_logging
+from qt.server.rabbitmq_server.metrics import REGISTRY, start_metrics_server
+from qt.server.rabbitmq_server.publisher import Publisher
+from qt.server.rabbitmq_server.readiness import Readiness
+from qt.server.rabbitmq_server.scheduler import DelayScheduler
+from qt.server.rabbitmq_server.socket_server import SocketServer
+from qt.server.rabbitmq_server.streams import StreamWindow
+from qt.server.rabbitmq_server.supervisor import Supervisor, default_workers
 from qt.server.rabbitmq_server.utils import double_number
+from qt.tracing import TRACE_DONE, TRACE_PUB, TRACE_RECV, TRACE_SEND, TraceWriter, now_us, stamps_from_headers
+from qt.transport.sharding import claimed_shards
 
-with open("../../config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+# Конфиг читается при запуске, а не при импорте: модуль можно импортировать в тестах
+config = ServerConfig()
 
 
-def setup_logging(log_level, log_path):
-    root_logger = logging.getLogger()
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
+worker_index = 0
+worker_count = 1
+supervised = False
 
-    file_handler = logging.FileHandler(log_path, encoding="utf-8")
-    stream_handler = logging.StreamHandler()
 
-    logging.basicConfig(
-        level=getattr(logging, log_level),
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[file_handler, stream_handler]
+def worker_path(path):
+    # Дописывать и ротировать один файл из нескольких процессов небезопасно: у каждого воркера свой файл
+    if not supervised or not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{worker_index}{ext}"
+
+
+def configure_logging(force=False):
+    log_path = worker_path(config.log_path)
+    sample_rates = {logging.INFO: config.log_sample_info, logging.DEBUG: config.log_sample_debug}
+    args = (config.log_level, log_path, config.log_max_bytes, config.log_backup_count, sample_rates)
+    if force:
+        reset_after_fork(*args)
+    else:
+        setup_logging(*args)
+
+
+REQUEST_BATCH_TYPE = "RequestBatch"
+RESPONSE_BATCH_TYPE = "ResponseBatch"
+RANGE_REQUEST_TYPE = "RangeRequest"
+RESPONSE_CHUNK_TYPE = "ResponseChunk"
+
+MAX_CHUNK_SIZE = 65536
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"
+
+ACK_EARLY = "early"
+ACK_ON_PUBLISH = "on_publish"
+
+TRANSPORT_AMQP = "amqp"
+TRANSPORT_UNIX = "unix"
+
+EVENT_LOOP_UVLOOP = "uvloop"
+
+publisher = None
+limiter = None
+adaptive_limit = None
+scheduler = None
+cache = None
+cancels = None
+cancel_listener = None
+consumer = None
+socket_server = None
+tracer = None
+readiness = None
+metrics_server = None
+consumer_restart = None
+stream_limiter = None
+# Окна потоков диапазонов по (адрес возврата, request_id)
+streams = {}
+# Публикаторы, заменённые при перенастройке: пока они дорабатывают, их счётчики складываются с текущим,
+# после закрытия - переносятся в retired_totals, чтобы счётчики метрик не уменьшались
+draining_publishers = set()
+retired_totals = {"reconnects": 0, "nacks": 0}
+
+REQUESTS = REGISTRY.counter("rabbitmq_server_requests_total", "Принятые запросы по типу сообщения")
+RESPONSES = REGISTRY.counter("rabbitmq_server_responses_total", "Отправленные ответные сообщения")
+ERRORS = REGISTRY.counter("rabbitmq_server_errors_total", "Ошибки по этапам обработки")
+SHED = REGISTRY.counter("rabbitmq_server_shed_total", "Запросы, получившие ответ \"сервер занят\" без обработки")
+CONSUMER_RECONNECTS = REGISTRY.counter("rabbitmq_server_consumer_reconnects_total", "Переподключения потребителя запросов")
+STARTUP = REGISTRY.gauge("rabbitmq_server_startup_seconds", "Время от запуска до готовности по этапам: connect, ready")
+STAGE_LATENCY = REGISTRY.histogram("rabbitmq_server_stage_latency_seconds", "Задержка по этапам: parse, compute, delay, publish, handle")
+
+
+class DeferredAck:
+    # Подтверждает входящее сообщение, когда отправлены все ответы на него
+    def __init__(self, message, remaining):
+        self.message = message
+        self.remaining = remaining
+        self.failed = False
+        self.abandoned = False
+
+    def abandon(self):
+        # Канал сообщения закрыт, брокер доставит его снова: подтверждать больше нечего
+        self.abandoned = True
+
+    async def done(self, ok):
+        if self.abandoned:
+            return
+        self.failed = self.failed or not ok
+        self.remaining -= 1
+        if self.remaining == 0:
+            if self.failed:
+                await self.message.nack(requeue=True)
+            else:
+                await self.message.ack()
+
+
+async def compute(number):
+    started = time.perf_counter()
+    try:
+        return await _compute(number)
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage="compute")
+
+
+async def _compute(number):
+    if config.compute_in_thread:
+        loop = asyncio.get_running_loop()
+        return await cache.compute_async(number, loop.run_in_executor, None, double_number, number)
+    return await cache.compute_async(number, double_number, number)
+
+
+async def process_request(request):
+    return messages_pb2.Response(
+        request_id=request.request_id,
+        response=await compute(request.request)
     )
-    logging.info("Логирование обновлено")
 
 
-# Первоначальная настройка
-setup_logging(config["log_level"], config["log_path"])
+def reply_address(request, reply_to):
+    # Direct reply-to: ответ идёт в псевдо-очередь канала клиента из свойства reply_to. Клиент с direct reply-to
+    # указывает её и в return_address, поэтому reply_to учитывается и без флага на сервере;
+    # ответ на запрос из Unix-сокета - в то же соединение
+    direct = config.direct_reply_to or request.return_address == DIRECT_REPLY_TO
+    if reply_to and (direct or socket_server is not None and reply_to in socket_server.connections):
+        return reply_to
+    return request.return_address
 
 
-async def handle_request(message: IncomingMessage):
-    async with message.process():
-        request = messages_pb2.Request()
+async def build_replies(body, reply_to=None):
+    started = time.perf_counter()
+    request = messages_pb2.Request()
+    request.ParseFromString(body)
+    STAGE_LATENCY.observe(time.perf_counter() - started, stage="parse")
+    request_log.debug("Получен запрос %s", request)
+    if cancels.is_cancelled(request.request_id):
+        request_log.info("Запрос %s отменён до обработки", request.request_id)
+        return []
+
+    response_message = await process_request(request)
+    return [(
+        request.proccess_time_in_seconds,
+        reply_address(request, reply_to),
+        response_message.SerializeToString(),
+        {},
+        (request.request_id,)
+    )]
+
+
+async def build_batch_replies(body, reply_to=None):
+    started = time.perf_counter()
+    batch = messages_pb2.RequestBatch()
+    batch.ParseFromString(body)
+    STAGE_LATENCY.observe(time.perf_counter() - started, stage="parse")
+    request_log.info("Получен пакет из %d запросов", len(batch.requests))
+
+    processed = []
+    for request in batch.requests:
+        if cancels.is_cancelled(request.request_id):
+            continue
+        processed.append((request, await process_request(request)))
+
+    # Отмена могла прийти, пока считались следующие запросы пакета: на отменённые ответ не отправляется.
+    # Один ответный пакет на каждый адрес возврата, отправляется после самой долгой задержки в нём
+    groups = {}
+    for request, response in processed:
+        if cancels.is_cancelled(request.request_id):
+            continue
+        return_address = reply_address(request, reply_to)
+        responses, delay = groups.get(return_address, ([], 0.0))
+        responses.append(response)
+        groups[return_address] = (responses, max(delay, request.proccess_time_in_seconds))
+
+    return [
+        (
+            delay,
+            return_address,
+            messages_pb2.ResponseBatch(responses=responses).SerializeToString(),
+            {"type": RESPONSE_BATCH_TYPE},
+            tuple(response.request_id for response in responses)
+        )
+        for return_address, (responses, delay) in groups.items()
+    ]
+
+
+async def send_reply(reply):
+    return_address, body, properties, ack, scheduled_at, request_ids = reply
+    started = time.perf_counter()
+    if scheduled_at is not None:
+        STAGE_LATENCY.observe(started - scheduled_at, stage="delay")
+        cancels.finish(request_ids)
+    if socket_server is None:
+        target = publisher
+    else:
+        # Без брокера ответу некуда идти, кроме соединения, из которого пришёл запрос
+        target = socket_server.connections.get(return_address)
+        if target is None:
+            request_log.warning("Соединение %s закрыто, ответ отброшен", return_address)
+            if ack is not None:
+                await ack.done(True)
+            return
+    headers = properties.get("headers")
+    if headers is not None:
+        headers[TRACE_PUB] = now_us()
+    try:
+        await target.publish(body, return_address, **properties)
+    except Exception:
+        ERRORS.inc(stage="publish")
+        if ack is not None:
+            await ack.done(False)
+        raise
+    STAGE_LATENCY.observe(time.perf_counter() - started, stage="publish")
+    RESPONSES.inc()
+    if ack is not None:
+        await ack.done(True)
+    if tracer is not None and headers is not None:
+        stamps = stamps_from_headers(headers)
+        for request_id in request_ids:
+            tracer.write(request_id, **stamps)
+    request_log.info("Ответ отправлен в %s", return_address)
+
+
+def range_chunks(request):
+    # Диапазон не разворачивается целиком: срез range ленивый, в памяти только текущий кусок
+    numbers = range(request.start, request.stop, request.step)
+    size = min(max(request.chunk_size, 1), MAX_CHUNK_SIZE)
+    count = max(1, math.ceil(len(numbers) / size))
+    for seq in range(count):
+        yield seq, numbers[seq * size:(seq + 1) * size], seq == count - 1
+
+
+async def compute_chunk(numbers):
+    # Кэш результатов не используется: большой диапазон вытеснил бы из него всё остальное
+    started = time.perf_counter()
+    try:
+        if config.compute_in_thread:
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: [double_number(n) for n in numbers])
+        return [double_number(number) for number in numbers]
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage="compute")
+
+
+def check_range(request):
+    # Ошибки диапазона не исправятся повторной доставкой: такой запрос отклоняется до отправки кусков
+    if request.step == 0:
+        raise ValueError("шаг диапазона не может быть 0")
+    numbers = range(request.start, request.stop, request.step)
+    # double_number монотонна: достаточно проверить результаты на концах диапазона
+    if not numbers:
+        return
+    for result in (double_number(numbers[0]), double_number(numbers[-1])):
+        if not INT32_MIN <= result <= INT32_MAX:
+            raise ValueError(f"результат {result} диапазона [{request.start}, {request.stop}) не помещается в int32")
+
+
+def stream_key(request, reply_to):
+    # Unix: соединение, из которого пришёл запрос; AMQP: адрес возврата из запроса, клиент повторяет его в StreamAck.
+    # Одинаковые request_id разных клиентов не попадают в одно окно
+    if socket_server is not None and reply_to in socket_server.connections:
+        return reply_to, request.request_id
+    return request.return_address, request.request_id
+
+
+async def fail_stream(return_address, request_id, seq, error):
+    # Последний кусок с ошибкой: клиент узнаёт, что поток не будет дослан, сразу, а не по своему таймауту
+    chunk = messages_pb2.ResponseChunk(
+        request_id=request_id, seq=seq, end_of_stream=True, status=messages_pb2.Response.FAILED, error=error
+    )
+    try:
+        await send_reply((
+            return_address, chunk.SerializeToString(), {"type": RESPONSE_CHUNK_TYPE}, None, None, (request_id,)
+        ))
+    except Exception as e:
+        request_log.error("Не удалось сообщить клиенту об ошибке потока %s: %s", request_id, e)
+
+
+async def stream_range(message):
+    try:
+        request = messages_pb2.RangeRequest()
         request.ParseFromString(message.body)
-        logging.info(f"Получен запрос {request}")
+    except Exception as e:
+        request_log.error("Не удалось разобрать запрос: %s", e)
+        ERRORS.inc(stage="parse")
+        await message.reject()
+        return
+    return_address = reply_address(request, message.reply_to)
+    try:
+        check_range(request)
+    except ValueError as e:
+        request_log.error("Диапазон %s отклонён: %s", request.request_id, e)
+        ERRORS.inc(stage="parse")
+        await message.reject()
+        await fail_stream(return_address, request.request_id, 0, str(e))
+        return
+    request_log.info(
+        "Получен диапазон %s: [%d, %d) с шагом %d", request.request_id, request.start, request.stop, request.step
+    )
+    if config.ack_policy != ACK_ON_PUBLISH:
+        await message.ack()
 
-        response_data = {
-            "request_id": request.request_id,
-            "response": double_number(request.request)
-        }
+    key = stream_key(request, message.reply_to)
+    window = streams[key] = StreamWindow(request.window)
+    try:
+        seq, error = await send_chunks(message, request, return_address, window)
+    finally:
+        streams.pop(key, None)
+    if error is not None:
+        await fail_stream(return_address, request.request_id, seq, error)
+    if config.ack_policy == ACK_ON_PUBLISH and not message.processed:
+        await message.ack()
 
-        await asyncio.sleep(request.proccess_time_in_seconds)
 
-        connection = await connect(config["broker_url"])
-        channel = await connection.channel()
+async def send_chunks(message, request, return_address, window):
+    # Следующий кусок считается только после отправки предыдущего и когда клиент забрал
+    # куски до seq - window: ни сервер, ни клиент не держат в памяти больше окна.
+    # Возвращает seq первого неотправленного куска и причину обрыва, о которой надо сообщить клиенту
+    for seq, numbers, last in range_chunks(request):
+        if not await window.wait(seq, config.stream_ack_timeout):
+            request_log.warning(
+                "Клиент потока %s не забирал куски %.0f с, поток прерван", request.request_id,
+                config.stream_ack_timeout
+            )
+            return seq, f"клиент не забирал куски {config.stream_ack_timeout:g} с"
+        if window.cancelled or cancels.is_cancelled(request.request_id):
+            request_log.info("Поток %s отменён после %d кусков", request.request_id, seq)
+            return seq, None
+        if socket_server is not None and return_address not in socket_server.connections:
+            request_log.warning("Соединение %s закрыто, поток %s прерван", return_address, request.request_id)
+            return seq, None
+        try:
+            results = await compute_chunk(numbers)
+        except Exception as e:
+            request_log.error("Ошибка вычисления потока %s: %s", request.request_id, e)
+            ERRORS.inc(stage="compute")
+            if config.ack_policy == ACK_ON_PUBLISH:
+                # Ошибка вычисления повторится и при повторной доставке: сообщение не возвращается в очередь
+                await message.reject()
+            return seq, f"ошибка вычисления: {e}"
+        chunk = messages_pb2.ResponseChunk(request_id=request.request_id, seq=seq, results=results, end_of_stream=last)
+        try:
+            await send_reply((
+                return_address, chunk.SerializeToString(), {"type": RESPONSE_CHUNK_TYPE}, None, None,
+                (request.request_id,)
+            ))
+        except Exception:
+            if config.ack_policy == ACK_ON_PUBLISH:
+                # Поток будет отправлен заново с начала, клиент отбросит уже полученные куски по seq
+                await message.nack(requeue=True)
+            raise
+    return None, None
+
+
+def trace_replies(replies, sent_at, received_at):
+    # Клиент включил трассировку: отметки сервера уезжают к нему в заголовках ответа
+    stamps = {TRACE_SEND: sent_at, TRACE_RECV: received_at, TRACE_DONE: now_us()}
+    return [
+        (delay, return_address, body, {**properties, "headers": dict(stamps)}, request_ids)
+        for delay, return_address, body, properties, request_ids in replies
+    ]
+
+
+async def handle_request(message):
+    started = time.perf_counter()
+    received_at = now_us()
+    REQUESTS.inc(type=message.type or "Request")
+    if message.type == RANGE_REQUEST_TYPE:
+        await stream_range(message)
+        return
+    try:
+        if message.type == REQUEST_BATCH_TYPE:
+            replies = await build_batch_replies(message.body, message.reply_to)
+        else:
+            replies = await build_replies(message.body, message.reply_to)
+    except Exception as e:
+        request_log.error("Не удалось разобрать запрос: %s", e)
+        ERRORS.inc(stage="parse")
+        await message.reject()
+        return
+
+    sent_at = (message.headers or {}).get(TRACE_SEND)
+    if sent_at is not None:
+        replies = trace_replies(replies, sent_at, received_at)
+
+    ack = None
+    if config.ack_policy == ACK_ON_PUBLISH and replies:
+        ack = DeferredAck(message, len(replies))
+    else:
+        await message.ack()
+
+    # Результат уже посчитан; ответ с задержкой ждёт в планировщике, не занимая обработчик
+    for delay, return_address, body, properties, request_ids in replies:
+        if delay > 0:
+            entry = scheduler.schedule(delay, (return_address, body, properties, ack, time.perf_counter(), request_ids))
+            cancels.track(entry, request_ids, ack)
+        else:
+            await send_reply((return_address, body, properties, ack, None, request_ids))
+    STAGE_LATENCY.observe(time.perf_counter() - started, stage="handle")
+
+
+def busy_replies(message):
+    # Ответ "сервер занят" на каждый запрос сообщения, без вычисления и без задержки
+    if message.type == RANGE_REQUEST_TYPE:
+        request = messages_pb2.RangeRequest()
+        request.ParseFromString(message.body)
+        chunk = messages_pb2.ResponseChunk(
+            request_id=request.request_id, seq=0, end_of_stream=True, status=messages_pb2.Response.BUSY
+        )
+        return [(
+            reply_address(request, message.reply_to),
+            chunk.SerializeToString(),
+            {"type": RESPONSE_CHUNK_TYPE},
+            (request.request_id,)
+        )]
+    if message.type == REQUEST_BATCH_TYPE:
+        batch = messages_pb2.RequestBatch()
+        batch.ParseFromString(message.body)
+        requests = batch.requests
+    else:
+        request = messages_pb2.Request()
+        request.ParseFromString(message.body)
+        requests = [request]
 
-        return_address = request.return_address
-        response_message = messages_pb2.Response(
+    groups = {}
+    for request in requests:
+        groups.setdefault(reply_address(request, message.reply_to), []).append(messages_pb2.Response(
             request_id=request.request_id,
-            response=double_number(request.request)
+            response=0,
+            status=messages_pb2.Response.BUSY
+        ))
+    batched = message.type == REQUEST_BATCH_TYPE
+    return [
+        (
+            return_address,
+            (messages_pb2.ResponseBatch(responses=responses) if batched else responses[0]).SerializeToString(),
+            {"type": RESPONSE_BATCH_TYPE} if batched else {},
+            tuple(response.request_id for response in responses)
         )
-        response_message_data = response_message.SerializeToString()
+        for return_address, responses in groups.items()
+    ]
 
-        await channel.default_exchange.publish(
-            Message(body=response_message_data),
-            routing_key=return_address
+
+async def reject_busy(message):
+    try:
+        replies = busy_replies(message)
+    except Exception as e:
+        request_log.error("Не удалось разобрать запрос: %s", e)
+        ERRORS.inc(stage="parse")
+        await message.reject()
+        return
+    # Сообщение подтверждается сразу: клиент сам решает, повторять ли запрос
+    await message.ack()
+    for return_address, body, properties, request_ids in replies:
+        SHED.inc(len(request_ids))
+        await send_reply((return_address, body, properties, None, None, request_ids))
+
+
+async def admit_request(message):
+    if message.type == RANGE_REQUEST_TYPE:
+        await admit_stream(message)
+        return
+    # С shed_load запрос ждёт обработчика, только пока очередь к ним не длиннее текущего лимита,
+    # дальше клиент сразу получает отказ. Без очереди отказы шли бы и на всплески, которые
+    # адаптивный лимит ещё не успел догнать
+    if config.shed_load and limiter.queued >= limiter.limit:
+        await reject_busy(message)
+        return
+    await limiter.acquire()
+    started = time.perf_counter()
+    try:
+        await handle_request(message)
+    finally:
+        if adaptive_limit is not None:
+            adaptive_limit.observe(time.perf_counter() - started)
+        limiter.release()
+
+
+async def admit_stream(message):
+    # Поток занимает слот, пока клиент забирает куски, и не должен отнимать обработчики у коротких запросов:
+    # у потоков свой лимит. Ждать в очереди за длинными потоками бессмысленно - сверх лимита сразу отказ
+    if not stream_limiter.try_acquire():
+        await reject_busy(message)
+        return
+    try:
+        await handle_request(message)
+    finally:
+        stream_limiter.release()
+
+
+def ack_stream(return_address, request_id, consumed):
+    # StreamAck приходит всем воркерам, окно есть только у того, кто отправляет поток
+    window = streams.get((return_address, request_id))
+    if window is not None:
+        window.ack(consumed)
+
+
+def abandon_requests(messages):
+    withdrawn = cancels.withdraw(messages)
+    if withdrawn:
+        logging.warning(f"Сняты {withdrawn} отложенных ответов на сообщения, которые брокер доставит повторно")
+
+
+async def cancel_requests(request_ids):
+    cancelled = set(request_ids)
+    for (_, request_id), window in streams.items():
+        if request_id in cancelled:
+            # Поток может ждать подтверждения клиента: отмена будит его сразу
+            window.cancel()
+    await cancels.cancel(request_ids)
+    request_log.info("Получена отмена %d запросов", len(request_ids))
+
+
+def open_tracer():
+    global tracer
+    if tracer is not None:
+        tracer.close()
+    tracer = TraceWriter(worker_path(config.trace_path)) if config.trace_path else None
+
+
+def create_adaptive_limit():
+    if not config.adaptive_concurrency:
+        limiter.set_limit(config.max_concurrent_handlers)
+        return None
+    return AdaptiveLimit(
+        limiter,
+        min(config.min_concurrent_handlers, config.max_concurrent_handlers),
+        config.max_concurrent_handlers
+    )
+
+
+def publisher_total(name):
+    return retired_totals[name] + sum(getattr(p, name) for p in (publisher, *draining_publishers))
+
+
+def retire_publisher(old_publisher):
+    draining_publishers.add(old_publisher)
+    asyncio.create_task(drain_publisher(old_publisher))
+
+
+async def drain_publisher(old_publisher):
+    try:
+        await old_publisher.drain(config.drain_timeout)
+    finally:
+        draining_publishers.discard(old_publisher)
+        for name in retired_totals:
+            retired_totals[name] += getattr(old_publisher, name)
+
+
+def create_publisher():
+    return Publisher(
+        config.broker_url,
+        pool_size=config.publish_channels,
+        confirm_mode=config.confirm_mode,
+        confirm_window=config.confirm_window
+    )
+
+
+async def restart_metrics_server():
+    global metrics_server
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+        metrics_server = None
+    if config.metrics_port:
+        # Каждый воркер слушает свой порт: metrics_port + номер воркера
+        metrics_server = await start_metrics_server(
+            config.metrics_host, config.metrics_port + worker_index, ready=lambda: readiness.ready
         )
-        logging.info(f"Ответ отправлен в {return_address}: {response_data}")
 
 
-async def monitor_config_changes():
-    last_config = config.copy()
+async def apply_config(new_config):
+    global config
+    new_config.validate()
+    changed = changed_fields(config, new_config)
+    if not changed:
+        return
+    old_config, config = config, new_config
+    logging.info(f"Конфигурация изменена: {', '.join(sorted(changed))}")
+    try:
+        await apply_changes(changed)
+    except Exception:
+        # Остаётся прежний конфиг: наблюдатель применит новый заново при следующей проверке
+        config = old_config
+        raise
 
-    while True:
-        await asyncio.sleep(2)
-        try:
-            with open("../../config.yaml", "r") as file:
-                new_config = yaml.safe_load(file)
 
-            if (new_config["log_level"] != last_config["log_level"] or
-                    new_config["log_path"] != last_config["log_path"]):
-                setup_logging(new_config["log_level"], new_config["log_path"])
-                last_config.update(new_config)
+async def apply_changes(changed):
+    global publisher, cancel_listener, adaptive_limit
+    if changed & {"log_level", "log_path", "log_max_bytes", "log_backup_count", "log_sample_info", "log_sample_debug"}:
+        configure_logging()
+    if changed & {"max_concurrent_handlers", "min_concurrent_handlers", "adaptive_concurrency"}:
+        adaptive_limit = create_adaptive_limit()
+    if "max_concurrent_streams" in changed:
+        stream_limiter.set_limit(config.max_concurrent_streams)
+    if changed & {"cache_size", "cache_ttl"}:
+        cache.max_size = config.cache_size
+        cache.ttl = config.cache_ttl
+    if changed & {"metrics_host", "metrics_port"}:
+        await restart_metrics_server()
+    if "trace_path" in changed:
+        open_tracer()
+    if "ready_path" in changed:
+        readiness.set_not_ready()
+        readiness.path = worker_path(config.ready_path)
+        if consumer is not None or socket_server is not None:
+            readiness.set_ready()
+    if changed & {"broker_url", "publish_channels", "confirm_mode", "confirm_window"}:
+        # Новые ответы идут через новый публикатор, старый закрывается после завершения начатых публикаций
+        old_publisher, publisher = publisher, create_publisher()
+        retire_publisher(old_publisher)
+    if changed & {"broker_url", "cancel_exchange"}:
+        # Новый слушатель отмен подключится при перезапуске потребителя
+        asyncio.create_task(cancel_listener.close())
+        cancel_listener = CancelListener(config.broker_url, config.cancel_exchange, cancel_requests, ack_stream)
+    if changed & {"broker_url", "request_queue", "cancel_exchange", "shards"}:
+        consumer_restart.set()
+    elif "prefetch_count" in changed and consumer is not None:
+        await consumer.set_prefetch(config.prefetch_count)
+    if socket_server is not None and changed & {"prefetch_count", "socket_write_timeout"}:
+        socket_server.max_in_flight = config.prefetch_count
+        socket_server.write_timeout = config.socket_write_timeout
+        for connection in socket_server.connections.values():
+            connection.write_timeout = config.socket_write_timeout
+    if "workers" in changed:
+        logging.info("Число воркеров меняет супервизор")
+    if changed & {"transport", "socket_path", "event_loop"}:
+        logging.warning("Смена транспорта и цикла событий применяется после перезапуска сервера")
 
-        except Exception as e:
-            logging.error(f"Ошибка чтения конфига: {e}")
 
+def mark_ready(started):
+    # started - запуск процесса или потеря соединения: по метрике видно, сколько стоит раскатка воркера
+    elapsed = time.perf_counter() - started
+    STARTUP.set(elapsed, phase="ready")
+    readiness.set_ready(startup_seconds=round(elapsed, 6))
+    return elapsed
 
-async def main():
-    asyncio.create_task(monitor_config_changes())
 
+async def connect_all():
+    # Три соединения с брокером открываются параллельно, а не друг за другом;
+    # дожидаемся всех, чтобы при ошибке не закрыть потребителя посреди подключения
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        publisher.connect(), consumer.start(), cancel_listener.start(), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    elapsed = time.perf_counter() - started
+    STARTUP.set(elapsed, phase="connect")
+    return elapsed
+
+
+async def consume_requests(started):
+    global consumer
     while True:
+        consumer = RequestConsumer(
+            config.broker_url,
+            config.request_queue,
+            config.prefetch_count,
+            admit_request,
+            shards=config.shards,
+            claimed=claimed_shards(config.shards, worker_index, worker_count),
+            on_abandon=abandon_requests
+        )
         try:
-            connection = await connect(config["broker_url"])
-            channel = await connection.channel()
-            exchange = await channel.declare_exchange(
-                'direct_exchange',
-                ExchangeType.DIRECT
-            )
-            queue = await channel.declare_queue(config["request_queue"])
-            logging.info("Сервер готов принимать запросы")
-
-            await queue.consume(handle_request)
-            await asyncio.Future()
+            connect_time = await connect_all()
         except Exception as e:
             logging.error(f"Ошибка: {e}. Повторная попытка подключиться через 5 секунд.")
+            CONSUMER_RECONNECTS.inc()
+            await consumer.close()
+            await asyncio.sleep(5)
+            continue
+
+        elapsed = mark_ready(started)
+        logging.info(
+            f"Сервер готов принимать запросы из {config.request_queue} за {elapsed:.3f} с "
+            f"(подключение {connect_time:.3f} с), шарды: {config.shards or 'нет'} "
+            f"(свои: {sorted(consumer.claimed)}), лимиты: {limiter.stats()}"
+        )
+        restart = asyncio.create_task(consumer_restart.wait())
+        await asyncio.wait({restart, consumer.closed()}, return_when=asyncio.FIRST_COMPLETED)
+        restart.cancel()
+
+        if consumer_restart.is_set():
+            consumer_restart.clear()
+            # Старый потребитель дорабатывает полученные сообщения в фоне, новый начинает сразу
+            logging.info("Перезапуск потребителя с новой конфигурацией")
+            started = time.perf_counter()
+            asyncio.create_task(consumer.stop(config.drain_timeout))
+        else:
+            readiness.set_not_ready()
+            started = time.perf_counter()
+            await consumer.close()
+            logging.error("Соединение потребителя закрыто. Повторная попытка подключиться через 5 секунд.")
+            CONSUMER_RECONNECTS.inc()
             await asyncio.sleep(5)
 
 
+async def serve_socket(started):
+    global socket_server
+    socket_server = SocketServer(
+        config.socket_path, admit_request, cancel_requests, ack_stream, config.prefetch_count,
+        config.socket_write_timeout
+    )
+    await socket_server.start()
+    elapsed = mark_ready(started)
+    logging.info(
+        f"Сервер готов принимать запросы из {config.socket_path} за {elapsed:.3f} с, "
+        f"лимиты: {limiter.stats()}"
+    )
+    await asyncio.Event().wait()
+
+
+async def main():
+    global publisher, limiter, stream_limiter, adaptive_limit, scheduler, cache, cancels, cancel_listener, consumer, \
+        socket_server, consumer_restart, readiness
+    started = time.perf_counter()
+    readiness = Readiness(worker_path(config.ready_path))
+    publisher = create_publisher()
+    limiter = ConcurrencyLimiter(config.max_concurrent_handlers)
+    stream_limiter = ConcurrencyLimiter(config.max_concurrent_streams)
+    adaptive_limit = create_adaptive_limit()
+    scheduler = DelayScheduler(send_reply)
+    cache = ResultCache(config.cache_size, config.cache_ttl)
+    cancels = CancelRegistry(scheduler)
+    cancel_listener = CancelListener(config.broker_url, config.cancel_exchange, cancel_requests, ack_stream)
+    consumer_restart = asyncio.Event()
+    open_tracer()
+    scheduler.start()
+    watch_task = asyncio.create_task(ConfigWatcher(CONFIG_PATH).watch(apply_config))
+
+    REGISTRY.gauge("rabbitmq_server_in_flight", "Обработчики, выполняющиеся сейчас", lambda: limiter.in_flight)
+    REGISTRY.gauge("rabbitmq_server_concurrency_limit", "Текущий лимит обработчиков", lambda: limiter.limit)
+    REGISTRY.gauge("rabbitmq_server_queued", "Сообщения, ожидающие свободного обработчика", lambda: limiter.queued)
+    REGISTRY.gauge("rabbitmq_server_streams", "Потоки диапазонов, отправляемые сейчас", lambda: stream_limiter.in_flight)
+    REGISTRY.gauge("rabbitmq_server_delayed_responses", "Ответы, ожидающие в планировщике", lambda: len(scheduler))
+    REGISTRY.counter("rabbitmq_server_publisher_reconnects_total", "Переподключения публикатора", lambda: publisher_total("reconnects"))
+    REGISTRY.counter("rabbitmq_server_publisher_nacks_total", "Публикации, отклонённые брокером", lambda: publisher_total("nacks"))
+    REGISTRY.gauge("rabbitmq_server_publisher_unconfirmed", "Публикации, ожидающие подтверждения брокера", lambda: publisher.outstanding)
+    REGISTRY.counter("rabbitmq_server_cancelled_total", "Запросы, отменённые клиентом до отправки ответа", lambda: cancels.cancelled)
+    REGISTRY.counter("rabbitmq_server_cache_hits_total", "Попадания в кэш результатов", lambda: cache.hits)
+    REGISTRY.counter("rabbitmq_server_cache_misses_total", "Промахи кэша результатов", lambda: cache.misses)
+    REGISTRY.counter("rabbitmq_server_cache_coalesced_total", "Запросы, объединённые с уже идущим вычислением", lambda: cache.coalesced)
+
+    await restart_metrics_server()
+
+    try:
+        if config.transport == TRANSPORT_UNIX:
+            await serve_socket(started)
+        else:
+            await consume_requests(started)
+    finally:
+        readiness.set_not_ready()
+        watch_task.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        await scheduler.stop()
+        logging.info(f"Статистика кэша результатов: {cache.stats()}")
+        # Неподтверждённые сообщения брокер вернёт в очередь после закрытия соединения
+        if consumer is not None:
+            await consumer.close()
+        if socket_server is not None:
+            await socket_server.close()
+            socket_server = None
+        await cancel_listener.close()
+        await publisher.close()
+        if tracer is not None:
+            tracer.close()
+        logging.info("Сервер остановлен")
+
+
+async def serve():
+    main_task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, main_task.cancel)
+    except (NotImplementedError, AttributeError):
+        # На Windows обработчики сигналов в цикле событий не поддерживаются
+        pass
+
+    try:
+        await main()
+    except asyncio.CancelledError:
+        pass
+
+
+def run_event_loop(coroutine):
+    if config.event_loop == EVENT_LOOP_UVLOOP:
+        # uvloop - необязательная зависимость: без него сервер работает на стандартном цикле
+        try:
+            import uvloop
+        except ImportError:
+            logging.warning("uvloop не установлен, используется цикл событий asyncio")
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(coroutine)
+
+
+def preload_transport():
+    # Супервизор импортирует aio_pika до запуска воркеров: после fork он уже загружен,
+    # и перезапущенный воркер не тратит время на импорт
+    started = time.perf_counter()
+    import aio_pika  # noqa: F401
+    logging.info(f"aio_pika загружен за {time.perf_counter() - started:.3f} с")
+
+
+def run_worker(index=0, count=1, config_path=CONFIG_PATH):
+    # Запускается и через spawn/forkserver: глобальные переменные родителя сюда не доходят
+    global config, worker_index, worker_count, supervised, CONFIG_PATH
+    worker_index = index
+    worker_count = count
+    supervised = True
+    CONFIG_PATH = config_path
+    config = load_config(CONFIG_PATH)
+    configure_logging(force=True)
+    # Ctrl+C обрабатывает супервизор и останавливает воркеры через SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.info(f"Воркер {index} запущен")
+    run_event_loop(serve())
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="RabbitMQ сервер")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="число процессов-воркеров (по умолчанию workers из config.yaml или число ядер)")
+    parser.add_argument("--config", default=CONFIG_PATH, help=f"путь к config.yaml (по умолчанию {CONFIG_PATH})")
+    args = parser.parse_args()
+
+    CONFIG_PATH = args.config
+    config = load_config(CONFIG_PATH)
+    configure_logging()
+    workers = args.workers if args.workers is not None else config.workers or default_workers()
+    if config.transport == TRANSPORT_UNIX and workers > 1:
+        # Один путь сокета может слушать только один процесс
+        logging.warning("Транспорт unix обслуживается одним процессом, воркеры не запускаются")
+        workers = 1
+    if workers > 1:
+        # Явно заданное в командной строке число воркеров не меняется при правке конфига
+        watcher = ConfigWatcher(CONFIG_PATH) if args.workers is None else None
+        preload_transport()
+        # Воркер i претендует на шарды i, i + workers, ... Если супервизор меняет число воркеров по конфигу,
+        # уже работающие воркеры сохраняют прежнее значение: шарды обслуживаются, но владельцы распределены неравномерно
+        Supervisor(run_worker, workers, args=(CONFIG_PATH,), watcher=watcher).run()
+    else:
+        run_event_loop(serve())
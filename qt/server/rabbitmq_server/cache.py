@@ -0,0 +1,90 @@
+import asyncio
+import inspect
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    # LRU-кэш результатов с TTL; одинаковые одновременные запросы ждут одно вычисление
+    def __init__(self, max_size=10000, ttl=60.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "in_flight": len(self._in_flight),
+        }
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.evictions += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (value, self.clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def compute_async(self, key, func, *args):
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            value = func(*args)
+            if not inspect.isawaitable(value):
+                self.put(key, value)
+                return value
+            # Вычисление идёт отдельной задачей: отмена запустившего его обработчика
+            # не доходит до остальных ждущих, их ожидание отменяется только у них самих
+            task = self._in_flight[key] = asyncio.create_task(self._compute(key, value))
+            task.add_done_callback(_retrieve_exception)
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, awaitable):
+        try:
+            value = await awaitable
+        finally:
+            del self._in_flight[key]
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _retrieve_exception(task):
+    # Ошибку получают ждущие; если все они уже отменены, asyncio не должен ругаться на непрочитанное исключение
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,138 @@
+import logging
+import time
+from collections import OrderedDict
+
+from qt.protos import messages_pb2
+from qt.transport import connect_robust
+
+
+class ScheduledReply:
+    __slots__ = ("entry", "request_ids", "ack")
+
+    def __init__(self, entry, request_ids, ack):
+        self.entry = entry
+        self.request_ids = set(request_ids)
+        self.ack = ack
+
+
+class CancelRegistry:
+    # Запросы в полёте по request_id. Отменённый отложенный ответ снимается с планировщика;
+    # отмена ещё не полученного запроса запоминается, и он будет отброшен без вычисления
+    def __init__(self, scheduler, max_tombstones=10000, tombstone_ttl=60.0, clock=time.monotonic):
+        self.scheduler = scheduler
+        self.max_tombstones = max_tombstones
+        self.tombstone_ttl = tombstone_ttl
+        self.clock = clock
+        self.cancelled = 0
+        self._replies = {}
+        self._tombstones = OrderedDict()
+
+    def __len__(self):
+        return len(self._replies)
+
+    def is_cancelled(self, request_id):
+        expires_at = self._tombstones.pop(request_id, None)
+        if expires_at is None:
+            return False
+        if expires_at <= self.clock():
+            return False
+        self.cancelled += 1
+        return True
+
+    def track(self, entry, request_ids, ack=None):
+        reply = ScheduledReply(entry, request_ids, ack)
+        for request_id in reply.request_ids:
+            self._replies[request_id] = reply
+        return reply
+
+    def finish(self, request_ids):
+        for request_id in request_ids:
+            self._replies.pop(request_id, None)
+
+    async def cancel(self, request_ids):
+        # Пакетный ответ снимается, только когда отменены все запросы из него
+        for request_id in request_ids:
+            reply = self._replies.pop(request_id, None)
+            if reply is None:
+                self._remember(request_id)
+                continue
+            reply.request_ids.discard(request_id)
+            if reply.request_ids or not self.scheduler.cancel(reply.entry):
+                continue
+            self.cancelled += 1
+            if reply.ack is not None:
+                # Отменённый запрос обработан окончательно: повторная доставка не нужна
+                await reply.ack.done(True)
+
+    def withdraw(self, messages):
+        # Неподтверждённые доставки закрытого канала брокер вернёт в очередь, и запрос будет обработан заново:
+        # их отложенные ответы снимаются, иначе клиент получит ответ дважды
+        withdrawn = 0
+        for request_id, reply in list(self._replies.items()):
+            if reply.ack is None or reply.ack.message not in messages:
+                continue
+            del self._replies[request_id]
+            reply.ack.abandon()
+            if self.scheduler.cancel(reply.entry):
+                withdrawn += 1
+        return withdrawn
+
+    def _remember(self, request_id):
+        now = self.clock()
+        self._tombstones[request_id] = now + self.tombstone_ttl
+        self._tombstones.move_to_end(request_id)
+        while self._tombstones:
+            oldest, expires_at = next(iter(self._tombstones.items()))
+            if len(self._tombstones) <= self.max_tombstones and expires_at > now:
+                break
+            del self._tombstones[oldest]
+
+
+STREAM_ACK_TYPE = "StreamAck"
+
+
+class CancelListener:
+    # Сообщения Cancel рассылаются через fanout: каждый воркер получает их в свою временную очередь.
+    # Тем же путём приходят StreamAck - подтверждения забранных клиентом кусков потока
+    def __init__(self, broker_url, exchange_name, on_cancel, on_stream_ack=None):
+        self.broker_url = broker_url
+        self.exchange_name = exchange_name
+        self.on_cancel = on_cancel
+        self.on_stream_ack = on_stream_ack
+        self.connection = None
+
+    async def start(self):
+        from aio_pika import ExchangeType
+
+        if self.connection is not None:
+            return
+        self.connection = await connect_robust(self.broker_url)
+        channel = await self.connection.channel()
+        exchange = await channel.declare_exchange(self.exchange_name, ExchangeType.FANOUT)
+        queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(exchange)
+        await queue.consume(self._on_message, no_ack=True)
+
+    async def _on_message(self, message):
+        if message.type == STREAM_ACK_TYPE:
+            try:
+                stream_ack = messages_pb2.StreamAck()
+                stream_ack.ParseFromString(message.body)
+            except Exception as e:
+                logging.error(f"Не удалось разобрать подтверждение потока: {e}")
+                return
+            if self.on_stream_ack is not None:
+                self.on_stream_ack(stream_ack.return_address, stream_ack.request_id, stream_ack.consumed)
+            return
+        try:
+            cancel = messages_pb2.Cancel()
+            cancel.ParseFromString(message.body)
+        except Exception as e:
+            logging.error(f"Не удалось разобрать сообщение отмены: {e}")
+            return
+        await self.on_cancel(list(cancel.request_ids))
+
+    async def close(self):
+        if self.connection is not None and not self.connection.is_closed:
+            await self.connection.close()
+        self.connection = None
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from collections import deque
+
+
+class ConcurrencyLimiter:
+    # Семафор с изменяемым лимитом: ограничивает число одновременно работающих обработчиков
+    def __init__(self, limit):
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def stats(self):
+        return {"limit": self.limit, "in_flight": self.in_flight, "queued": self.queued}
+
+    def try_acquire(self):
+        # Занять слот без ожидания; False, если свободных слотов нет
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    async def acquire(self):
+        if self.try_acquire():
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif not waiter.cancelled():
+                # Слот уже был выдан этому ожидающему, возвращаем его
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake_up()
+
+    def set_limit(self, limit):
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        self.limit = limit
+        self._wake_up()
+
+    def _wake_up(self):
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def wrap(self, handler):
+        async def limited(*args, **kwargs):
+            async with self:
+                return await handler(*args, **kwargs)
+
+        return limited
+
+
+class AdaptiveLimit:
+    # AIMD по задержке обработчика: за каждое окно из window замеров средняя задержка сравнивается
+    # с базовой (минимальной). Пока она не выросла в tolerance раз и лимит используется хотя бы
+    # наполовину, лимит растёт на 1; иначе уменьшается в backoff раз
+    def __init__(self, limiter, min_limit, max_limit, tolerance=2.0, backoff=0.9, window=50, drift=0.01):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("expected 1 <= min_limit <= max_limit")
+        self.limiter = limiter
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.drift = drift
+        self.baseline = None
+        self._samples = 0
+        self._total = 0.0
+        self._peak = 0
+        # Начинаем с нижней границы и разгоняемся, пока задержка не начнёт расти
+        limiter.set_limit(min_limit)
+
+    def observe(self, latency):
+        # Вызывается до освобождения слота: in_flight включает текущий обработчик
+        self._samples += 1
+        self._total += latency
+        self._peak = max(self._peak, self.limiter.in_flight)
+        if self._samples >= self.window:
+            self._update(self._total / self._samples, self._peak)
+            self._samples, self._total, self._peak = 0, 0.0, 0
+
+    def _update(self, latency, peak):
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Базовая задержка медленно подтягивается вверх: нагрузка могла стать тяжелее навсегда
+            self.baseline += (latency - self.baseline) * self.drift
+
+        limit = self.limiter.limit
+        if latency > self.baseline * self.tolerance:
+            limit = max(self.min_limit, int(limit * self.backoff))
+        elif peak * 2 >= limit:
+            limit = min(self.max_limit, limit + 1)
+        if limit != self.limiter.limit:
+            logging.debug(f"Лимит обработчиков {self.limiter.limit} -> {limit}, "
+                          f"задержка {latency * 1000:.2f} мс, базовая {self.baseline * 1000:.2f} мс")
+            self.limiter.set_limit(limit)
@@ -0,0 +1,156 @@
+import asyncio
+import dataclasses
+import logging
+import os
+
+import yaml
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "../../config.yaml")
+
+# Допустимые значения строковых настроек
+CHOICES = {
+    "log_level": ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"),
+    "confirm_mode": ("none", "per_message", "windowed"),
+    "ack_policy": ("early", "on_publish"),
+    "transport": ("amqp", "unix"),
+    "event_loop": ("asyncio", "uvloop"),
+}
+# Нижние границы числовых настроек
+MINIMUMS = {
+    "shards": 0, "log_max_bytes": 0, "log_backup_count": 0, "prefetch_count": 0, "max_concurrent_handlers": 1,
+    "min_concurrent_handlers": 1, "max_concurrent_streams": 1, "publish_channels": 1, "confirm_window": 1,
+    "cache_size": 0, "cache_ttl": 0, "metrics_port": 0, "workers": 0, "drain_timeout": 0, "stream_ack_timeout": 0,
+    "socket_write_timeout": 0,
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class ServerConfig:
+    broker_url: str = "amqp://127.0.0.1:5672"
+    request_queue: str = "requests_queue"
+    shards: int = 0
+    log_level: str = "INFO"
+    log_path: str = "server.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_sample_info: float = 1.0
+    log_sample_debug: float = 1.0
+    # Для Unix-сокета - число запросов соединения в обработке, после которого новые кадры не читаются
+    prefetch_count: int = 100
+    max_concurrent_handlers: int = 100
+    # Потоки диапазонов ограничены отдельно от обработчиков: сверх лимита клиент сразу получает "сервер занят"
+    max_concurrent_streams: int = 10
+    min_concurrent_handlers: int = 10
+    adaptive_concurrency: bool = False
+    shed_load: bool = False
+    publish_channels: int = 4
+    confirm_mode: str = "windowed"
+    confirm_window: int = 256
+    # on_publish держит доставку неподтверждённой до отправки ответа: отложенные ответы занимают prefetch
+    ack_policy: str = "early"
+    cache_size: int = 10000
+    cache_ttl: float = 60.0
+    cancel_exchange: str = "cancel_exchange"
+    compute_in_thread: bool = False
+    direct_reply_to: bool = False
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9100
+    workers: int = 0
+    drain_timeout: float = 30.0
+    stream_ack_timeout: float = 30.0
+    transport: str = "amqp"
+    event_loop: str = "asyncio"
+    ready_path: str = ""
+    trace_path: str = ""
+    socket_path: str = "/tmp/rabbitmq_server.sock"
+    # Клиент Unix-сокета, не забирающий ответы дольше этого времени, отключается; 0 - ждать без ограничения
+    socket_write_timeout: float = 5.0
+
+    @classmethod
+    def from_dict(cls, data):
+        # Ключи клиента (uuid, response_queue, ...) в общем config.yaml пропускаются
+        values = {}
+        for field in dataclasses.fields(cls):
+            value = data.get(field.name)
+            if value is None:
+                continue
+            if field.type is bool and isinstance(value, str):
+                value = value.strip().lower() in ("1", "true", "yes", "on")
+            values[field.name] = field.type(value)
+        config = cls(**values)
+        config.validate()
+        return config
+
+    def validate(self):
+        # Ошибка в файле обнаруживается при чтении: наполовину применённого конфига не бывает
+        for name, allowed in CHOICES.items():
+            if getattr(self, name) not in allowed:
+                raise ValueError(f"{name}: {getattr(self, name)!r}, ожидалось одно из {allowed}")
+        for name, minimum in MINIMUMS.items():
+            if getattr(self, name) < minimum:
+                raise ValueError(f"{name}: {getattr(self, name)}, ожидалось не меньше {minimum}")
+        for name in ("log_sample_info", "log_sample_debug"):
+            if not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(f"{name}: {getattr(self, name)}, ожидалось от 0 до 1")
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path, "r") as f:
+        data = yaml.safe_load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: ожидался словарь настроек")
+    return ServerConfig.from_dict(data)
+
+
+def changed_fields(old, new):
+    return {
+        field.name for field in dataclasses.fields(ServerConfig)
+        if getattr(old, field.name) != getattr(new, field.name)
+    }
+
+
+class ConfigWatcher:
+    # Файл перечитывается только когда меняются mtime, размер или inode; сам stat почти бесплатен
+    def __init__(self, path=CONFIG_PATH, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def poll(self):
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+        try:
+            return load_config(self.path)
+        except ValueError:
+            # Файл прочитан, но настройки недопустимы: ждём следующей правки файла
+            raise
+        except Exception:
+            # Файл мог быть прочитан посреди записи: перечитаем при следующей проверке
+            self._signature = None
+            raise
+
+    async def watch(self, on_change):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                new_config = self.poll()
+            except Exception as e:
+                logging.error(f"Ошибка чтения конфига: {e}")
+                continue
+            if new_config is None:
+                continue
+            try:
+                await on_change(new_config)
+            except Exception as e:
+                # Конфиг не применён: попробуем снова при следующей проверке, даже если файл не изменится
+                logging.error(f"Ошибка применения конфига: {e}")
+                self._signature = None
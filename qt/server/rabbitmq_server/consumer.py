@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+
+from qt.transport import connect
+from qt.transport.sharding import CLAIM_PRIORITY, declare_shards
+
+
+class RequestConsumer:
+    # Соединение, канал и подписка на очередь запросов и очереди шардов;
+    # умеет останавливаться с дожиданием незавершённых сообщений.
+    # На шардах из claimed подписка идёт с повышенным приоритетом: брокер делает этот сервер их владельцем.
+    # on_abandon получает сообщения, оставшиеся неподтверждёнными при закрытии
+    def __init__(self, broker_url, queue_name, prefetch_count, handler, shards=0, claimed=(), on_abandon=None):
+        self.broker_url = broker_url
+        self.queue_name = queue_name
+        self.prefetch_count = prefetch_count
+        self.handler = handler
+        self.shards = shards
+        self.claimed = set(claimed)
+        self.on_abandon = on_abandon
+        self.connection = None
+        self.channel = None
+        self.subscriptions = []
+        self._unsettled = set()
+
+    @property
+    def unsettled(self):
+        self._unsettled = {message for message in self._unsettled if not message.processed}
+        return len(self._unsettled)
+
+    async def start(self):
+        self.connection = await connect(self.broker_url)
+        self.channel = await self.connection.channel()
+        await self.channel.set_qos(prefetch_count=self.prefetch_count)
+        # Общая очередь слушается и при шардировании: клиенты без шардов продолжают работать
+        queue = await self.channel.declare_queue(self.queue_name)
+        self.subscriptions = [(queue, await queue.consume(self._on_message))]
+        _, shard_queues = await declare_shards(self.channel, self.queue_name, self.shards)
+        for index, shard_queue in enumerate(shard_queues):
+            priority = CLAIM_PRIORITY if index in self.claimed else 0
+            tag = await shard_queue.consume(self._on_message, arguments={"x-priority": priority})
+            self.subscriptions.append((shard_queue, tag))
+
+    async def _on_message(self, message):
+        self._unsettled.add(message)
+        await self.handler(message)
+
+    def closed(self):
+        return self.connection.closed()
+
+    async def set_prefetch(self, prefetch_count):
+        self.prefetch_count = prefetch_count
+        await self.channel.set_qos(prefetch_count=prefetch_count)
+
+    async def stop(self, drain_timeout=30.0):
+        # Новые сообщения больше не приходят, уже полученные дорабатываются до таймаута
+        if self.connection is None or self.connection.is_closed:
+            return
+        try:
+            for queue, tag in self.subscriptions:
+                await queue.cancel(tag)
+
+            deadline = time.monotonic() + drain_timeout
+            while self.unsettled and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            if self.unsettled:
+                logging.warning(
+                    f"Потребитель {self.queue_name}: {self.unsettled} сообщений не завершены "
+                    f"за {drain_timeout} с и будут возвращены в очередь"
+                )
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.on_abandon is not None and self.unsettled:
+            self.on_abandon(set(self._unsettled))
+            self._unsettled.clear()
+        if self.connection is not None and not self.connection.is_closed:
+            await self.connection.close()
@@ -0,0 +1,101 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# Логгер горячего пути обработки запросов: к нему применяется выборка по уровням
+request_log = logging.getLogger("rabbitmq_server.requests")
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # В отличие от QueueHandler не форматирует сообщение в вызывающем потоке:
+    # msg % args выполняется уже в фоновом потоке QueueListener
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    # Пропускает долю rate записей каждого уровня ниже WARNING, детерминированно и без random()
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+        self._credit = {}
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        credit = self._credit.get(record.levelno, 0.0) + rate
+        keep = credit >= 1.0
+        self._credit[record.levelno] = credit - 1.0 if keep else credit
+        return keep
+
+
+_queue = queue.SimpleQueue()
+_queue_handler = DeferredQueueHandler(_queue)
+_sampler = SamplingFilter()
+_listener = None
+_sink = None
+
+
+def _build_handlers(log_path, max_bytes, backup_count):
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    stream_handler = logging.StreamHandler()
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    return file_handler, stream_handler
+
+
+def setup_logging(log_level, log_path, max_bytes=0, backup_count=0, sample_rates=None, force=False):
+    global _listener, _sink
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, log_level))
+    for handler in root_logger.handlers[:]:
+        if handler is not _queue_handler:
+            root_logger.removeHandler(handler)
+    if _queue_handler not in root_logger.handlers:
+        root_logger.addHandler(_queue_handler)
+
+    _sampler.rates = dict(sample_rates or {})
+    if _sampler not in request_log.filters:
+        request_log.addFilter(_sampler)
+
+    # Обработчики файла и консоли пересоздаются только при смене файла или параметров ротации
+    sink = (log_path, max_bytes, backup_count)
+    if force or _listener is None or sink != _sink:
+        old_listener = _listener
+        if old_listener is not None and not force:
+            old_listener.stop()
+            for handler in old_listener.handlers:
+                handler.close()
+        _listener = logging.handlers.QueueListener(_queue, *_build_handlers(*sink))
+        _listener.start()
+        _sink = sink
+
+    logging.info("Логирование обновлено")
+
+
+def reset_after_fork(log_level, log_path, max_bytes=0, backup_count=0, sample_rates=None):
+    # Поток QueueListener не переживает fork: дочерний процесс запускает свой
+    setup_logging(log_level, log_path, max_bytes, backup_count, sample_rates, force=True)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
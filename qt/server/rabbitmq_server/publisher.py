@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import logging
+
+from qt.transport import connect_robust
+
+# aio_pika загружается при первом подключении, а не при импорте: запуск без брокера его не ждёт
+Message = AMQPError = DeliveryError = None
+
+CONFIRM_NONE = "none"
+CONFIRM_PER_MESSAGE = "per_message"
+CONFIRM_WINDOWED = "windowed"
+CONFIRM_MODES = (CONFIRM_NONE, CONFIRM_PER_MESSAGE, CONFIRM_WINDOWED)
+
+
+def _import_aio_pika():
+    global Message, AMQPError, DeliveryError
+    if Message is None:
+        from aio_pika import Message
+        from aio_pika.exceptions import AMQPError, DeliveryError
+
+
+class Publisher:
+    # Одно долгоживущее robust-соединение и ограниченный пул каналов для отправки ответов.
+    # none - без подтверждений брокера, per_message - канал занят до подтверждения своей публикации,
+    # windowed - публикации идут конвейером по общим каналам, неподтверждённых не больше confirm_window
+    def __init__(self, broker_url, pool_size=4, retries=3, confirm_mode=CONFIRM_WINDOWED, confirm_window=256):
+        if confirm_mode not in CONFIRM_MODES:
+            raise ValueError(f"confirm_mode must be one of {CONFIRM_MODES}")
+        self.broker_url = broker_url
+        self.pool_size = pool_size
+        self.retries = retries
+        self.confirm_mode = confirm_mode
+        self.confirm_window = confirm_window
+        self.connection = None
+        self.reconnects = 0
+        self.nacks = 0
+        self.outstanding = 0
+        self.active = 0
+        self._idle = []
+        self._available = None
+        self._created = 0
+        self._shared = []
+        self._next_shared = 0
+        self._open_lock = None
+        self._window = None
+        self._connect_lock = None
+
+    async def connect(self):
+        _import_aio_pika()
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._available = asyncio.Condition()
+            self._open_lock = asyncio.Lock()
+            self._window = asyncio.Semaphore(self.confirm_window)
+
+        async with self._connect_lock:
+            if self.connection is not None and not self.connection.is_closed:
+                return
+            self.connection = await connect_robust(self.broker_url)
+            self.connection.reconnect_callbacks.add(self._on_reconnect)
+            logging.info(
+                f"Publisher подключен, размер пула каналов: {self.pool_size}, "
+                f"подтверждения: {self.confirm_mode}"
+            )
+
+    def _on_reconnect(self, connection):
+        self.reconnects += 1
+        logging.warning(f"Publisher переподключился к брокеру (всего переподключений: {self.reconnects})")
+
+    async def _open_channel(self):
+        if self.connection is None:
+            raise ConnectionError("Publisher закрыт")
+        return await self.connection.channel(publisher_confirms=self.confirm_mode != CONFIRM_NONE)
+
+    async def _acquire(self):
+        # Ожидающие просыпаются и при возврате канала, и при его потере: место закрытого канала
+        # занимает новый, открытый первым проснувшимся
+        async with self._available:
+            while True:
+                while self._idle:
+                    channel = self._idle.pop()
+                    if not channel.is_closed:
+                        return channel
+                    self._created -= 1
+                if self._created < self.pool_size:
+                    self._created += 1
+                    break
+                await self._available.wait()
+        try:
+            return await self._open_channel()
+        except Exception:
+            await self._release(None)
+            raise
+
+    async def _release(self, channel):
+        async with self._available:
+            if channel is None or channel.is_closed:
+                # Закрытый канал выбрасываем, вместо него откроется новый
+                self._created -= 1
+            else:
+                self._idle.append(channel)
+            self._available.notify()
+
+    async def _shared_channel(self):
+        self._shared = [channel for channel in self._shared if not channel.is_closed]
+        # Каналы открываются по одному: пока канал открывается, публикации идут по уже открытым,
+        # а если открытых ещё нет - ждут его, а не открывают каждая свой
+        if not self._shared or len(self._shared) < self.pool_size and not self._open_lock.locked():
+            async with self._open_lock:
+                # Пока ждали блокировку, пул мог заполниться
+                self._shared = [channel for channel in self._shared if not channel.is_closed]
+                if len(self._shared) < self.pool_size:
+                    channel = await self._open_channel()
+                    self._shared.append(channel)
+                    return channel
+        self._next_shared = (self._next_shared + 1) % len(self._shared)
+        return self._shared[self._next_shared]
+
+    @contextlib.asynccontextmanager
+    async def _channel(self):
+        if self.confirm_mode == CONFIRM_WINDOWED:
+            # Канал не занимается монопольно: aiormq сериализует запись кадров,
+            # а подтверждения ожидаются параллельно
+            async with self._window:
+                self.outstanding += 1
+                try:
+                    yield await self._shared_channel()
+                finally:
+                    self.outstanding -= 1
+            return
+
+        channel = await self._acquire()
+        try:
+            yield channel
+        finally:
+            await self._release(channel)
+
+    async def publish(self, body, routing_key, **properties):
+        self.active += 1
+        try:
+            await self._publish(body, routing_key, properties)
+        finally:
+            self.active -= 1
+
+    async def _publish(self, body, routing_key, properties):
+        await self.connect()
+
+        for attempt in range(1, self.retries + 1):
+            try:
+                async with self._channel() as channel:
+                    await channel.default_exchange.publish(
+                        Message(body=body, **properties),
+                        routing_key=routing_key
+                    )
+                return
+            except DeliveryError as e:
+                self.nacks += 1
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"Брокер отклонил публикацию в {routing_key}: {e}. Попытка {attempt} из {self.retries}")
+                await asyncio.sleep(0.1 * attempt)
+            except (AMQPError, ConnectionError) as e:
+                if attempt == self.retries or self.connection is None:
+                    raise
+                logging.warning(f"Ошибка публикации в {routing_key}: {e}. Попытка {attempt} из {self.retries}")
+                await self.connection.connected.wait()
+
+    async def drain(self, timeout=30.0):
+        # Дожидается уже начатых публикаций и закрывает соединение
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.active and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+        await self.close()
+
+    async def close(self):
+        if self.connection is not None and not self.connection.is_closed:
+            await self.connection.close()
+        self.connection = None
+        self._shared = []
+        if self._available is not None:
+            # Каналы в работе вычтутся при возврате; ожидающие просыпаются и получают ошибку
+            async with self._available:
+                self._created -= len(self._idle)
+                self._idle.clear()
+                self._available.notify_all()
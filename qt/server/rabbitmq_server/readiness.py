@@ -0,0 +1,35 @@
+import json
+import logging
+import os
+import time
+
+
+class Readiness:
+    # Готовность воркера для оркестратора: пока сервер принимает запросы, файл path существует,
+    # а /ready на порту метрик отвечает 200. Файл заменяется атомарно и не читается наполовину записанным
+    def __init__(self, path=""):
+        self.path = path
+        self.ready = False
+
+    def set_ready(self, **details):
+        self.ready = True
+        if not self.path:
+            return
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({"pid": os.getpid(), "ready_at": time.time(), **details}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Не удалось записать файл готовности {self.path}: {e}")
+
+    def set_not_ready(self):
+        self.ready = False
+        if not self.path:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Не удалось удалить файл готовности {self.path}: {e}")
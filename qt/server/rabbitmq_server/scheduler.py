@@ -0,0 +1,85 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+
+class DelayScheduler:
+    # Отложенные ответы хранятся в куче [срок, номер, элемент]; одна задача спит до ближайшего срока.
+    # Каждый наступивший ответ отправляется своей задачей: зависшая отправка не задерживает остальные
+    def __init__(self, on_due):
+        self.on_due = on_due
+        self._tasks = set()
+        self._heap = []
+        self._counter = itertools.count()
+        self._pending = 0
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return self._pending
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def schedule(self, delay, item):
+        loop = asyncio.get_running_loop()
+        entry = [loop.time() + max(delay, 0.0), next(self._counter), item]
+        heapq.heappush(self._heap, entry)
+        self._pending += 1
+        if self._heap[0] is entry and self._wakeup is not None:
+            self._wakeup.set()
+        return entry
+
+    def cancel(self, entry):
+        # Ленивое удаление: запись остаётся в куче, но будет пропущена при извлечении
+        if entry[2] is None:
+            return False
+        entry[2] = None
+        self._pending -= 1
+        return True
+
+    def pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            # Извлечённую запись уже нельзя отменить
+            item, entry[2] = entry[2], None
+            if item is not None:
+                self._pending -= 1
+                due.append(item)
+        return due
+
+    def _on_sent(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"Ошибка отправки отложенного ответа: {task.exception()}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            for item in self.pop_due(loop.time()):
+                task = asyncio.create_task(self.on_due(item))
+                self._tasks.add(task)
+                task.add_done_callback(self._on_sent)
+
+            timeout = self._heap[0][0] - loop.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
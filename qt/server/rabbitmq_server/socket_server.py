@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import logging
+import os
+
+from google.protobuf.message import DecodeError
+
+from qt.protos import messages_pb2
+from qt.transport.unix import (
+    CANCEL, FRAME_TYPES, MESSAGE_TYPES, RANGE_REQUEST, REQUEST, REQUEST_BATCH, RESPONSE, STREAM_ACK, FrameError,
+    pack_frame, read_frame
+)
+
+
+class FrameMessage:
+    # Кадр запроса в виде входящего сообщения: обработчик тот же, что и для RabbitMQ.
+    # Подтверждать некому - ответ уходит в то же соединение, ack/nack только отмечают обработку
+    def __init__(self, body, type, reply_to):
+        self.body = body
+        self.type = type
+        self.reply_to = reply_to
+        self.headers = {}
+        self.processed = False
+
+    async def ack(self, multiple=False):
+        self.processed = True
+
+    async def nack(self, multiple=False, requeue=True):
+        self.processed = True
+
+    async def reject(self, requeue=False):
+        self.processed = True
+
+
+# Ответов соединения, ждущих записи в сокет
+WRITE_QUEUE_SIZE = 64
+
+
+class SocketConnection:
+    # Ответы пишет в сокет одна задача соединения из ограниченной очереди: обработчики и планировщик
+    # не ждут drain медленного клиента. Клиент, не забирающий ответы дольше write_timeout, отключается
+    def __init__(self, address, writer, write_timeout=5.0, queue_size=WRITE_QUEUE_SIZE):
+        self.address = address
+        self.writer = writer
+        self.write_timeout = write_timeout
+        self.in_flight = 0
+        self.closed = False
+        self._queue = asyncio.Queue(queue_size)
+        self._finished = asyncio.Event()
+        self._write_task = asyncio.create_task(self._write_frames())
+
+    async def publish(self, body, routing_key, type=None, **properties):
+        if self.closed or self.writer.is_closing():
+            raise ConnectionError(f"Соединение {self.address} закрыто")
+        frame = pack_frame(FRAME_TYPES.get(type, RESPONSE), body)
+        try:
+            await asyncio.wait_for(self._queue.put(frame), self.write_timeout or None)
+        except asyncio.TimeoutError:
+            logging.warning(f"Клиент {self.address} не забирает ответы {self.write_timeout:g} с, соединение закрыто")
+            self.close(abort=True)
+            raise ConnectionError(f"Соединение {self.address} закрыто: клиент не забирает ответы") from None
+        if self.closed:
+            raise ConnectionError(f"Соединение {self.address} закрыто")
+
+    async def _write_frames(self):
+        try:
+            while True:
+                frame = await self._queue.get()
+                self.writer.write(frame)
+                await self.writer.drain()
+        except ConnectionError:
+            self.close(abort=True)
+
+    def started(self):
+        self.in_flight += 1
+
+    def finished(self, task=None):
+        self.in_flight -= 1
+        self._finished.set()
+
+    async def wait_below(self, limit):
+        # Как prefetch: пока обрабатывается limit запросов соединения, новые кадры не читаются,
+        # клиент упирается в заполненный буфер сокета. 0 - без ограничения
+        while limit and self.in_flight >= limit:
+            self._finished.clear()
+            await self._finished.wait()
+
+    def close(self, abort=False):
+        if self.closed:
+            return
+        self.closed = True
+        self._write_task.cancel()
+        # Публикации, ждущие места в очереди, просыпаются и получают ConnectionError
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        if abort:
+            # Недописанные ответы не ждут клиента, который их не читает
+            self.writer.transport.abort()
+        else:
+            self.writer.close()
+
+
+class SocketServer:
+    # Запросы по Unix-сокету без брокера: соединения долгоживущие, клиент отправляет
+    # кадры конвейером, ответы возвращаются в то же соединение по мере готовности
+    def __init__(self, path, handler, on_cancel, on_stream_ack=None, max_in_flight=0, write_timeout=5.0):
+        self.path = path
+        self.handler = handler
+        self.on_cancel = on_cancel
+        self.on_stream_ack = on_stream_ack
+        self.max_in_flight = max_in_flight
+        self.write_timeout = write_timeout
+        self.connections = {}
+        self._server = None
+        self._ids = itertools.count(1)
+        self._tasks = set()
+
+    async def start(self):
+        if os.path.exists(self.path):
+            # Сокет остался от предыдущего запуска
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        logging.info(f"Сервер принимает запросы через Unix-сокет {self.path}")
+
+    async def _serve(self, reader, writer):
+        connection = SocketConnection(f"unix-{next(self._ids)}", writer, self.write_timeout)
+        self.connections[connection.address] = connection
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == CANCEL:
+                    cancel = messages_pb2.Cancel()
+                    try:
+                        cancel.ParseFromString(payload)
+                    except DecodeError as e:
+                        logging.error(f"Не удалось разобрать сообщение отмены от {connection.address}: {e}")
+                        continue
+                    await self.on_cancel(list(cancel.request_ids))
+                elif kind == STREAM_ACK:
+                    stream_ack = messages_pb2.StreamAck()
+                    try:
+                        stream_ack.ParseFromString(payload)
+                    except DecodeError as e:
+                        logging.error(f"Не удалось разобрать подтверждение потока от {connection.address}: {e}")
+                        continue
+                    if self.on_stream_ack is not None:
+                        self.on_stream_ack(connection.address, stream_ack.request_id, stream_ack.consumed)
+                elif kind in (REQUEST, REQUEST_BATCH):
+                    self._spawn(FrameMessage(payload, MESSAGE_TYPES.get(kind), connection.address), connection)
+                    await connection.wait_below(self.max_in_flight)
+                elif kind == RANGE_REQUEST:
+                    # Поток ждёт StreamAck из этого же соединения: если из-за него перестать читать кадры,
+                    # поток встанет до таймаута. Число потоков ограничивает отдельный лимит сервера, а не чтение кадров
+                    self._spawn(FrameMessage(payload, MESSAGE_TYPES.get(kind), connection.address))
+                else:
+                    raise FrameError(f"Неожиданный тип кадра: {kind}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except FrameError as e:
+            logging.error(f"Соединение {connection.address} закрыто: {e}")
+        finally:
+            del self.connections[connection.address]
+            connection.close()
+
+    def _spawn(self, message, connection=None):
+        task = asyncio.create_task(self.handler(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if connection is not None:
+            connection.started()
+            task.add_done_callback(connection.finished)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for connection in self.connections.values():
+                connection.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._tasks:
+            task.cancel()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
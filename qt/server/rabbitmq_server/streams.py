@@ -0,0 +1,30 @@
+import asyncio
+
+
+class StreamWindow:
+    # Окно потока: кусок seq отправляется, только когда клиент забрал все куски до seq - window.
+    # Клиент сообщает число забранных кусков сообщениями StreamAck; window 0 - без ограничения
+    def __init__(self, window):
+        self.window = window
+        self.consumed = 0
+        self.cancelled = False
+        self._changed = asyncio.Event()
+
+    def ack(self, consumed):
+        if consumed > self.consumed:
+            self.consumed = consumed
+            self._changed.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self._changed.set()
+
+    async def wait(self, seq, timeout):
+        # False - клиент не забирал куски дольше timeout секунд
+        while self.window and not self.cancelled and seq >= self.consumed + self.window:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
@@ -0,0 +1,148 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class Supervisor:
+    # Запускает N процессов-воркеров, перезапускает упавшие и рассылает им SIGTERM при остановке.
+    # Воркер вызывается как target(index, workers, *args): всё нужное передаётся аргументами,
+    # а не глобальными переменными, которые есть в дочернем процессе только при fork
+    def __init__(self, target, workers, args=(), restart_delay=1.0, max_restart_delay=30.0, shutdown_timeout=10.0,
+                 watcher=None):
+        self.target = target
+        self.args = tuple(args)
+        self.watcher = watcher
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.processes = {}
+        self.restarts = 0
+        self._started_at = {}
+        self._delays = {}
+        # Упавшие воркеры, ждущие перезапуска: номер -> время перезапуска по monotonic
+        self._restart_at = {}
+        self._stopping = False
+
+    def start_worker(self, index):
+        process = multiprocessing.Process(
+            target=self.target,
+            args=(index, self.workers, *self.args),
+            name=f"rabbitmq-server-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        self._started_at[index] = time.monotonic()
+        logging.info(f"Запущен воркер {index} (pid {process.pid})")
+
+    def stop(self, signum=None, frame=None):
+        if not self._stopping:
+            logging.info("Супервизор получил сигнал остановки")
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        logging.info(f"Супервизор запускает {self.workers} воркеров")
+        for index in range(self.workers):
+            self.start_worker(index)
+
+        try:
+            while not self._stopping:
+                self.poll()
+        finally:
+            self.shutdown()
+
+    def poll(self, timeout=0.5):
+        # Один шаг наблюдения. Задержка перезапуска не блокирует цикл: пока один воркер её ждёт,
+        # остальные перезапускаются и конфиг проверяется как обычно
+        if self._restart_at:
+            timeout = max(0.0, min(timeout, min(self._restart_at.values()) - time.monotonic()))
+        sentinels = {
+            process.sentinel: index for index, process in self.processes.items() if index not in self._restart_at
+        }
+        if sentinels:
+            ready = wait(list(sentinels), timeout=timeout)
+        else:
+            time.sleep(timeout)
+            ready = []
+        for sentinel in ready:
+            if self._stopping:
+                return
+            self._schedule_restart(sentinels[sentinel])
+        self._start_due()
+        self._check_config()
+
+    def _check_config(self):
+        if self.watcher is None:
+            return
+        try:
+            new_config = self.watcher.poll()
+        except Exception as e:
+            logging.error(f"Ошибка чтения конфига: {e}")
+            return
+        if new_config is not None:
+            workers = new_config.workers or default_workers()
+            if workers != self.workers:
+                self.resize(workers)
+
+    def resize(self, workers):
+        logging.info(f"Число воркеров меняется с {self.workers} на {workers}")
+        previous, self.workers = self.workers, workers
+        for index in range(previous, workers):
+            self.start_worker(index)
+        for index in range(workers, previous):
+            self._restart_at.pop(index, None)
+            process = self.processes.pop(index)
+            process.terminate()
+            process.join(self.shutdown_timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            logging.info(f"Воркер {index} остановлен")
+
+    def _schedule_restart(self, index):
+        process = self.processes[index]
+        process.join()
+        uptime = time.monotonic() - self._started_at[index]
+
+        # Воркер, падающий сразу после старта, перезапускаем с нарастающей задержкой
+        delay = self._delays.get(index, 0.0)
+        delay = min(max(delay * 2, self.restart_delay), self.max_restart_delay) if uptime < self.max_restart_delay else 0.0
+        self._delays[index] = delay
+
+        logging.error(
+            f"Воркер {index} (pid {process.pid}) завершился с кодом {process.exitcode} "
+            f"через {uptime:.1f} с, перезапуск через {delay:.1f} с"
+        )
+        self.restarts += 1
+        self._restart_at[index] = time.monotonic() + delay
+
+    def _start_due(self):
+        now = time.monotonic()
+        for index, restart_at in list(self._restart_at.items()):
+            if restart_at <= now and not self._stopping:
+                del self._restart_at[index]
+                self.start_worker(index)
+
+    def shutdown(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for index, process in self.processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.warning(f"Воркер {index} не завершился за {self.shutdown_timeout} с, принудительная остановка")
+                process.kill()
+                process.join()
+        logging.info("Все воркеры остановлены")
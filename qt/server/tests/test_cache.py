@@ -0,0 +1,69 @@
+import asyncio
+
+from server.rabbitmq_server.cache import ResultCache
+
+
+def test_cache_hits_and_ttl():
+    now = [0.0]
+    cache = ResultCache(max_size=10, ttl=5.0, clock=lambda: now[0])
+
+    async def scenario():
+        assert await cache.compute_async(2, lambda x: x * 2, 2) == 4
+        assert await cache.compute_async(2, lambda x: x * 100, 2) == 4
+        now[0] = 6.0
+        assert await cache.compute_async(2, lambda x: x * 3, 2) == 6
+
+    asyncio.run(scenario())
+    assert cache.hits == 1
+    assert cache.misses == 2
+    assert cache.evictions == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResultCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("b") == (False, None)
+    assert len(cache) == 2
+
+
+def test_identical_in_flight_requests_share_one_computation():
+    cache = ResultCache()
+    calls = []
+
+    async def slow_double(x):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    async def scenario():
+        return await asyncio.gather(*(cache.compute_async(5, slow_double, 5) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == [10] * 10
+    assert calls == [5]
+    assert cache.stats()["coalesced"] == 9
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_leader_cancellation_does_not_reach_followers():
+    cache = ResultCache()
+
+    async def slow_double(x):
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    async def scenario():
+        leader = asyncio.create_task(cache.compute_async(7, slow_double, 7))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(cache.compute_async(7, slow_double, 7)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        assert leader.cancelled()
+        return results
+
+    assert asyncio.run(scenario()) == [14] * 3
+    assert cache.get(7) == (True, 14)
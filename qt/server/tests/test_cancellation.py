@@ -0,0 +1,52 @@
+import asyncio
+
+from server.rabbitmq_server.cancellation import CancelRegistry
+from server.rabbitmq_server.scheduler import DelayScheduler
+
+
+class FakeAck:
+    def __init__(self):
+        self.results = []
+
+    async def done(self, ok):
+        self.results.append(ok)
+
+
+def test_cancel_removes_scheduled_reply_and_settles_ack():
+    async def scenario():
+        fired = []
+
+        async def on_due(item):
+            fired.append(item)
+
+        scheduler = DelayScheduler(on_due)
+        scheduler.start()
+        registry = CancelRegistry(scheduler)
+        ack = FakeAck()
+        registry.track(scheduler.schedule(0.02, "single"), ["a"], ack)
+        registry.track(scheduler.schedule(0.02, "batch"), ["b", "c"])
+
+        await registry.cancel(["a", "b"])
+        assert ack.results == [True]
+        assert len(scheduler) == 1
+
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        # Пакет отправляется, пока в нём остался неотменённый запрос
+        assert fired == ["batch"]
+        assert registry.cancelled == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancel_before_arrival_is_remembered_until_ttl():
+    now = [0.0]
+    registry = CancelRegistry(scheduler=None, max_tombstones=2, tombstone_ttl=10.0, clock=lambda: now[0])
+    asyncio.run(registry.cancel(["x", "y", "z"]))
+
+    # Старейшая отметка вытеснена лимитом
+    assert not registry.is_cancelled("x")
+    assert registry.is_cancelled("y")
+    assert not registry.is_cancelled("y")
+    now[0] = 11.0
+    assert not registry.is_cancelled("z")
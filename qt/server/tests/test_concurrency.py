@@ -0,0 +1,62 @@
+import asyncio
+
+from server.rabbitmq_server.concurrency import AdaptiveLimit, ConcurrencyLimiter
+
+
+def test_limiter_bounds_in_flight():
+    async def scenario():
+        limiter = ConcurrencyLimiter(2)
+        peak = 0
+        release = asyncio.Event()
+
+        async def handler():
+            nonlocal peak
+            peak = max(peak, limiter.in_flight)
+            await release.wait()
+
+        tasks = [asyncio.create_task(limiter.wrap(handler)()) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert limiter.stats() == {"limit": 2, "in_flight": 2, "queued": 3}
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert peak == 2
+        assert limiter.stats() == {"limit": 2, "in_flight": 0, "queued": 0}
+
+    asyncio.run(scenario())
+
+
+def test_limiter_set_limit_wakes_waiters():
+    async def scenario():
+        limiter = ConcurrencyLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        limiter.set_limit(2)
+        await waiter
+        assert limiter.in_flight == 2
+        assert limiter.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_adaptive_limit_grows_and_backs_off():
+    limiter = ConcurrencyLimiter(100)
+    adaptive = AdaptiveLimit(limiter, min_limit=2, max_limit=4, window=2)
+    assert limiter.limit == 2
+
+    # Задержка стабильна и лимит занят: растёт на 1 за окно, но не выше max_limit
+    limiter.in_flight = 2
+    for _ in range(6):
+        adaptive.observe(0.01)
+    assert limiter.limit == 4
+
+    # Задержка выросла больше чем в tolerance раз: лимит уменьшается, но не ниже min_limit
+    for _ in range(2):
+        adaptive.observe(0.05)
+    assert limiter.limit == 3
+    for _ in range(4):
+        adaptive.observe(0.5)
+    assert limiter.limit == 2
@@ -0,0 +1,61 @@
+import asyncio
+import dataclasses
+import os
+
+import pytest
+
+import server.rabbitmq_server.__main__ as server
+from server.rabbitmq_server.config import CONFIG_PATH, ConfigWatcher, ServerConfig, changed_fields, load_config
+
+
+def test_from_dict_ignores_client_keys_and_coerces_types():
+    config = ServerConfig.from_dict({
+        "broker_url": "amqp://broker:5672",
+        "prefetch_count": "20",
+        "compute_in_thread": "yes",
+        "uuid": "client-only",
+        "log_level": None,
+    })
+    assert config.broker_url == "amqp://broker:5672"
+    assert config.prefetch_count == 20
+    assert config.compute_in_thread is True
+    assert config.log_level == ServerConfig.log_level
+
+
+def test_watcher_reloads_only_when_file_changes(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("prefetch_count: 10\n")
+    watcher = ConfigWatcher(str(path))
+    assert watcher.poll() is None
+
+    path.write_text("prefetch_count: 250\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    new_config = watcher.poll()
+    assert new_config.prefetch_count == 250
+    assert watcher.poll() is None
+    assert changed_fields(load_config(str(path)), ServerConfig()) == {"prefetch_count"}
+
+
+def test_invalid_values_are_rejected_on_load():
+    for data in ({"ack_policy": "late"}, {"max_concurrent_handlers": 0}, {"log_sample_info": 2}):
+        with pytest.raises(ValueError):
+            ServerConfig.from_dict(data)
+
+
+def test_failed_apply_keeps_old_config():
+    async def scenario():
+        server.config = ServerConfig()
+        server.cache = None
+        # Шаг применения падает: глобальный конфиг остаётся прежним, а не наполовину новым
+        with pytest.raises(AttributeError):
+            await server.apply_config(dataclasses.replace(server.config, cache_size=10))
+        assert server.config == ServerConfig()
+
+    asyncio.run(scenario())
+
+
+def test_default_config_path_does_not_depend_on_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert os.path.isfile(CONFIG_PATH)
+    assert load_config().broker_url
@@ -0,0 +1,435 @@
+import asyncio
+import dataclasses
+import json
+
+from aio_pika import Message
+
+import server.rabbitmq_server.__main__ as server
+from qt.protos import messages_pb2
+from qt.tracing import TRACE_SEND, now_us, stamps_from_headers
+from qt.transport import connect, memory
+from qt.transport.sharding import SHARD_EXCHANGE, routing_key
+
+BROKER_URL = "memory://server-tests"
+
+
+def run_with_server(scenario, **settings):
+    # Сервер целиком (main) работает на брокере в памяти, тест публикует запросы как клиент
+    async def wrapper():
+        memory.reset()
+        server.config = server.ServerConfig(broker_url=BROKER_URL, metrics_port=0, **settings)
+        task = asyncio.create_task(server.main())
+        broker = memory.get_broker("server-tests")
+        # Ждём, пока сервер подпишется на запросы и отмены
+        while "cancel_exchange" not in broker.exchanges or not broker.exchanges["cancel_exchange"].bindings:
+            await asyncio.sleep(0.001)
+
+        connection = await connect(BROKER_URL)
+        channel = await connection.channel()
+        replies = await channel.declare_queue("replies", exclusive=True)
+        received = asyncio.Queue()
+        await replies.consume(received.put, no_ack=True)
+        try:
+            await scenario(channel, received, broker)
+        finally:
+            await connection.close()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(wrapper())
+
+
+def request(request_id, number, delay=0.0):
+    return messages_pb2.Request(
+        return_address="replies", request_id=request_id, request=number, proccess_time_in_seconds=delay
+    )
+
+
+def test_request_is_answered_and_acked():
+    async def scenario(channel, received, broker):
+        await channel.default_exchange.publish(
+            Message(body=request("a", 21).SerializeToString()), routing_key="requests_queue"
+        )
+        message = await asyncio.wait_for(received.get(), 1)
+        response = messages_pb2.Response()
+        response.ParseFromString(message.body)
+
+        assert (response.request_id, response.response) == ("a", 42)
+        await asyncio.sleep(0.01)
+        assert server.consumer.unsettled == 0
+
+    run_with_server(scenario)
+
+
+def test_batch_and_malformed_requests():
+    async def scenario(channel, received, broker):
+        await channel.default_exchange.publish(Message(body=b"garbage"), routing_key="requests_queue")
+        batch = messages_pb2.RequestBatch(requests=[request("b1", 1), request("b2", 2, delay=0.02)])
+        await channel.default_exchange.publish(
+            Message(body=batch.SerializeToString(), type="RequestBatch"), routing_key="requests_queue"
+        )
+        message = await asyncio.wait_for(received.get(), 1)
+        responses = messages_pb2.ResponseBatch()
+        responses.ParseFromString(message.body)
+
+        assert message.type == "ResponseBatch"
+        assert [(r.request_id, r.response) for r in responses.responses] == [("b1", 2), ("b2", 4)]
+        # Неразобранный запрос отклонён без возврата в очередь
+        assert not broker.queues["requests_queue"].ready
+
+    run_with_server(scenario)
+
+
+def test_cancelled_delayed_request_is_not_answered():
+    async def scenario(channel, received, broker):
+        await channel.default_exchange.publish(
+            Message(body=request("slow", 1, delay=0.05).SerializeToString()), routing_key="requests_queue"
+        )
+        await channel.default_exchange.publish(
+            Message(body=request("fast", 2, delay=0.05).SerializeToString()), routing_key="requests_queue"
+        )
+        while len(server.scheduler) < 2:
+            await asyncio.sleep(0.001)
+        cancel_exchange = await channel.declare_exchange("cancel_exchange", "fanout")
+        await cancel_exchange.publish(
+            Message(body=messages_pb2.Cancel(request_ids=["slow"]).SerializeToString()), routing_key=""
+        )
+
+        message = await asyncio.wait_for(received.get(), 1)
+        response = messages_pb2.Response()
+        response.ParseFromString(message.body)
+        assert response.request_id == "fast"
+        await asyncio.sleep(0.05)
+        assert received.empty()
+        assert server.consumer.unsettled == 0
+
+    run_with_server(scenario)
+
+
+def test_request_cancelled_within_batch_is_dropped_from_reply(monkeypatch):
+    compute = server.compute
+
+    async def cancelling_compute(number):
+        # Отмена первого запроса пакета приходит, пока считается второй
+        if number == 2:
+            await server.cancel_requests(["b1"])
+        return await compute(number)
+
+    monkeypatch.setattr(server, "compute", cancelling_compute)
+
+    async def scenario(channel, received, broker):
+        batch = messages_pb2.RequestBatch(requests=[request("b1", 1), request("b2", 2), request("b3", 3)])
+        await channel.default_exchange.publish(
+            Message(body=batch.SerializeToString(), type="RequestBatch"), routing_key="requests_queue"
+        )
+        message = await asyncio.wait_for(received.get(), 1)
+        responses = messages_pb2.ResponseBatch()
+        responses.ParseFromString(message.body)
+
+        assert [r.request_id for r in responses.responses] == ["b2", "b3"]
+        assert not server.cancels.is_cancelled("b1")
+
+    run_with_server(scenario)
+
+
+def test_delayed_replies_do_not_block_prefetch():
+    async def scenario(channel, received, broker):
+        # Долгие отложенные ответы не держат доставки: prefetch не исчерпан, быстрый запрос проходит
+        for index in range(3):
+            await channel.default_exchange.publish(
+                Message(body=request(f"slow{index}", 1, delay=1000).SerializeToString()), routing_key="requests_queue"
+            )
+        await channel.default_exchange.publish(
+            Message(body=request("fast", 2).SerializeToString()), routing_key="requests_queue"
+        )
+        message = await asyncio.wait_for(received.get(), 1)
+        response = messages_pb2.Response()
+        response.ParseFromString(message.body)
+        assert response.request_id == "fast"
+        assert len(server.scheduler) == 3
+
+    run_with_server(scenario, prefetch_count=3)
+
+
+def test_trace_stamps_are_returned_and_recorded(tmp_path):
+    trace_path = tmp_path / "server.trace"
+
+    async def scenario(channel, received, broker):
+        await channel.default_exchange.publish(
+            Message(body=request("t", 1).SerializeToString(), headers={TRACE_SEND: now_us()}),
+            routing_key="requests_queue"
+        )
+        message = await asyncio.wait_for(received.get(), 1)
+        stamps = stamps_from_headers(message.headers)
+
+        assert list(stamps) == ["send", "recv", "done", "pub"]
+        assert stamps["send"] <= stamps["recv"] <= stamps["done"] <= stamps["pub"]
+        server.tracer.close()
+        assert json.loads(trace_path.read_text()) == {"id": "t", **stamps}
+
+    run_with_server(scenario, trace_path=str(trace_path))
+
+
+def test_busy_reply_when_limit_and_queue_are_full():
+    async def scenario(channel, received, broker):
+        # Единственный слот занят, и очередь к нему заполнена: запрос не ждёт, а сразу получает отказ
+        assert server.limiter.try_acquire()
+        await channel.default_exchange.publish(
+            Message(body=request("queued", 1).SerializeToString()), routing_key="requests_queue"
+        )
+        while not server.limiter.queued:
+            await asyncio.sleep(0.001)
+        await channel.default_exchange.publish(
+            Message(body=request("busy", 1).SerializeToString()), routing_key="requests_queue"
+        )
+        message = await asyncio.wait_for(received.get(), 1)
+        response = messages_pb2.Response()
+        response.ParseFromString(message.body)
+
+        assert (response.request_id, response.status) == ("busy", messages_pb2.Response.BUSY)
+        server.limiter.release()
+        message = await asyncio.wait_for(received.get(), 1)
+        response.ParseFromString(message.body)
+        assert (response.request_id, response.status) == ("queued", messages_pb2.Response.OK)
+        assert not broker.queues["requests_queue"].ready
+
+    run_with_server(scenario, shed_load=True, max_concurrent_handlers=1)
+
+
+def test_burst_just_over_limit_is_not_shed(monkeypatch):
+    compute = server.compute
+
+    async def slow_compute(number):
+        # Обработчики заняты одновременно: последний запрос всплеска ждёт в очереди
+        await asyncio.sleep(0.02)
+        return await compute(number)
+
+    monkeypatch.setattr(server, "compute", slow_compute)
+
+    async def scenario(channel, received, broker):
+        for index in range(3):
+            await channel.default_exchange.publish(
+                Message(body=request(f"r{index}", index).SerializeToString()), routing_key="requests_queue"
+            )
+        statuses = []
+        for _ in range(3):
+            message = await asyncio.wait_for(received.get(), 1)
+            response = messages_pb2.Response()
+            response.ParseFromString(message.body)
+            statuses.append(response.status)
+
+        assert statuses == [messages_pb2.Response.OK] * 3
+
+    run_with_server(scenario, shed_load=True, max_concurrent_handlers=2)
+
+
+def test_ready_file_exists_while_serving(tmp_path):
+    ready_path = tmp_path / "ready.json"
+
+    async def scenario(channel, received, broker):
+        while not server.readiness.ready:
+            await asyncio.sleep(0.001)
+        assert json.loads(ready_path.read_text())["startup_seconds"] >= 0
+
+    run_with_server(scenario, ready_path=str(ready_path))
+    assert not ready_path.exists()
+
+
+def test_sharded_requests_are_answered():
+    async def scenario(channel, received, broker):
+        exchange = await channel.declare_exchange(SHARD_EXCHANGE, "direct")
+        for request_id in ("k1", "k2", "k3", "k4"):
+            await exchange.publish(
+                Message(body=request(request_id, 1).SerializeToString()),
+                routing_key=routing_key("requests_queue", 3, request_id)
+            )
+        messages = [await asyncio.wait_for(received.get(), 1) for _ in range(4)]
+        response = messages_pb2.Response()
+        answered = set()
+        for message in messages:
+            response.ParseFromString(message.body)
+            answered.add(response.request_id)
+
+        assert answered == {"k1", "k2", "k3", "k4"}
+        # Единственный воркер владеет всеми шардами
+        assert server.consumer.claimed == {0, 1, 2}
+
+    run_with_server(scenario, shards=3)
+
+
+def test_range_request_is_streamed_in_chunks():
+    async def scenario(channel, received, broker):
+        body = messages_pb2.RangeRequest(
+            return_address="replies", request_id="r", start=10, stop=0, step=-1, chunk_size=4
+        ).SerializeToString()
+        await channel.default_exchange.publish(Message(body=body, type="RangeRequest"), routing_key="requests_queue")
+        chunks = []
+        while not chunks or not chunks[-1].end_of_stream:
+            message = await asyncio.wait_for(received.get(), 1)
+            assert message.type == "ResponseChunk"
+            chunk = messages_pb2.ResponseChunk()
+            chunk.ParseFromString(message.body)
+            chunks.append(chunk)
+
+        assert [chunk.seq for chunk in chunks] == [0, 1, 2]
+        assert [n for chunk in chunks for n in chunk.results] == [n * 2 for n in range(10, 0, -1)]
+        await asyncio.sleep(0.01)
+        assert server.consumer.unsettled == 0
+
+    run_with_server(scenario)
+
+
+def test_publisher_counters_survive_publisher_swap():
+    async def scenario(channel, received, broker):
+        server.publisher.nacks = 2
+        server.publisher.reconnects = 1
+        await server.apply_config(dataclasses.replace(server.config, publish_channels=2))
+        # Старый публикатор ещё дорабатывает, а его счётчики уже не пропадают из метрик
+        assert (server.publisher_total("nacks"), server.publisher_total("reconnects")) == (2, 1)
+        while server.draining_publishers:
+            await asyncio.sleep(0.01)
+        assert (server.publisher_total("nacks"), server.publisher_total("reconnects")) == (2, 1)
+
+    run_with_server(scenario)
+
+
+def test_restart_withdraws_replies_of_requeued_messages():
+    async def scenario(channel, received, broker):
+        await channel.default_exchange.publish(
+            Message(body=request("delayed", 1, delay=0.2).SerializeToString()), routing_key="requests_queue"
+        )
+        while len(server.scheduler) < 1:
+            await asyncio.sleep(0.001)
+        old_consumer = server.consumer
+        server.consumer_restart.set()
+        # Старый потребитель закрывается по таймауту дообработки, сообщение уходит новому
+        while old_consumer.connection is server.consumer.connection or not old_consumer.connection.is_closed:
+            await asyncio.sleep(0.001)
+        while server.consumer.unsettled < 1:
+            await asyncio.sleep(0.001)
+        assert len(server.scheduler) == 1
+
+        message = await asyncio.wait_for(received.get(), 1)
+        response = messages_pb2.Response()
+        response.ParseFromString(message.body)
+        assert response.request_id == "delayed"
+        await asyncio.sleep(0.1)
+        assert received.empty()
+        assert server.consumer.unsettled == 0
+
+    run_with_server(scenario, ack_policy="on_publish", drain_timeout=0.05)
+
+
+def test_direct_reply_to_request_without_server_flag():
+    async def scenario(channel, received, broker):
+        body = messages_pb2.Request(return_address="amq.rabbitmq.reply-to", request_id="d", request=3)
+        await channel.default_exchange.publish(
+            Message(body=body.SerializeToString(), reply_to="replies"), routing_key="requests_queue"
+        )
+        message = await asyncio.wait_for(received.get(), 1)
+        response = messages_pb2.Response()
+        response.ParseFromString(message.body)
+        assert (response.request_id, response.response) == ("d", 6)
+
+    run_with_server(scenario, direct_reply_to=False)
+
+
+def test_range_stream_waits_for_client_acks():
+    async def scenario(channel, received, broker):
+        body = messages_pb2.RangeRequest(
+            return_address="replies", request_id="w", start=0, stop=10, chunk_size=1, window=2
+        ).SerializeToString()
+        await channel.default_exchange.publish(Message(body=body, type="RangeRequest"), routing_key="requests_queue")
+        chunk = messages_pb2.ResponseChunk()
+
+        async def receive(count):
+            seqs = []
+            for _ in range(count):
+                chunk.ParseFromString((await asyncio.wait_for(received.get(), 1)).body)
+                seqs.append(chunk.seq)
+            await asyncio.sleep(0.02)
+            assert received.empty()
+            return seqs
+
+        # Без подтверждений сервер не уходит дальше окна
+        assert await receive(2) == [0, 1]
+        control = await channel.declare_exchange("cancel_exchange", "fanout")
+        # Подтверждение потока с тем же request_id, но другим адресом возврата окно не сдвигает
+        stream_ack = messages_pb2.StreamAck(request_id="w", consumed=1, return_address="other")
+        await control.publish(Message(body=stream_ack.SerializeToString(), type="StreamAck"), routing_key="")
+        assert await receive(0) == []
+        stream_ack.return_address = "replies"
+        await control.publish(Message(body=stream_ack.SerializeToString(), type="StreamAck"), routing_key="")
+        assert await receive(1) == [2]
+
+        # Отмена будит поток, ждущий подтверждения
+        await control.publish(Message(body=messages_pb2.Cancel(request_ids=["w"]).SerializeToString()), routing_key="")
+        await asyncio.sleep(0.02)
+        assert received.empty()
+        assert not server.streams
+        assert server.consumer.unsettled == 0
+
+    run_with_server(scenario, ack_policy="on_publish")
+
+
+def test_invalid_range_fails_stream_without_requeue():
+    async def scenario(channel, received, broker):
+        body = messages_pb2.RangeRequest(
+            return_address="replies", request_id="big", start=2 ** 30 - 2, stop=2 ** 30 + 2
+        ).SerializeToString()
+        await channel.default_exchange.publish(Message(body=body, type="RangeRequest"), routing_key="requests_queue")
+        chunk = messages_pb2.ResponseChunk()
+        chunk.ParseFromString((await asyncio.wait_for(received.get(), 1)).body)
+
+        assert (chunk.request_id, chunk.seq, chunk.end_of_stream) == ("big", 0, True)
+        assert chunk.status == messages_pb2.Response.FAILED
+        assert "int32" in chunk.error
+        await asyncio.sleep(0.01)
+        assert not broker.queues["requests_queue"].ready
+        assert server.consumer.unsettled == 0
+
+    run_with_server(scenario, ack_policy="on_publish")
+
+
+def test_stream_ack_timeout_fails_stream():
+    async def scenario(channel, received, broker):
+        body = messages_pb2.RangeRequest(
+            return_address="replies", request_id="idle", start=0, stop=10, chunk_size=1, window=1
+        ).SerializeToString()
+        await channel.default_exchange.publish(Message(body=body, type="RangeRequest"), routing_key="requests_queue")
+        chunks = []
+        for _ in range(2):
+            chunk = messages_pb2.ResponseChunk()
+            chunk.ParseFromString((await asyncio.wait_for(received.get(), 1)).body)
+            chunks.append(chunk)
+
+        # Клиент не подтвердил первый кусок: вместо второго приходит последний кусок с ошибкой
+        assert [(chunk.seq, chunk.status) for chunk in chunks] == [
+            (0, messages_pb2.Response.OK), (1, messages_pb2.Response.FAILED)
+        ]
+        assert chunks[1].end_of_stream
+        assert not server.streams
+
+    run_with_server(scenario, stream_ack_timeout=0.05)
+
+
+def test_streams_have_their_own_limit():
+    async def scenario(channel, received, broker):
+        # Все обработчики заняты, а поток всё равно идёт; второй поток сверх лимита сразу получает отказ
+        assert server.limiter.try_acquire()
+        for request_id in ("first", "second"):
+            body = messages_pb2.RangeRequest(
+                return_address="replies", request_id=request_id, start=0, stop=10, chunk_size=1, window=1
+            ).SerializeToString()
+            await channel.default_exchange.publish(Message(body=body, type="RangeRequest"), routing_key="requests_queue")
+        chunks = []
+        for _ in range(2):
+            chunk = messages_pb2.ResponseChunk()
+            chunk.ParseFromString((await asyncio.wait_for(received.get(), 1)).body)
+            chunks.append((chunk.request_id, chunk.seq, chunk.status))
+
+        assert sorted(chunks) == [("first", 0, messages_pb2.Response.OK), ("second", 0, messages_pb2.Response.BUSY)]
+        await server.cancel_requests(["first"])
+        server.limiter.release()
+
+    run_with_server(scenario, max_concurrent_handlers=1, max_concurrent_streams=1)
@@ -0,0 +1,31 @@
+import logging
+
+from server.rabbitmq_server.logs import DeferredQueueHandler, SamplingFilter
+
+
+def make_record(level, msg="сообщение %s", args=("x",)):
+    return logging.LogRecord("rabbitmq_server.requests", level, __file__, 1, msg, args, None)
+
+
+def test_sampling_filter_keeps_requested_share():
+    sampler = SamplingFilter({logging.INFO: 0.25})
+    kept = sum(sampler.filter(make_record(logging.INFO)) for _ in range(100))
+    assert kept == 25
+
+
+def test_sampling_filter_never_drops_warnings():
+    sampler = SamplingFilter({logging.WARNING: 0.0, logging.ERROR: 0.0})
+    assert sampler.filter(make_record(logging.WARNING))
+    assert sampler.filter(make_record(logging.ERROR))
+
+
+def test_queue_handler_defers_formatting():
+    class Queue(list):
+        put_nowait = list.append
+
+    queue = Queue()
+    record = make_record(logging.INFO)
+    DeferredQueueHandler(queue).handle(record)
+    assert queue[0].msg == "сообщение %s"
+    assert queue[0].args == ("x",)
+    assert queue[0].getMessage() == "сообщение x"
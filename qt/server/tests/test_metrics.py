@@ -0,0 +1,69 @@
+import asyncio
+
+from server.rabbitmq_server.metrics import Registry, start_metrics_server
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests")
+    registry.gauge("in_flight", "In flight", lambda: 3)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+    requests.inc(type="Request")
+    requests.inc(2, type="Request")
+    latency.observe(0.05, stage="parse")
+    latency.observe(0.5, stage="parse")
+
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{type="Request"} 3' in text
+    assert 'in_flight 3' in text
+    assert 'latency_seconds_bucket{stage="parse",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="parse",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{stage="parse"} 2' in text
+
+
+def test_metrics_endpoint_serves_registry():
+    registry = Registry()
+    registry.counter("hits_total", "Hits").inc()
+
+    async def scenario():
+        server = await start_metrics_server("127.0.0.1", 0, registry)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response.decode()
+
+    response = asyncio.run(scenario())
+    assert response.startswith("HTTP/1.0 200 OK")
+    assert "hits_total 1" in response
+
+
+def test_ready_endpoint_follows_readiness():
+    ready = False
+
+    async def get(port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    async def scenario():
+        nonlocal ready
+        server = await start_metrics_server("127.0.0.1", 0, Registry(), ready=lambda: ready)
+        port = server.sockets[0].getsockname()[1]
+        responses = [await get(port, "/ready")]
+        ready = True
+        responses.append(await get(port, "/ready"))
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    not_ready, ready_response = asyncio.run(scenario())
+    assert not_ready.startswith("HTTP/1.0 503")
+    assert ready_response.startswith("HTTP/1.0 200 OK")
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from aio_pika.exceptions import DeliveryError
+
+from server.rabbitmq_server.publisher import CONFIRM_PER_MESSAGE, CONFIRM_WINDOWED, Publisher
+from qt.transport import memory
+
+BROKER_URL = "memory://publisher-tests"
+
+
+class SlowPublisher(Publisher):
+    # Брокер в памяти отвечает мгновенно: задержки открытия канала и подтверждения добавляются здесь,
+    # failures - исключения, которыми завершатся первые публикации
+    def __init__(self, *args, open_delay=0.0, confirm_delay=0.0, failures=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.open_delay = open_delay
+        self.confirm_delay = confirm_delay
+        self.failures = list(failures)
+        self.opened = 0
+        self.open_channels = []
+        self.max_outstanding = 0
+
+    async def _open_channel(self):
+        self.opened += 1
+        await asyncio.sleep(self.open_delay)
+        channel = await super()._open_channel()
+        self.open_channels.append(channel)
+        publish = channel.default_exchange.publish
+
+        async def confirmed_publish(message, routing_key, **kwargs):
+            self.max_outstanding = max(self.max_outstanding, self.outstanding)
+            await asyncio.sleep(self.confirm_delay)
+            if self.failures:
+                raise self.failures.pop(0)
+            await publish(message, routing_key, **kwargs)
+
+        channel.default_exchange.publish = confirmed_publish
+        return channel
+
+
+def run(scenario):
+    async def wrapper():
+        memory.reset()
+        broker = memory.get_broker("publisher-tests")
+        connection = await memory.connect(BROKER_URL)
+        channel = await connection.channel()
+        await channel.declare_queue("replies")
+        try:
+            await scenario(broker)
+        finally:
+            await connection.close()
+
+    asyncio.run(wrapper())
+
+
+def test_burst_opens_at_most_pool_size_channels():
+    async def scenario(broker):
+        for mode in (CONFIRM_WINDOWED, CONFIRM_PER_MESSAGE):
+            publisher = SlowPublisher(BROKER_URL, pool_size=4, confirm_mode=mode, open_delay=0.01)
+            await asyncio.gather(*(publisher.publish(b"x", "replies") for _ in range(200)))
+            assert publisher.opened <= 4
+            await publisher.close()
+        assert len(broker.queues["replies"].ready) == 400
+
+    run(scenario)
+
+
+def test_waiters_reopen_channels_lost_by_the_pool():
+    async def scenario(broker):
+        # Оба канала пула закрываются посреди публикации: ожидающие своей очереди не зависают
+        publisher = SlowPublisher(BROKER_URL, pool_size=2, retries=1, confirm_mode=CONFIRM_PER_MESSAGE, confirm_delay=0.02)
+        publishes = [asyncio.create_task(publisher.publish(b"x", "replies")) for _ in range(4)]
+        while len(publisher.open_channels) < 2:
+            await asyncio.sleep(0.001)
+        for channel in publisher.open_channels:
+            await channel.close()
+        results = await asyncio.wait_for(asyncio.gather(*publishes, return_exceptions=True), 1)
+
+        assert [type(result) for result in results] == [ConnectionError, ConnectionError, type(None), type(None)]
+        assert len(broker.queues["replies"].ready) == 2
+        await publisher.close()
+
+    run(scenario)
+
+
+def test_close_wakes_waiting_publications():
+    async def scenario(broker):
+        publisher = SlowPublisher(BROKER_URL, pool_size=1, confirm_mode=CONFIRM_PER_MESSAGE, confirm_delay=0.05)
+        publishes = [asyncio.create_task(publisher.publish(b"x", "replies")) for _ in range(3)]
+        while not publisher.open_channels:
+            await asyncio.sleep(0.001)
+        await publisher.close()
+        results = await asyncio.wait_for(asyncio.gather(*publishes, return_exceptions=True), 1)
+        assert all(isinstance(result, ConnectionError) for result in results)
+
+    run(scenario)
+
+
+def test_unconfirmed_publications_are_bounded_by_window():
+    async def scenario(broker):
+        publisher = SlowPublisher(BROKER_URL, confirm_window=5, confirm_delay=0.005)
+        await asyncio.gather(*(publisher.publish(b"x", "replies") for _ in range(50)))
+        assert publisher.max_outstanding == 5
+        assert len(broker.queues["replies"].ready) == 50
+        await publisher.close()
+
+    run(scenario)
+
+
+def test_nacked_and_failed_publications_are_retried():
+    async def scenario(broker):
+        publisher = SlowPublisher(
+            BROKER_URL, retries=3, failures=[DeliveryError(None, None), ConnectionError("обрыв")]
+        )
+        await publisher.publish(b"x", "replies")
+        assert publisher.nacks == 1
+        assert len(broker.queues["replies"].ready) == 1
+
+        publisher.failures = [DeliveryError(None, None)] * 3
+        # После исчерпания попыток ошибка доходит до вызывающего
+        with pytest.raises(DeliveryError):
+            await publisher.publish(b"y", "replies")
+        assert publisher.nacks == 4
+        assert len(broker.queues["replies"].ready) == 1
+        await publisher.close()
+
+    run(scenario)
@@ -0,0 +1,70 @@
+import asyncio
+
+from server.rabbitmq_server.scheduler import DelayScheduler
+
+
+def test_scheduler_fires_in_due_order():
+    async def scenario():
+        fired = []
+
+        async def on_due(item):
+            fired.append(item)
+
+        scheduler = DelayScheduler(on_due)
+        scheduler.start()
+        scheduler.schedule(0.03, "c")
+        scheduler.schedule(0.01, "a")
+        scheduler.schedule(0.02, "b")
+        assert len(scheduler) == 3
+
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        assert fired == ["a", "b", "c"]
+        assert len(scheduler) == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_entry_is_skipped():
+    async def scenario():
+        fired = []
+
+        async def on_due(item):
+            fired.append(item)
+
+        scheduler = DelayScheduler(on_due)
+        scheduler.start()
+        entry = scheduler.schedule(0.01, "cancelled")
+        scheduler.schedule(0.02, "kept")
+        assert scheduler.cancel(entry)
+        assert not scheduler.cancel(entry)
+
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        assert fired == ["kept"]
+
+    asyncio.run(scenario())
+
+
+def test_stalled_send_does_not_block_later_entries():
+    async def scenario():
+        fired = []
+        stalled = asyncio.Event()
+
+        async def on_due(item):
+            if item == "stalled":
+                await stalled.wait()
+            fired.append(item)
+
+        scheduler = DelayScheduler(on_due)
+        scheduler.start()
+        scheduler.schedule(0.0, "stalled")
+        scheduler.schedule(0.02, "later")
+
+        await asyncio.sleep(0.05)
+        assert fired == ["later"]
+        # Остановка отменяет зависшую отправку, а не ждёт её
+        await asyncio.wait_for(scheduler.stop(), 1)
+        assert fired == ["later"]
+
+    asyncio.run(scenario())
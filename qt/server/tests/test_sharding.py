@@ -0,0 +1,56 @@
+import asyncio
+import uuid
+
+from aio_pika import Message
+
+from server.rabbitmq_server.consumer import RequestConsumer
+from qt.transport import connect, memory
+from qt.transport.sharding import SHARD_EXCHANGE, claimed_shards, routing_key, shard_queue
+
+BROKER_URL = "memory://sharding-tests"
+
+
+def test_routing_key_is_stable_and_spreads_keys():
+    assert routing_key("requests", 0, "key") == "requests"
+    assert routing_key("requests", 4, "key") == routing_key("requests", 4, "key")
+    used = {routing_key("requests", 4, uuid.uuid4()) for _ in range(200)}
+    assert used == {shard_queue("requests", index) for index in range(4)}
+    assert claimed_shards(5, 1, 2) == {1, 3}
+
+
+def test_claimed_shards_go_to_owner_and_fail_over():
+    async def scenario():
+        memory.reset()
+        received = []
+
+        def consumer(name, claimed):
+            async def handler(message):
+                received.append((name, message.routing_key))
+                await message.ack()
+            return RequestConsumer(BROKER_URL, "requests", 10, handler, shards=2, claimed=claimed)
+
+        first, second = consumer("first", {0}), consumer("second", {1})
+        await first.start()
+        await second.start()
+        connection = await connect(BROKER_URL)
+        channel = await connection.channel()
+        exchange = await channel.declare_exchange(SHARD_EXCHANGE, "direct")
+
+        async def publish_to_shards():
+            for index in range(2):
+                await exchange.publish(Message(body=b""), routing_key=shard_queue("requests", index))
+            await asyncio.sleep(0.01)
+
+        await publish_to_shards()
+        assert received == [("first", "requests.shard0"), ("second", "requests.shard1")]
+
+        # Владелец шарда отключился: шард переходит к оставшемуся серверу
+        received.clear()
+        await first.close()
+        await publish_to_shards()
+        assert received == [("second", "requests.shard0"), ("second", "requests.shard1")]
+
+        await second.close()
+        await connection.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,158 @@
+import asyncio
+
+import server.rabbitmq_server.__main__ as server
+from server.rabbitmq_server.socket_server import SocketServer
+from qt.protos import messages_pb2
+from qt.transport.unix import CANCEL, REQUEST, REQUEST_BATCH, RESPONSE, RESPONSE_BATCH, pack_frame, read_frame
+
+
+def request(request_id, number, delay=0.0):
+    return messages_pb2.Request(
+        return_address="unused", request_id=request_id, request=number, proccess_time_in_seconds=delay
+    )
+
+
+def test_pipelined_requests_over_unix_socket(tmp_path):
+    socket_path = str(tmp_path / "server.sock")
+
+    async def scenario():
+        server.config = server.ServerConfig(transport="unix", socket_path=socket_path, metrics_port=0)
+        task = asyncio.create_task(server.main())
+        while server.socket_server is None or server.socket_server._server is None:
+            await asyncio.sleep(0.001)
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+
+        # Все кадры отправляются разом, ответы приходят по готовности, а не по порядку отправки
+        writer.write(pack_frame(REQUEST, request("slow", 1, delay=0.05).SerializeToString()))
+        writer.write(pack_frame(REQUEST, request("cancelled", 2, delay=0.05).SerializeToString()))
+        batch = messages_pb2.RequestBatch(requests=[request("b1", 3), request("b2", 4)])
+        writer.write(pack_frame(REQUEST_BATCH, batch.SerializeToString()))
+        writer.write(pack_frame(REQUEST, request("fast", 5).SerializeToString()))
+        while len(server.scheduler) < 2:
+            await asyncio.sleep(0.001)
+        writer.write(pack_frame(CANCEL, messages_pb2.Cancel(request_ids=["cancelled"]).SerializeToString()))
+
+        results = {}
+        for _ in range(3):
+            kind, payload = await asyncio.wait_for(read_frame(reader), 1)
+            if kind == RESPONSE_BATCH:
+                responses = messages_pb2.ResponseBatch()
+                responses.ParseFromString(payload)
+                results.update((r.request_id, r.response) for r in responses.responses)
+            else:
+                assert kind == RESPONSE
+                response = messages_pb2.Response()
+                response.ParseFromString(payload)
+                results[response.request_id] = response.response
+            if len(results) == 1:
+                assert "slow" not in results
+
+        assert results == {"slow": 2, "b1": 6, "b2": 8, "fast": 10}
+        writer.close()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_reply_to_closed_connection_is_dropped(tmp_path):
+    socket_path = str(tmp_path / "server.sock")
+
+    async def scenario():
+        server.config = server.ServerConfig(transport="unix", socket_path=socket_path, metrics_port=0)
+        task = asyncio.create_task(server.main())
+        while server.socket_server is None or server.socket_server._server is None:
+            await asyncio.sleep(0.001)
+
+        # Клиент ушёл, не дождавшись отложенного ответа: ответ не уходит через брокер
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(pack_frame(REQUEST, request("gone", 1, delay=0.02).SerializeToString()))
+        while len(server.scheduler) < 1:
+            await asyncio.sleep(0.001)
+        writer.close()
+        while server.socket_server.connections:
+            await asyncio.sleep(0.001)
+        while len(server.scheduler):
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.01)
+        assert server.publisher.connection is None
+
+        # Неразобранная отмена не закрывает соединение
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(pack_frame(CANCEL, b"\xff"))
+        writer.write(pack_frame(REQUEST, request("ok", 2).SerializeToString()))
+        kind, payload = await asyncio.wait_for(read_frame(reader), 1)
+        response = messages_pb2.Response()
+        response.ParseFromString(payload)
+        assert (kind, response.request_id, response.response) == (RESPONSE, "ok", 4)
+        writer.close()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_reading_pauses_while_connection_has_max_in_flight(tmp_path):
+    socket_path = str(tmp_path / "server.sock")
+
+    async def scenario():
+        started = []
+        release = asyncio.Event()
+
+        async def handler(message):
+            started.append(message)
+            await release.wait()
+
+        async def on_cancel(request_ids):
+            pass
+
+        socket_server = SocketServer(socket_path, handler, on_cancel, max_in_flight=2)
+        await socket_server.start()
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        for index in range(5):
+            writer.write(pack_frame(REQUEST, request(str(index), index).SerializeToString()))
+        await asyncio.sleep(0.05)
+        # Кадры сверх лимита ждут в сокете, задачи на них не создаются
+        assert len(started) == 2
+
+        release.set()
+        while len(started) < 5:
+            await asyncio.sleep(0.001)
+        writer.close()
+        await socket_server.close()
+
+    asyncio.run(scenario())
+
+
+def test_client_not_reading_replies_is_disconnected(tmp_path):
+    socket_path = str(tmp_path / "server.sock")
+
+    async def scenario():
+        errors = []
+
+        async def handler(message):
+            connection = socket_server.connections[message.reply_to]
+            try:
+                # Ответы больше буфера сокета: клиент их не читает, очередь записи заполняется
+                for _ in range(100):
+                    await connection.publish(b"x" * 65536, message.reply_to)
+            except ConnectionError as e:
+                errors.append(e)
+
+        async def on_cancel(request_ids):
+            pass
+
+        socket_server = SocketServer(socket_path, handler, on_cancel, write_timeout=0.05)
+        await socket_server.start()
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(pack_frame(REQUEST, request("flood", 1).SerializeToString()))
+
+        while not errors:
+            await asyncio.sleep(0.001)
+        # Соединение закрыто сервером, его ответы не копятся в памяти
+        while socket_server.connections:
+            await asyncio.sleep(0.001)
+        writer.close()
+        await socket_server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,46 @@
+import multiprocessing
+import time
+
+from server.rabbitmq_server.supervisor import Supervisor
+
+
+def record_arguments(index, workers, path):
+    with open(path, "a") as f:
+        f.write(f"{index} {workers}\n")
+
+
+def test_workers_receive_arguments_under_spawn(tmp_path):
+    # При spawn дочерний процесс не видит глобальных переменных родителя: всё приходит аргументами
+    path = tmp_path / "workers.txt"
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method("spawn", force=True)
+    try:
+        supervisor = Supervisor(record_arguments, 2, args=(str(path),))
+        for index in range(2):
+            supervisor.start_worker(index)
+        supervisor.resize(3)
+        for process in supervisor.processes.values():
+            process.join(30)
+    finally:
+        multiprocessing.set_start_method(start_method, force=True)
+
+    assert sorted(path.read_text().splitlines()) == ["0 2", "1 2", "2 3"]
+
+
+def test_restart_backoff_does_not_block_monitoring(tmp_path):
+    path = tmp_path / "workers.txt"
+    supervisor = Supervisor(record_arguments, 2, args=(str(path),), restart_delay=10.0)
+    for index in range(2):
+        supervisor.start_worker(index)
+
+    # Оба воркера сразу завершаются: задержка перезапуска не останавливает цикл наблюдения
+    started = time.monotonic()
+    while len(supervisor._restart_at) < 2:
+        supervisor.poll(timeout=0.1)
+    assert time.monotonic() - started < 5
+
+    supervisor._restart_at[1] = 0.0
+    supervisor.poll(timeout=0.0)
+    supervisor.processes[1].join(30)
+    assert list(supervisor._restart_at) == [0]
+    assert sorted(path.read_text().splitlines()) == ["0 2", "1 2", "1 2"]
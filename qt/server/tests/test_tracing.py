@@ -0,0 +1,30 @@
+from qt.tracing import percentile
+from tracing.__main__ import aggregate
+
+
+def test_aggregate_breaks_latency_down_by_hop():
+    records = [
+        {"id": "a", "send": 0, "recv": 1000, "done": 1500, "pub": 2500, "back": 3000},
+        {"id": "b", "send": 0, "recv": 3000, "done": 3500, "pub": 4500, "back": 5000},
+        # Запись сервера: участки клиента не учитываются
+        {"id": "c", "recv": 0, "done": 2000, "pub": 2000},
+    ]
+    breakdown = aggregate(records)
+
+    assert breakdown["queue"]["count"] == 2
+    assert breakdown["queue"]["mean"] == 2.0
+    assert breakdown["queue"]["max"] == 3.0
+    assert breakdown["compute"]["count"] == 3
+    assert breakdown["compute"]["p99"] == 2.0
+    assert breakdown["total"]["p50"] == 3.0
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 1001))
+
+    assert percentile(values, 50) == 500
+    assert percentile(values, 99) == 990
+    assert percentile(values, 99.9) == 999
+    assert percentile(values, 100) == 1000
+    assert percentile([7], 99.9) == 7
+    assert percentile([], 50) is None
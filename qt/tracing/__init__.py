@@ -0,0 +1,48 @@
+import json
+import math
+import threading
+import time
+
+# Отметки времени запроса: отправка клиентом, получение сервером, результат готов,
+# публикация ответа, получение ответа клиентом. Целые микросекунды с эпохи: вещественные
+# значения в заголовках AMQP кодируются float32 и теряют точность
+STAMPS = ("send", "recv", "done", "pub", "back")
+HEADERS = {stamp: f"x-trace-{stamp}" for stamp in STAMPS}
+TRACE_SEND = HEADERS["send"]
+TRACE_RECV = HEADERS["recv"]
+TRACE_DONE = HEADERS["done"]
+TRACE_PUB = HEADERS["pub"]
+
+
+def now_us():
+    return time.time_ns() // 1000
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # round убирает погрешность float: 99.9% от 1000 должно давать ранг 999, а не 1000
+    rank = max(1, math.ceil(round(q * len(sorted_values) / 100.0, 9)))
+    return sorted_values[rank - 1]
+
+
+def stamps_from_headers(headers):
+    headers = headers or {}
+    return {stamp: headers[header] for stamp, header in HEADERS.items() if header in headers}
+
+
+class TraceWriter:
+    # Одна запись - одна строка JSON вида {"id":..,"send":..,"recv":..}; запись идёт через буфер файла
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1 << 16)
+        self._lock = threading.Lock()
+
+    def write(self, request_id, **stamps):
+        line = json.dumps({"id": request_id, **stamps}, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
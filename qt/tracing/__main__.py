@@ -0,0 +1,70 @@
+import argparse
+import json
+import sys
+
+from qt.tracing import percentile
+
+# Участки пути запроса: очередь брокера и ожидание обработчика, вычисление,
+# отложенная отправка, публикация и доставка ответа клиенту, весь путь
+HOPS = (
+    ("queue", "send", "recv"),
+    ("compute", "recv", "done"),
+    ("delay", "done", "pub"),
+    ("return", "pub", "back"),
+    ("total", "send", "back"),
+)
+PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0))
+
+
+def read_records(paths):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def aggregate(records):
+    # Участок учитывается, только если в записи есть обе его отметки: серверный файл без send/back тоже годится
+    durations = {name: [] for name, _, _ in HOPS}
+    for record in records:
+        for name, start, end in HOPS:
+            if start in record and end in record:
+                durations[name].append((record[end] - record[start]) / 1000.0)
+
+    breakdown = {}
+    for name, values in durations.items():
+        if not values:
+            continue
+        values.sort()
+        breakdown[name] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            **{label: percentile(values, q) for label, q in PERCENTILES},
+            "max": values[-1],
+        }
+    return breakdown
+
+
+def format_breakdown(breakdown):
+    columns = ["count", "mean"] + [label for label, _ in PERCENTILES] + ["max"]
+    lines = [f"{'участок':10}" + "".join(f"{column:>12}" for column in columns)]
+    for name, stats in breakdown.items():
+        cells = [f"{stats['count']:>12}"] + [f"{stats[column]:>12.3f}" for column in columns[1:]]
+        lines.append(f"{name:10}" + "".join(cells))
+    lines.append("Время в миллисекундах; send/back - часы клиента, recv/done/pub - часы сервера")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Разбивка задержки запросов по участкам из файлов трассировки")
+    parser.add_argument("paths", nargs="+", help="файлы трассировки клиента или сервера")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    breakdown = aggregate(read_records(args.paths))
+    if args.json:
+        json.dump(breakdown, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(format_breakdown(breakdown))
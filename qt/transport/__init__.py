@@ -0,0 +1,21 @@
+from urllib.parse import urlparse
+
+MEMORY_SCHEME = "memory"
+
+
+# Соединение выбирается по схеме адреса брокера: amqp(s):// - aio_pika, memory:// - брокер в памяти процесса.
+# Объекты соединения повторяют нужную серверу и клиенту часть API aio_pika
+async def connect(url, **kwargs):
+    if urlparse(url).scheme == MEMORY_SCHEME:
+        from qt.transport import memory
+        return await memory.connect(url, **kwargs)
+    import aio_pika
+    return await aio_pika.connect(url, **kwargs)
+
+
+async def connect_robust(url, **kwargs):
+    if urlparse(url).scheme == MEMORY_SCHEME:
+        from qt.transport import memory
+        return await memory.connect_robust(url, **kwargs)
+    import aio_pika
+    return await aio_pika.connect_robust(url, **kwargs)
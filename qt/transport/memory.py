@@ -0,0 +1,381 @@
+import asyncio
+import collections
+import inspect
+import itertools
+import uuid
+from urllib.parse import urlparse
+
+from aio_pika import ExchangeType
+from aio_pika.exceptions import ChannelNotFoundEntity
+
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"
+MESSAGE_PROPERTIES = (
+    "headers", "content_type", "content_encoding", "delivery_mode", "priority", "correlation_id",
+    "reply_to", "expiration", "message_id", "timestamp", "type", "user_id", "app_id",
+)
+
+_brokers = {}
+
+
+def get_broker(name="default"):
+    broker = _brokers.get(name)
+    if broker is None:
+        broker = _brokers[name] = MemoryBroker(name)
+    return broker
+
+
+def reset():
+    _brokers.clear()
+
+
+async def connect(url="memory://", **kwargs):
+    # memory://имя - брокер внутри процесса; клиенты с одинаковым именем видят одни очереди
+    return MemoryConnection(get_broker(urlparse(url).netloc or "default"))
+
+
+connect_robust = connect
+
+
+class MemoryBroker:
+    # Очереди и обменники в памяти с семантикой RabbitMQ, нужной серверу и клиенту:
+    # маршрутизация direct/fanout, prefetch на потребителя, ack/nack/reject, возврат неподтверждённых,
+    # single active consumer с приоритетами потребителей
+    def __init__(self, name):
+        self.name = name
+        self.queues = {}
+        self.exchanges = {"": _ExchangeState("", ExchangeType.DIRECT)}
+        self.published = 0
+        self.delivered = 0
+        self._delivery_tags = itertools.count(1)
+
+    def declare_queue(self, name, owner=None, exclusive=False, auto_delete=False, passive=False, arguments=None):
+        queue = self.queues.get(name)
+        if queue is None:
+            if passive:
+                raise ChannelNotFoundEntity(f"NOT_FOUND - no queue '{name}' in broker '{self.name}'")
+            queue = self.queues[name] = _QueueState(self, name, owner if exclusive or auto_delete else None)
+            queue.single_active = bool((arguments or {}).get("x-single-active-consumer"))
+        return queue
+
+    def delete_queue(self, name):
+        queue = self.queues.pop(name, None)
+        if queue is None:
+            return
+        for exchange in self.exchanges.values():
+            exchange.bindings = {binding for binding in exchange.bindings if binding[0] != name}
+
+    def declare_exchange(self, name, type):
+        exchange = self.exchanges.get(name)
+        if exchange is None:
+            exchange = self.exchanges[name] = _ExchangeState(name, ExchangeType(type))
+        return exchange
+
+    def route(self, exchange_name, routing_key, message):
+        self.published += 1
+        exchange = self.exchanges.get(exchange_name)
+        if exchange is None:
+            raise ChannelNotFoundEntity(f"NOT_FOUND - no exchange '{exchange_name}' in broker '{self.name}'")
+        if exchange_name == "":
+            names = (routing_key,)
+        elif exchange.type == ExchangeType.FANOUT:
+            names = {name for name, _ in exchange.bindings}
+        else:
+            names = {name for name, key in exchange.bindings if key == routing_key}
+        # Сообщение без подходящей очереди теряется, как в RabbitMQ без mandatory
+        for name in names:
+            queue = self.queues.get(name)
+            if queue is not None:
+                queue.put(message, exchange_name, routing_key)
+
+
+class _ExchangeState:
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+        self.bindings = set()
+
+
+class _Consumer:
+    def __init__(self, queue, channel, callback, no_ack, tag, priority=0):
+        self.queue = queue
+        self.channel = channel
+        self.callback = callback
+        self.no_ack = no_ack
+        self.tag = tag
+        self.priority = priority
+        self.unacked = set()
+
+    def has_capacity(self):
+        return self.no_ack or not self.channel.prefetch_count or len(self.unacked) < self.channel.prefetch_count
+
+
+class _QueueState:
+    def __init__(self, broker, name, owner):
+        self.broker = broker
+        self.name = name
+        self.owner = owner
+        self.ready = collections.deque()
+        self.consumers = []
+        self.single_active = False
+        self._next_consumer = 0
+
+    def put(self, message, exchange, routing_key, redelivered=False, front=False):
+        entry = (message, exchange, routing_key, redelivered)
+        if front:
+            self.ready.appendleft(entry)
+        else:
+            self.ready.append(entry)
+        self.dispatch()
+
+    def dispatch(self):
+        while self.ready and self.consumers:
+            consumer = self._pick_consumer()
+            if consumer is None:
+                return
+            message, exchange, routing_key, redelivered = self.ready.popleft()
+            incoming = MemoryIncomingMessage(
+                message, consumer, next(self.broker._delivery_tags), exchange, routing_key, redelivered
+            )
+            if not consumer.no_ack:
+                consumer.unacked.add(incoming)
+            self.broker.delivered += 1
+            asyncio.get_running_loop().create_task(_deliver(consumer.callback, incoming))
+
+    @property
+    def active_consumer(self):
+        # Активен подписчик с наибольшим приоритетом, среди равных - подписавшийся первым
+        return max(self.consumers, key=lambda consumer: consumer.priority, default=None)
+
+    def _pick_consumer(self):
+        if self.single_active:
+            consumer = self.active_consumer
+            return consumer if consumer.has_capacity() else None
+        # Круговой обход потребителей, пропуская исчерпавших prefetch
+        for _ in range(len(self.consumers)):
+            consumer = self.consumers[self._next_consumer % len(self.consumers)]
+            self._next_consumer += 1
+            if consumer.has_capacity():
+                return consumer
+        return None
+
+    def settle(self, consumer, incoming, requeue):
+        consumer.unacked.discard(incoming)
+        if requeue:
+            self.put(incoming.message, incoming.exchange, incoming.routing_key, redelivered=True, front=True)
+        else:
+            self.dispatch()
+
+
+async def _deliver(callback, message):
+    result = callback(message)
+    if inspect.isawaitable(result):
+        await result
+
+
+class MemoryIncomingMessage:
+    def __init__(self, message, consumer, delivery_tag, exchange, routing_key, redelivered):
+        self.message = message
+        self.body = message.body
+        for name in MESSAGE_PROPERTIES:
+            setattr(self, name, getattr(message, name, None))
+        self.consumer_tag = consumer.tag
+        self.delivery_tag = delivery_tag
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.redelivered = redelivered
+        self._consumer = consumer
+        self._processed = consumer.no_ack
+
+    @property
+    def processed(self):
+        return self._processed
+
+    def _settle(self, requeue):
+        if self._processed:
+            raise RuntimeError("Message already processed")
+        self._processed = True
+        self._consumer.queue.settle(self._consumer, self, requeue)
+
+    async def ack(self, multiple=False):
+        self._settle(False)
+
+    async def nack(self, multiple=False, requeue=True):
+        self._settle(requeue)
+
+    async def reject(self, requeue=False):
+        self._settle(requeue)
+
+    def process(self, requeue=False, reject_on_redelivered=False, ignore_processed=False):
+        return _ProcessContext(self, requeue)
+
+
+class _ProcessContext:
+    def __init__(self, message, requeue):
+        self.message = message
+        self.requeue = requeue
+
+    async def __aenter__(self):
+        return self.message
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.message.processed:
+            return
+        if exc_type is None:
+            await self.message.ack()
+        else:
+            await self.message.reject(requeue=self.requeue)
+
+
+class MemoryExchange:
+    def __init__(self, channel, state):
+        self.channel = channel
+        self.state = state
+        self.name = state.name
+
+    async def publish(self, message, routing_key, **kwargs):
+        if self.channel.is_closed:
+            raise ConnectionError("Канал закрыт")
+        if message.reply_to == DIRECT_REPLY_TO and self.channel.reply_queue is not None:
+            # Брокер подставляет в reply_to адрес псевдо-очереди канала-отправителя
+            message.reply_to = self.channel.reply_queue.name
+        self.channel.connection.broker.route(self.name, routing_key, message)
+
+
+class MemoryQueue:
+    def __init__(self, channel, state):
+        self.channel = channel
+        self.state = state
+        self.name = state.name
+
+    async def consume(self, callback, no_ack=False, exclusive=False, arguments=None, consumer_tag=None, timeout=None):
+        tag = consumer_tag or f"ctag-{uuid.uuid4().hex}"
+        priority = (arguments or {}).get("x-priority", 0)
+        consumer = _Consumer(self.state, self.channel, callback, no_ack, tag, priority)
+        self.state.consumers.append(consumer)
+        self.channel.consumers[tag] = consumer
+        self.state.dispatch()
+        return tag
+
+    async def cancel(self, consumer_tag, timeout=None, nowait=False):
+        # Уже доставленные сообщения остаются за каналом до ack или закрытия канала
+        consumer = self.channel.consumers.get(consumer_tag)
+        if consumer in self.state.consumers:
+            self.state.consumers.remove(consumer)
+
+    async def bind(self, exchange, routing_key=None, **kwargs):
+        name = exchange if isinstance(exchange, str) else exchange.name
+        state = self.channel.connection.broker.exchanges.get(name)
+        if state is None:
+            raise ChannelNotFoundEntity(f"NOT_FOUND - no exchange '{name}'")
+        state.bindings.add((self.name, self.name if routing_key is None else routing_key))
+
+    async def purge(self, no_wait=False, timeout=None):
+        count = len(self.state.ready)
+        self.state.ready.clear()
+        return count
+
+    async def delete(self, if_unused=True, if_empty=True, timeout=None):
+        self.channel.connection.broker.delete_queue(self.name)
+
+
+class MemoryChannel:
+    def __init__(self, connection, publisher_confirms=True):
+        self.connection = connection
+        self.publisher_confirms = publisher_confirms
+        self.prefetch_count = 0
+        self.consumers = {}
+        self.reply_queue = None
+        self._closed = False
+        self.default_exchange = MemoryExchange(self, connection.broker.exchanges[""])
+
+    @property
+    def is_closed(self):
+        return self._closed or self.connection.is_closed
+
+    async def set_qos(self, prefetch_count=0, prefetch_size=0, global_=False, timeout=None, all_channels=None):
+        self.prefetch_count = prefetch_count
+        for consumer in self.consumers.values():
+            consumer.queue.dispatch()
+
+    async def declare_exchange(self, name, type=ExchangeType.DIRECT, durable=False, auto_delete=False,
+                               internal=False, passive=False, arguments=None, timeout=None):
+        return MemoryExchange(self, self.connection.broker.declare_exchange(name, type))
+
+    async def declare_queue(self, name=None, durable=False, exclusive=False, passive=False,
+                            auto_delete=False, arguments=None, timeout=None):
+        name = name or f"amq.gen-{uuid.uuid4().hex}"
+        state = self.connection.broker.declare_queue(name, self.connection, exclusive, auto_delete, passive, arguments)
+        return MemoryQueue(self, state)
+
+    async def get_queue(self, name, ensure=True):
+        if name == DIRECT_REPLY_TO:
+            # Псевдо-очередь direct reply-to: своя скрытая очередь у каждого канала
+            if self.reply_queue is None:
+                self.reply_queue = self.connection.broker.declare_queue(
+                    f"{DIRECT_REPLY_TO}.{uuid.uuid4().hex}", self.connection, exclusive=True
+                )
+            return MemoryQueue(self, self.reply_queue)
+        return await self.declare_queue(name, passive=ensure)
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # Неподтверждённые сообщения возвращаются в свои очереди, как при обрыве канала в RabbitMQ
+        for consumer in self.consumers.values():
+            if consumer in consumer.queue.consumers:
+                consumer.queue.consumers.remove(consumer)
+            for incoming in list(consumer.unacked):
+                incoming._processed = True
+                consumer.queue.settle(consumer, incoming, requeue=True)
+        if self.reply_queue is not None:
+            self.connection.broker.delete_queue(self.reply_queue.name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class MemoryConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.channels = []
+        self.reconnect_callbacks = set()
+        self.close_callbacks = set()
+        self.connected = asyncio.Event()
+        self.connected.set()
+        self._closed = asyncio.get_running_loop().create_future()
+
+    @property
+    def is_closed(self):
+        return self._closed.done()
+
+    def closed(self):
+        return self._closed
+
+    async def channel(self, channel_number=None, publisher_confirms=True, on_return_raises=False):
+        if self.is_closed:
+            raise ConnectionError("Соединение закрыто")
+        channel = MemoryChannel(self, publisher_confirms)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self, exc=None):
+        if self.is_closed:
+            return
+        for channel in self.channels:
+            await channel.close()
+        # Эксклюзивные и auto_delete очереди живут, пока живо объявившее их соединение
+        for name, queue in list(self.broker.queues.items()):
+            if queue.owner is self:
+                self.broker.delete_queue(name)
+        self.connected.clear()
+        self._closed.set_result(True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
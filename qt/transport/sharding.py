@@ -0,0 +1,43 @@
+import zlib
+
+SHARD_EXCHANGE = "direct_exchange"
+# У шарда один активный потребитель: запросы одного ключа доставляются по порядку,
+# а при отключении владельца шард переходит к следующему подписчику
+SHARD_QUEUE_ARGUMENTS = {"x-single-active-consumer": True}
+# Приоритет потребителя на «своих» шардах: брокер делает активным подписчика с наибольшим приоритетом
+CLAIM_PRIORITY = 10
+
+
+def shard_queue(request_queue, index):
+    return f"{request_queue}.shard{index}"
+
+
+def shard_index(key, shards):
+    # crc32 одинаков во всех процессах и версиях Python, в отличие от hash() строк
+    return zlib.crc32(str(key).encode()) % shards
+
+
+def routing_key(request_queue, shards, key):
+    # Без шардирования запрос идёт в очередь запросов через обменник по умолчанию,
+    # с шардированием - в очередь шарда через SHARD_EXCHANGE
+    if shards <= 0:
+        return request_queue
+    return shard_queue(request_queue, shard_index(key, shards))
+
+
+def claimed_shards(shards, index, count):
+    return {shard for shard in range(shards) if shard % count == index}
+
+
+async def declare_shards(channel, request_queue, shards):
+    # Объявления идемпотентны: их выполняют и серверы, и клиенты, чтобы запросы не терялись,
+    # пока ни один сервер ещё не создал очереди шардов
+    from aio_pika import ExchangeType
+
+    exchange = await channel.declare_exchange(SHARD_EXCHANGE, ExchangeType.DIRECT)
+    queues = []
+    for index in range(shards):
+        queue = await channel.declare_queue(shard_queue(request_queue, index), arguments=SHARD_QUEUE_ARGUMENTS)
+        await queue.bind(exchange, routing_key=queue.name)
+        queues.append(queue)
+    return exchange, queues
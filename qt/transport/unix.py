@@ -0,0 +1,37 @@
+import struct
+
+# Кадр: длина полезной нагрузки (uint32, big-endian), тип кадра (uint8), сериализованный protobuf
+HEADER = struct.Struct("!IB")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+REQUEST = 1
+REQUEST_BATCH = 2
+RESPONSE = 3
+RESPONSE_BATCH = 4
+CANCEL = 5
+RANGE_REQUEST = 6
+RESPONSE_CHUNK = 7
+STREAM_ACK = 8
+
+# Соответствие типов кадров свойству type сообщений AMQP
+MESSAGE_TYPES = {
+    REQUEST_BATCH: "RequestBatch", RESPONSE_BATCH: "ResponseBatch",
+    RANGE_REQUEST: "RangeRequest", RESPONSE_CHUNK: "ResponseChunk",
+}
+FRAME_TYPES = {name: kind for kind, name in MESSAGE_TYPES.items()}
+
+
+class FrameError(Exception):
+    pass
+
+
+def pack_frame(kind, payload):
+    return HEADER.pack(len(payload), kind) + payload
+
+
+async def read_frame(reader):
+    # IncompleteReadError означает, что собеседник закрыл соединение
+    size, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if size > MAX_FRAME_SIZE:
+        raise FrameError(f"Кадр {size} байт превышает предел {MAX_FRAME_SIZE}")
+    return kind, await reader.readexactly(size)